@@ -1,35 +1,59 @@
 #region Imports
 import os
-import re
+import time
 from dotenv import load_dotenv
 from collections import Counter
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import PDFPlumberLoader
+from pathlib import Path
+from bm25_index import BM25_FILE, BM25Index
+from chunk_store import has_chunk_store, load_editable_store, save_store
+from embedding_pipeline import BatchedEmbeddings
+from faiss_index import build_index, describe, ensure_flat, index_config, stored_vectors
+from fake_models import FakeEmbeddings
+from ingest_manifest import load_manifest, new_manifest, page_key, plan_page, removed_chunk_ids, save_manifest
+from chunk_tags import TAGGER_VERSION
+from pdf_pipeline import StageTimer, iter_page_batches, resolve_pdf_paths
 #endregion
 
 #region Config / Env
 load_dotenv()  
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Loaded from .env to avoid hard-coding secrets
-pdf_path = os.getenv("PDF_PATH")
+pdf_path = os.getenv("PDF_PATH")  # a PDF, a directory of PDFs or a glob such as "books/*.pdf"
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+# "fake" swaps in the deterministic offline embedder (tests/benchmarks; no API calls).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+# "incremental" embeds only new/changed chunks and merges them into the saved index;
+# "full" always rebuilds. Incremental falls back to full when no usable manifest exists.
+INGEST_MODE = os.getenv("INGEST_MODE", "incremental").lower()
+# Page extraction runs in a process pool; 0 workers means one per CPU.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 0)) or None
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", 16))
+
+# NOTE: chunk_size=1000, chunk_overlap=200 chosen to balance semantic coherence and recall.
+# Larger chunks preserve context; 200 overlap helps avoid splitting mid-topic.
+# Separators prioritize paragraph breaks and sentences to reduce mid-sentence splits.
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SEPARATORS = ["\n\n", "."]
 #endregion
 
 #region Pipeline
 def main():
     """
-    Process a PDF by replacing CID (Character ID) placeholders, chunking the text,
+    Process the PDFs by replacing CID (Character ID) placeholders, chunking the text,
     embedding it into vectors, and storing the result in a FAISS database.
 
     Steps performed:
-        1. Load the PDF document.
-        2. Identify and count all CID placeholders across pages.
-        3. Replace known CIDs with their correct characters.
-        4. Split the cleaned text into overlapping chunks for embedding.
-        5. Create vector embeddings using a language model.
-        6. Store the vectors in a FAISS database and save locally.
+        1. Resolve PDF_PATH (file, directory or glob) into the documents to ingest.
+        2. Extract pages in a process pool; workers count and replace known CIDs
+           in one pass (per-book mapping tables), split each page into overlapping chunks
+           and tag every chunk with its doshas and remedy categories (`chunk_tags`).
+        3. As page batches stream in, compare their content hashes with the manifest
+           of the previous run and embed only new chunks into the FAISS database.
+        4. Delete vectors of removed chunks, then save the database, its BM25 index
+           (`bm25_index.py`) and the manifest.
 
     Args:
         None
@@ -37,84 +61,123 @@ def main():
     Returns:
         None
     """
-    loader = PDFPlumberLoader(pdf_path)
-    docs = loader.load()
-    print(len(docs))  # sanity check: number of pages loaded
+    timer = StageTimer()
+    started = time.perf_counter()
+    paths = resolve_pdf_paths(pdf_path)
+    print(f"Ingesting {len(paths)} PDF(s)")  # sanity check: documents found
 
-    all_cids = []
-
-    for doc in docs:
-        text = doc.page_content
-        cids = find_cid_placeholders(text)
-        if cids:
-            all_cids.extend(cids)
-
-    all_cid_counts = Counter(all_cids)
-
-    # sanity check 
+    # NOTE: text-embedding-3-small is a cost-effective default with good quality for retrieval.
+    # Batched by token budget, bounded concurrency, backoff on 429s, vectors cached on disk.
+    if EMBEDDING_BACKEND == "fake":
+        embedding_model, base_embeddings = "fake", FakeEmbeddings()
+    else:
+        embedding_model, base_embeddings = EMBEDDING_MODEL, OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    embeddings = BatchedEmbeddings(base_embeddings, embedding_model)
+
+    # Anything in `settings` changing means every stored vector is stale → full rebuild.
+    settings = {"embedding_model": embedding_model, "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP, "separators": SEPARATORS, "tagger_version": TAGGER_VERSION}
+    manifest = load_manifest(VECTOR_DB_PATH, settings) if INGEST_MODE == "incremental" else None
+    incremental = manifest is not None
+    if not incremental:
+        manifest = new_manifest(settings)
+    # The index type is not part of `settings`: changing it rebuilds the index from cached vectors.
+    faiss_config = index_config()
+
+    def load_store():
+        # Edits happen on an exact flat index; it is converted back to `faiss_config` before saving.
+        store = load_editable_store(VECTOR_DB_PATH, embeddings)
+        ensure_flat(store, embeddings)
+        return store
+
+    splitter_settings = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "separators": SEPARATORS}
+
+    vector_store = None
+    pages = {}
+    all_cid_counts, unmapped_cids = Counter(), Counter()
+    pages_done, embedded = 0, 0
+    # Chunks are embedded batch by batch while workers keep extracting, so pages are
+    # never all held in memory and the embedding API is busy from the first batch.
+    for batch in iter_page_batches(paths, splitter_settings, INGEST_WORKERS, INGEST_PAGES_PER_TASK):
+        timer.add(batch["timings"])
+        all_cid_counts.update(batch["cid_counts"])
+        unmapped_cids.update(batch["unmapped_cids"])
+        to_add, add_ids = [], []
+        for doc, page_hash, chunks in batch["pages"]:
+            key = page_key(doc)
+            page_add, page_ids, pages[key] = plan_page(manifest["pages"].get(key), key, page_hash, chunks)
+            to_add.extend(page_add)
+            add_ids.extend(page_ids)
+        pages_done += len(batch["pages"])
+
+        if to_add:
+            with timer.stage("embed"):
+                if vector_store is None and incremental:
+                    vector_store = load_store()
+                if vector_store is None:
+                    # Create the FAISS index for fast similarity search in the app.
+                    vector_store = FAISS.from_documents(to_add, embeddings, ids=add_ids)
+                else:
+                    # Re-added IDs are replaced in case an interrupted run saved the index but not its manifest.
+                    stored = set(vector_store.index_to_docstore_id.values())
+                    stale = [chunk_id for chunk_id in add_ids if chunk_id in stored]
+                    if stale:
+                        vector_store.delete(stale)
+                    vector_store.add_documents(to_add, ids=add_ids)
+            embedded += len(to_add)
+        print(f"{batch['path']}: {pages_done} pages processed, {embedded} chunks embedded")  # progress
+
+    # sanity check
     print("\nSummary of all cid placeholders found across pages:")
     for cid, count in all_cid_counts.items():
         print(f"{cid}: {count} occurrences")
-
-    # dictionary for replacing the cids
-    # NOTE: This CID→text map fixes common ligatures from PDF extraction (ffl/ffi/fl/ff/fi).
-    # Keep this list project-specific.
-    cid_to_char = {
-        "(cid:640)": "ffl",
-        "(cid:637)": "ffi",
-        "(cid:635)": "fl",
-        "(cid:643)": "ff",
-        "(cid:633)": "fi"
-    }
-
-    # todo: check if the cids are replaced properly
-    for doc in docs:
-        text = doc.page_content
-        for cid, replacement_char in cid_to_char.items():
-            text = text.replace(cid, replacement_char)
-        doc.page_content = text  
-
-    # NOTE: chunk_size=1000, chunk_overlap=200 chosen to balance semantic coherence and recall.
-    # Larger chunks preserve context; 200 overlap helps avoid splitting mid-topic.
-    # Separators prioritize paragraph breaks and sentences to reduce mid-sentence splits.
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        separators=["\n\n", "."],
-    )
-
-    chunks = text_splitter.split_documents(docs)
-    print(len(chunks))  # sanity check: number of chunks
-
-    # NOTE: text-embedding-3-small is a cost-effective default with good quality for retrieval.
-    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
-
-    # Create and persist FAISS index locally for fast similarity search in the app.
-    vector_store = FAISS.from_documents(chunks, embeddings)
-    print(f"Number of vectors: {vector_store.index.ntotal}")
-    vector_store.save_local(VECTOR_DB_PATH)
+    if unmapped_cids:
+        # Add these to the book's .cidmap.json sidecar (see text_normalizer.py) once identified.
+        print(f"Unmapped cid placeholders left in the text: {dict(unmapped_cids)}")
+
+    to_delete = removed_chunk_ids(manifest["pages"], pages)
+    print(f"{'Incremental' if incremental else 'Full'} build: "
+          f"{embedded} chunks embedded, {len(to_delete)} to delete")  # sanity check
+
+    bm25_missing = not (Path(VECTOR_DB_PATH) / BM25_FILE).exists()
+    legacy_format = not has_chunk_store(VECTOR_DB_PATH)
+    index_changed = manifest.get("index", {"type": "flat"}) != faiss_config
+    if (incremental and not embedded and not to_delete and not bm25_missing and not index_changed
+            and not legacy_format):
+        # Leave the index files untouched so their fingerprint (and every cache keyed on it) stays valid.
+        print("Vector store already up to date")
+        return
+    if vector_store is None and not incremental:
+        raise ValueError(f"No text could be extracted from {pdf_path}")
+
+    with timer.stage("delete"):
+        if vector_store is None:
+            vector_store = load_store()
+        # Only delete IDs the index really holds.
+        stored = set(vector_store.index_to_docstore_id.values())
+        stale = [chunk_id for chunk_id in to_delete if chunk_id in stored]
+        if stale:
+            vector_store.delete(stale)
+    if faiss_config != {"type": "flat"}:  # another index type, scalar quantization or fewer dimensions
+        with timer.stage("index"):
+            vector_store.index = build_index(stored_vectors(vector_store, embeddings), faiss_config)
+    with timer.stage("save"):
+        save_store(vector_store, VECTOR_DB_PATH)  # FAISS file + SQLite chunk store, no pickle
+        # Rebuilt from the whole docstore (seconds even for large books) so it always matches FAISS.
+        doc_ids = list(vector_store.index_to_docstore_id.values())
+        BM25Index.build(doc_ids, [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+                        ).save(VECTOR_DB_PATH)
+        manifest["pages"] = pages
+        manifest["index"] = faiss_config
+        save_manifest(VECTOR_DB_PATH, manifest)
+
+    print(f"Number of vectors: {vector_store.index.ntotal} ({describe(vector_store.index)})")
+    print(f"Embedding stats: {embeddings.stats}")  # sanity check: cached vs embedded texts
+    # Worker stages are CPU-seconds summed across processes; wall time shows the parallel speed-up.
+    print(f"Stage timings: {timer.report()} wall={time.perf_counter() - started:.1f}s")
     print("Vector store saved to 'vector_db'")
 #endregion
 
-#region Utilities
-def find_cid_placeholders(text):
-    """
-    Extract all CID (Character ID) placeholders from the given text.
-
-    CID placeholders are typically strings in the format "(cid:###)",
-    where ### is a numeric identifier for a special character in PDFs.
-
-    Args:
-        text (str): The input text to search for CID placeholders.
-
-    Returns:
-        list[str]: A list of all CID placeholder matches found in the text.
-                   Returns an empty list if no placeholders are found.
-    """
-    pattern = r"\(cid:\d+\)"
-    return re.findall(pattern, text)
-#endregion
-
 #region Entry point
 if __name__ == "__main__":
     main()
@@ -1,8 +1,13 @@
 #region Imports
 import streamlit as st
-from langgraph_remedy import get_remedy_graph
+from app_resources import load_resources, recall, remember
+from langgraph_remedy import stream_remedy_graph
+from metrics import trace_request
 #endregion 
 
+# Loaded once per server process (see `app_resources`); later reruns and sessions reuse it.
+load_resources()
+
 #region st1 — UI inputs for ailment, body type, remedy type
 st.markdown(
     "<h1 style='text-align: center; color: #6B4D31;'>🍀 Health Guru AI - Adaptive Remedies</h1>",
@@ -46,32 +51,75 @@ with st.expander("ℹ️ How fallback search works"):
 
     This helps ensure you still get the best possible suggestion.
     """)
+
+# Per-request timings, token usage and cache hits for whoever is tuning the pipeline.
+show_debug = st.checkbox("🛠️ Show debug panel")
 #endregion
 
-#region Langgraph 
-graph = get_remedy_graph()
+#region Debug panel
+def render_debug_panel(trace):
+    """Show one request's trace: totals, per-step timings (indented by nesting) and cache hits."""
+    with st.expander("🛠️ Debug: request trace", expanded=True):
+        col_ms, col_calls, col_tokens, col_depth = st.columns(4)
+        col_ms.metric("Total", f"{trace.total_ms:.0f} ms")
+        avoided = trace.llm_calls_avoided.get("no_evidence", 0)
+        col_calls.metric("LLM calls", trace.llm_calls, help=f"{avoided} skipped by the evidence pre-check")
+        col_tokens.metric("Tokens (in / out)", f"{trace.tokens['prompt']} / {trace.tokens['completion']}")
+        col_depth.metric("Fallback depth", trace.fallback_depth)
+        details = trace.as_dict()
+        st.dataframe(
+            [{"step": "\u2003" * step["depth"] + step["step"], "start (ms)": step["start_ms"], "time (ms)": step["ms"]}
+             for step in details["steps"]],
+            use_container_width=True,
+        )
+        st.caption("Cache lookups")
+        st.table([{"cache": name, **counts} for name, counts in details["cache"].items()])
 #endregion
 
 #region st2 — Handle button click to run LangGraph
 if st.button("Find"):
-    with st.spinner("Loading..."):
-        if ailment_description.strip():
-            # Initial state matches the LangGraph State schema; 
-            # stored_remedy_type preserves the original user choice for fallback routing.
-            input_state = {
-                "ailment_description": ailment_description,
-                "body_type": sel_body_type,
-                "remedy_type": sel_remedy_type,
-                "context": "",
-                "response": "",
-                "is_specific": False,
-                "stored_remedy_type": sel_remedy_type
-            }
-            output = graph.invoke(input_state)
-            response = output["response"]
-            st.text_area("Remedy", response, height=400)
+    if ailment_description.strip():
+        # Initial state matches the LangGraph State schema; 
+        # stored_remedy_type preserves the original user choice for fallback routing.
+        input_state = {
+            "ailment_description": ailment_description,
+            "body_type": sel_body_type,
+            "remedy_type": sel_remedy_type,
+            "context": "",
+            "response": "",
+            "is_specific": False,
+            "stored_remedy_type": sel_remedy_type
+        }
+        remedy_box = st.empty()
+        # Same inputs as an earlier click in this session: show that answer without rerunning the graph.
+        memoized = recall("langgraph", ailment_description, sel_body_type, sel_remedy_type)
+        if memoized is None:
+            partial, response = "", ""
+            # Fallback rounds show up as status lines; remedy tokens render as they stream in.
+            with trace_request("langgraph") as trace, st.status("Loading...", expanded=True) as status:
+                for kind, text in stream_remedy_graph(input_state):
+                    if kind == "status":
+                        status.write(text)
+                    elif kind == "reset":
+                        # A new attempt: whatever an earlier one streamed is not the answer.
+                        partial = ""
+                        remedy_box.empty()
+                    elif kind == "token":
+                        partial += text
+                        remedy_box.markdown(partial)
+                    else:
+                        response = text
+                status.update(label="Done", state="complete", expanded=False)
+            remember("langgraph", ailment_description, sel_body_type, sel_remedy_type, (response, trace))
         else:
-            st.warning("Please enter an ailment to get a remedy.")
+            response, trace = memoized
+        remedy_box.text_area("Remedy", response, height=400)
+        if show_debug:
+            if memoized is not None:
+                st.caption("Served from this session's earlier answer; the trace below is from that run.")
+            render_debug_panel(trace)
+    else:
+        st.warning("Please enter an ailment to get a remedy.")
 #endregion
 
 #region st Body Type Desc — navigation hint
@@ -1,8 +1,12 @@
 #region Imports
 import streamlit as st
-from langchain_remedy import find_remedy
+from app_resources import load_resources, recall, remember
+from langchain_remedy import stream_remedy
 #endregion 
 
+# Loaded once per server process (see `app_resources`); later reruns and sessions reuse it.
+load_resources()
+
 #region st1 — UI for ailment, body type, and remedy type selection
 st.markdown(
     "<h1 style='text-align: center; color: #6B4D31;'>🍀 Health Guru AI - Targeted & Precise Remedies</h1>",
@@ -45,15 +49,24 @@ with st.expander("💡 Tips for better results"):
 
 #region st2 — Handle button click to trigger remedy search
 if st.button("Find"):
-    with st.spinner("Loading..."):
-        # LangChain + vector search logic internally
-        result = find_remedy(ailment_description, sel_remedy_type, sel_body_type)
+    remedy_box = st.empty()
+    # Same inputs as an earlier click in this session: show that answer without rerunning the pipeline.
+    result = recall("langchain", ailment_description, sel_body_type, sel_remedy_type)
+    if result is None:
+        result = ""
+        with st.spinner("Loading..."):
+            # LangChain + vector search logic internally; tokens are rendered as they arrive.
+            for token in stream_remedy(ailment_description, sel_remedy_type, sel_body_type):
+                result += token
+                remedy_box.markdown(result)
+        if ailment_description.strip():
+            remember("langchain", ailment_description, sel_body_type, sel_remedy_type, result)
 
-        if "No remedy found" in result:
-           result += ("\n\nTip: Switch to the 'Adaptive Remedy (LangGraph)' page for broader, more flexible results." 
-                       "\n\n Or adjust your filters: select 'General' body type, and for remedies, you can explore other types like dietary/nutritional changes, herbal/ayurvedic remedies, etc. or switch to 'overall'.")
+    if "No remedy found" in result:
+       result += ("\n\nTip: Switch to the 'Adaptive Remedy (LangGraph)' page for broader, more flexible results." 
+                   "\n\n Or adjust your filters: select 'General' body type, and for remedies, you can explore other types like dietary/nutritional changes, herbal/ayurvedic remedies, etc. or switch to 'overall'.")
 
-        st.text_area("Remedy", result, height=400)
+    remedy_box.text_area("Remedy", result, height=400)
 
 #region st Body Type Desc — navigation hint
 st.markdown(
@@ -0,0 +1,91 @@
+#region Imports
+import os
+import logging
+from collections import OrderedDict
+import streamlit as st
+from dotenv import load_dotenv
+from langchain_remedy import get_chain_remedy
+from retrieval import normalize_query
+from shared_resources import index_version, warm_up
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Answers kept per browser session; a repeated "Find" with the same inputs is served from here.
+SESSION_MEMO_SIZE = int(os.getenv("SESSION_MEMO_SIZE", 32))
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Process-wide resources
+@st.cache_resource(show_spinner="Loading the remedy index...")
+def load_resources() -> dict:
+    """
+    Load the clients, indexes and LangChain chain once per server process, for every session.
+
+    The objects themselves stay in the `shared_resources` registry (thread-safe, and
+    `reload_vector_store` can swap the index); this cache only makes sure the first
+    session waits for the loading behind a spinner and later reruns skip it. The
+    compiled LangGraphs are module-level and compiled once on import.
+
+    Returns:
+        dict: `resource_stats()` after loading.
+    """
+    stats = warm_up()
+    get_chain_remedy()
+    logger.info("App resources ready: %s", {name: stat["load_seconds"] for name, stat in stats["resources"].items()})
+    return stats
+#endregion
+
+#region Session memo
+def _memo() -> OrderedDict:
+    """Return this session's memo (created on first use)."""
+    if "remedy_memo" not in st.session_state:
+        st.session_state["remedy_memo"] = OrderedDict()
+    return st.session_state["remedy_memo"]
+
+def _memo_key(page: str, ailment_description: str, body_type: str, remedy_type: str) -> tuple:
+    # The index version keeps answers from a rebuilt index apart from the old ones.
+    return (page, index_version(), normalize_query(ailment_description), body_type, remedy_type)
+
+def recall(page: str, ailment_description: str, body_type: str, remedy_type: str):
+    """
+    Return this session's earlier result for identical inputs on `page`, or None.
+
+    Args:
+        page (str): Page name (results of the two pipelines are kept apart).
+        ailment_description (str): Ailment text (compared after `normalize_query`).
+        body_type (str): Selected body type.
+        remedy_type (str): Selected remedy type.
+
+    Returns:
+        Any | None: The memoized result.
+    """
+    memo = _memo()
+    key = _memo_key(page, ailment_description, body_type, remedy_type)
+    if key not in memo:
+        return None
+    memo.move_to_end(key)
+    return memo[key]
+
+def remember(page: str, ailment_description: str, body_type: str, remedy_type: str, result) -> None:
+    """
+    Memoize a result for this session, evicting the least recently used beyond SESSION_MEMO_SIZE.
+
+    Args:
+        page (str): Page name.
+        ailment_description (str): Ailment text.
+        body_type (str): Selected body type.
+        remedy_type (str): Selected remedy type.
+        result (Any): What the page needs to show the answer again.
+    """
+    if SESSION_MEMO_SIZE <= 0:
+        return
+    memo = _memo()
+    key = _memo_key(page, ailment_description, body_type, remedy_type)
+    memo[key] = result
+    memo.move_to_end(key)
+    while len(memo) > SESSION_MEMO_SIZE:
+        memo.popitem(last=False)
+#endregion
@@ -0,0 +1,58 @@
+#region Imports
+import os
+import re
+import time
+import argparse
+from collections import Counter
+from text_normalizer import CID_TO_CHAR, CIDNormalizer
+#endregion
+
+#region Implementations
+def legacy_normalize(texts, cid_to_char=CID_TO_CHAR):
+    """The original two-pass cleanup: a `re.findall` census, then one `str.replace` per mapping."""
+    all_cids = []
+    for text in texts:
+        all_cids.extend(re.findall(r"\(cid:\d+\)", text))
+    counts = Counter(all_cids)
+    cleaned = []
+    for text in texts:
+        for cid, replacement_char in cid_to_char.items():
+            text = text.replace(cid, replacement_char)
+        cleaned.append(text)
+    return cleaned, counts
+
+def single_pass_normalize(texts, cid_to_char=CID_TO_CHAR):
+    """`CIDNormalizer`: census and replacement in one compiled-regex pass per page."""
+    normalizer = CIDNormalizer(cid_to_char)
+    return [normalizer.normalize(text) for text in texts], normalizer.counts
+#endregion
+
+#region Entry point
+def main():
+    """Extract the book's pages once, then time both CID cleanups on the same text."""
+    parser = argparse.ArgumentParser(description="Micro-benchmark the CID/ligature normalizer.")
+    parser.add_argument("--pdf", default=os.path.join("100_HG_Data", "Book.pdf"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import pdfplumber
+    started = time.perf_counter()
+    with pdfplumber.open(args.pdf) as pdf:
+        texts = [page.extract_text() + "\n" for page in pdf.pages]
+    print(f"Extracted {len(texts)} pages in {time.perf_counter() - started:.1f}s (not part of the timing)")
+
+    legacy = legacy_normalize(texts)
+    single = single_pass_normalize(texts)
+    assert legacy == single, "single-pass output differs from the legacy cleanup"
+
+    for name, func in (("legacy two-pass", legacy_normalize), ("single-pass", single_pass_normalize)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            func(texts)
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<16}: {best * 1000:.2f} ms per book (best of {args.repeat})")
+
+if __name__ == "__main__":
+    main()
+#endregion
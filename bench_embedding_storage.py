@@ -0,0 +1,70 @@
+#region Imports
+import json
+import argparse
+import numpy as np
+from bench_faiss_index import ingestion_embeddings, load_vectors, measure, scale_up
+from evaluate import read_test_cases
+from faiss_index import STORAGE_TYPES, build_index, index_config, reduce_dimensions, vector_bytes
+from retrieval import normalize_query
+#endregion
+
+#region Helpers
+def embed_queries(cases: list) -> np.ndarray:
+    """Embed the distinct test-case ailments the way the app does (normalised, through the disk cache)."""
+    texts = list(dict.fromkeys(normalize_query(case["ailment_description"]) for case in cases))
+    return np.asarray(ingestion_embeddings().embed_documents(texts), dtype=np.float32)
+#endregion
+
+#region Entry point
+def main():
+    """Build each storage format over the saved vectors and report recall against the full-precision index."""
+    parser = argparse.ArgumentParser(description="Recall-vs-memory report for quantized / shortened vectors.")
+    parser.add_argument("--cases", default="remedy_test_cases.csv")
+    parser.add_argument("--type", default="flat", help="index type to build each variant as")
+    parser.add_argument("--dimensions", help="comma-separated dimensions to try (default: full, 1/2, 1/4)")
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--scale", type=int, default=0, help="pad the library to this many vectors")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    import faiss
+    rng = np.random.default_rng(0)
+    vectors = scale_up(load_vectors(), args.scale, rng)
+    queries = embed_queries(read_test_cases(args.cases))
+    dim = vectors.shape[1]
+    if queries.shape[1] != dim:
+        raise SystemExit(f"Index has {dim}-dim vectors but the embedder makes {queries.shape[1]}-dim ones.")
+    print(f"{len(vectors)} vectors × {dim} dims, {len(queries)} test-case queries, k={args.k}")
+
+    # Ground truth: what the app retrieves today (exact search over full float32 vectors).
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    dimensions = [int(d) for d in args.dimensions.split(",")] if args.dimensions else [dim, dim // 2, dim // 4]
+    rows = []
+    print(f"{'storage':<8} {'dims':>5} {'MiB':>7} {'vec MiB':>8} {'ms/query':>9} {'recall@k':>9} {'top-1':>6}")
+    for dimension in dimensions:
+        # Queries are shortened exactly like the stored vectors (see `retrieval.search_by_vector`).
+        reduced = reduce_dimensions(queries, dimension)
+        for storage in STORAGE_TYPES:
+            index = build_index(vectors, index_config(args.type, storage, 0 if dimension >= dim else dimension))
+            size_mib = len(faiss.serialize_index(index)) / 2**20
+            vector_mib = vector_bytes(index) / 2**20
+            latency_ms, recall = measure(index, reduced, truth, args.k)
+            _, top = index.search(reduced, 1)
+            top1 = float(np.mean(top[:, 0] == truth[:, 0]))
+            rows.append({"storage": storage, "dimensions": index.d, "size_mib": round(size_mib, 3),
+                         "vector_mib": round(vector_mib, 3), "ms_per_query": round(latency_ms, 4),
+                         "recall_at_k": round(recall, 4), "top1_agreement": round(top1, 4)})
+            print(f"{storage:<8} {index.d:>5} {size_mib:>7.2f} {vector_mib:>8.2f} {latency_ms:>9.3f} "
+                  f"{recall:>9.3f} {top1:>6.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+        print(f"Saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,115 @@
+#region Imports
+import os
+import json
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from chunk_store import load_editable_store
+from embedding_pipeline import BatchedEmbeddings
+from fake_models import FakeEmbeddings
+from faiss_index import build_index, index_config, stored_vectors
+#endregion
+
+#region Config / Env
+load_dotenv()
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+
+# (index type, search parameter, values to sweep); build parameters come from the env.
+SWEEPS = [
+    ("flat", None, [None]),
+    ("ivf_flat", "nprobe", [1, 4, 8, 16, 32]),
+    ("hnsw", "efSearch", [16, 32, 64, 128]),
+    ("ivf_pq", "nprobe", [4, 8, 16, 32]),
+]
+#endregion
+
+#region Helpers
+def ingestion_embeddings():
+    """Return the ingestion embedder (fake or OpenAI) behind the `BatchedEmbeddings` disk cache."""
+    if EMBEDDING_BACKEND == "fake":
+        embedding_model, base_embeddings = "fake", FakeEmbeddings()
+    else:
+        embedding_model, base_embeddings = EMBEDDING_MODEL, OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    return BatchedEmbeddings(base_embeddings, embedding_model)
+
+def load_vectors():
+    """Load every chunk vector of the saved index (re-embedding through the disk cache if needed)."""
+    embeddings = ingestion_embeddings()
+    vector_store = load_editable_store(VECTOR_DB_PATH, embeddings)
+    return stored_vectors(vector_store, embeddings)
+
+def scale_up(vectors, rows, rng):
+    """Simulate a larger library: append noisy copies of the real vectors up to `rows`."""
+    if rows <= len(vectors):
+        return vectors
+    picks = rng.integers(0, len(vectors), rows - len(vectors))
+    noise = rng.normal(0, vectors.std() * 0.5, (len(picks), vectors.shape[1])).astype(np.float32)
+    return np.vstack([vectors, vectors[picks] + noise])
+
+def set_search_param(index, name, value):
+    """Apply one search-time parameter (nprobe / efSearch)."""
+    import faiss
+    if name:
+        faiss.ParameterSpace().set_index_parameter(index, name, value)
+
+def measure(index, queries, truth, k):
+    """Return (mean ms per single query, recall@k against the exact neighbours)."""
+    found = []
+    started = time.perf_counter()
+    for query in queries:  # one query at a time, like the app
+        _, positions = index.search(query[None, :], k)
+        found.append(positions[0])
+    elapsed = time.perf_counter() - started
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return elapsed * 1000 / len(queries), float(recall)
+#endregion
+
+#region Entry point
+def main():
+    """Build each index type over the saved vectors and report recall vs latency against flat."""
+    parser = argparse.ArgumentParser(description="Recall-vs-latency report for FAISS index types.")
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=200, help="perturbed chunk vectors used as queries")
+    parser.add_argument("--scale", type=int, default=0, help="pad the library to this many vectors")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    import faiss
+    rng = np.random.default_rng(0)
+    vectors = scale_up(load_vectors(), args.scale, rng)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = (queries + rng.normal(0, vectors.std() * 0.1, queries.shape)).astype(np.float32)
+    print(f"{len(vectors)} vectors × {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    print(f"{'type':<9} {'param':<13} {'build s':>8} {'MiB':>7} {'ms/query':>9} {'recall@k':>9}")
+    for index_type, param, values in SWEEPS:
+        started = time.perf_counter()
+        index = build_index(vectors, index_config(index_type, "float32", 0))  # see bench_embedding_storage
+        build_seconds = time.perf_counter() - started
+        size_mib = len(faiss.serialize_index(index)) / 2**20
+        for value in values:
+            set_search_param(index, param, value)
+            latency_ms, recall = measure(index, queries, truth, args.k)
+            label = f"{param}={value}" if param else "-"
+            rows.append({"type": index_type, "param": label, "build_seconds": round(build_seconds, 3),
+                         "size_mib": round(size_mib, 3), "ms_per_query": round(latency_ms, 4),
+                         "recall_at_k": round(recall, 4)})
+            print(f"{index_type:<9} {label:<13} {build_seconds:>8.2f} {size_mib:>7.2f} {latency_ms:>9.3f} {recall:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+        print(f"Saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
+#endregion
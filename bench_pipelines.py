@@ -0,0 +1,201 @@
+#region Imports
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Offline by default: the backends are chosen when the pipeline modules are imported, and caches
+# stay in memory so every run starts cold and never touches the app's SQLite files.
+for _name, _value in (("EMBEDDING_BACKEND", "fake"), ("LLM_BACKEND", "fake"),
+                      ("RETRIEVAL_CACHE_PATH", ""), ("RESPONSE_CACHE_PATH", "")):
+    os.environ.setdefault(_name, _value)
+
+from evaluate import read_test_cases
+from evidence import EVIDENCE_PRECHECK
+from faiss_index import EMBEDDING_DIMENSIONS
+from langchain_remedy import find_remedy
+from langgraph_remedy import get_remedy_graph
+from metrics import LLM_CALLS_AVOIDED
+from reranker import RERANK, context_k
+from response_cache import response_cache
+from retrieval import chunk_id_cache, embedding_cache, retrieval_mode
+from shared_resources import (EMBEDDING_BACKEND, FAKE_EMBEDDING_LATENCY, FAKE_LLM_LATENCY, FAKE_NO_REMEDY_FOR,
+                              LLM_BACKEND, get_embeddings, get_llm, get_vector_store, resource_stats)
+#endregion
+
+#region Config
+PIPELINES = ("langchain", "langgraph")
+#endregion
+
+#region Helpers
+def percentile(values, share):
+    """Nearest-rank percentile of `values` (share in 0..1)."""
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+def counters():
+    """Snapshot of the request counters the fake backends keep (0 for real clients) and of LLM calls avoided."""
+    return {"llm_calls": getattr(get_llm(), "calls", 0), "embedding_requests": getattr(get_embeddings(), "requests", 0),
+            "llm_calls_avoided": LLM_CALLS_AVOIDED.total(reason="no_evidence")}
+
+def run_case(pipeline, case):
+    """Run one test case through `pipeline`; returns (seconds, remedy found)."""
+    started = time.perf_counter()
+    if pipeline == "langchain":
+        remedy = find_remedy(case["ailment_description"], case["remedy_type"], case["body_type"])
+        found = "No remedy found" not in remedy
+    else:
+        state = get_remedy_graph().invoke({
+            "ailment_description": case["ailment_description"],
+            "body_type": case["body_type"],
+            "remedy_type": case["remedy_type"],
+            "context": "",
+            "response": "",
+            "is_specific": False,
+            "stored_remedy_type": case["remedy_type"],
+        })
+        found = "None" not in state["response"]  # terminal sentinel after all fallbacks
+    return time.perf_counter() - started, found
+
+def run_pass(pipeline, cases, concurrency):
+    """
+    Run every case once and summarise latency, throughput and backend calls.
+
+    Args:
+        pipeline (str): "langchain" or "langgraph".
+        cases (list[dict]): Test cases.
+        concurrency (int): Cases in flight at once.
+
+    Returns:
+        dict: Latency percentiles (ms), throughput (queries/s), calls per query (made, and avoided by the
+        evidence pre-check), found count, RSS.
+    """
+    before = counters()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        results = list(pool.map(lambda case: run_case(pipeline, case), cases))
+    wall = time.perf_counter() - started
+    after = counters()
+    latencies = [seconds * 1000 for seconds, _ in results]
+    n = max(len(cases), 1)
+    return {
+        "queries": len(cases),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "mean_ms": round(sum(latencies) / n, 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+        "throughput_qps": round(len(cases) / wall, 2) if wall else 0.0,
+        "llm_calls_per_query": round((after["llm_calls"] - before["llm_calls"]) / n, 3),
+        "llm_calls_avoided_per_query": round((after["llm_calls_avoided"] - before["llm_calls_avoided"]) / n, 3),
+        "embedding_requests_per_query": round((after["embedding_requests"] - before["embedding_requests"]) / n, 3),
+        "found": sum(found for _, found in results),
+        "rss_bytes": resource_stats()["process_rss_bytes"],
+    }
+
+def reset_caches():
+    """Empty the retrieval and response caches so each pipeline's first pass is cold."""
+    embedding_cache.clear()
+    chunk_id_cache.clear()
+    response_cache.invalidate()
+
+def git_commit():
+    """Current commit (with "-dirty" for uncommitted changes), or None outside a git checkout."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (0 where `resource` is unavailable)."""
+    try:
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024  # bytes on macOS, KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    except ImportError:
+        return 0
+
+def print_comparison(report, baseline):
+    """Print p50/p95/throughput/LLM-call (made and avoided) changes against an earlier report."""
+    print(f"Compared with {baseline.get('commit') or 'baseline'}:")
+    for pipeline, passes in report["results"].items():
+        for index, current in enumerate(passes):
+            try:
+                previous = baseline["results"][pipeline][index]
+            except (KeyError, IndexError):
+                continue
+            changes = []
+            for metric in ("p50_ms", "p95_ms", "throughput_qps", "llm_calls_per_query", "llm_calls_avoided_per_query"):
+                old, new = previous.get(metric), current[metric]
+                delta = f"{(new - old) / old:+.0%}" if old else "n/a"
+                changes.append(f"{metric} {old} → {new} ({delta})")
+            print(f"  {pipeline} pass {index + 1}: " + ", ".join(changes))
+#endregion
+
+#region Entry point
+def main():
+    """Benchmark both pipelines over the test cases and write a JSON report."""
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark of both remedy pipelines.")
+    parser.add_argument("--cases", default="remedy_test_cases.csv")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="comma-separated subset of " + ", ".join(PIPELINES))
+    parser.add_argument("--passes", type=int, default=2, help="pass 1 is cold; later passes hit the caches")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    cases = read_test_cases(args.cases)
+    vector_store = get_vector_store()
+    dimension = getattr(get_embeddings(), "size", None)
+    if dimension is not None and vector_store.index.d not in (dimension, EMBEDDING_DIMENSIONS):
+        sys.exit(f"Index has {vector_store.index.d}-dim vectors but the fake embedder makes {dimension}-dim ones; "
+                 "ingest with EMBEDDING_BACKEND=fake into a separate VECTOR_DB_PATH first.")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "embedding_backend": EMBEDDING_BACKEND, "llm_backend": LLM_BACKEND,
+            "fake_embedding_latency": FAKE_EMBEDDING_LATENCY, "fake_llm_latency": FAKE_LLM_LATENCY,
+            "fake_no_remedy_for": FAKE_NO_REMEDY_FOR, "retrieval_mode": retrieval_mode(),
+            "rerank": RERANK, "evidence_precheck": EVIDENCE_PRECHECK, "context_k": context_k(), "concurrency": args.concurrency,
+        },
+        "cases": len(cases),
+        "results": {},
+    }
+    for pipeline in [name.strip() for name in args.pipelines.split(",") if name.strip()]:
+        if pipeline not in PIPELINES:
+            sys.exit(f"Unknown pipeline {pipeline!r}; choose from {PIPELINES}")
+        reset_caches()
+        report["results"][pipeline] = []
+        for number in range(1, args.passes + 1):
+            result = run_pass(pipeline, cases, args.concurrency)
+            report["results"][pipeline].append(result)
+            print(f"{pipeline:<9} pass {number}: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+                  f"{result['throughput_qps']:.1f} q/s, {result['llm_calls_per_query']:.2f} LLM calls/q "
+                  f"({result['llm_calls_avoided_per_query']:.2f} avoided), "
+                  f"{result['embedding_requests_per_query']:.2f} embeddings/q, {result['found']}/{result['queries']} found")
+
+    stats = resource_stats()
+    report["process"] = {"peak_rss_bytes": peak_rss_bytes(), "resources": stats["resources"],
+                         "index": stats.get("index")}
+    print(f"Peak RSS: {report['process']['peak_rss_bytes'] / 2**20:.1f} MiB")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,162 @@
+#region Imports
+import re
+import math
+from pathlib import Path
+import numpy as np
+#endregion
+
+#region Config
+# Saved next to the FAISS files; the "index." prefix puts it in the index fingerprint.
+BM25_FILE = "index.bm25.npz"
+
+# Standard Okapi BM25 parameters.
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its my of on or so that the this to was
+were will with what which who how can do does not no your you me our their them they these those
+""".split())
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+#endregion
+
+#region Tokenizer
+def tokenize(text: str) -> list:
+    """
+    Split text into BM25 terms: lower-case words without stopwords, plural "s" stripped.
+
+    Args:
+        text (str): Chunk or query text.
+
+    Returns:
+        list[str]: Terms in order.
+    """
+    terms = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]  # herbs → herb, doshas → dosha
+        terms.append(word)
+    return terms
+#endregion
+
+#region Index
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring, stored as plain NumPy arrays.
+
+    Postings are kept CSR-style: the documents containing vocabulary term t are
+    `postings_docs[offsets[t]:offsets[t + 1]]` with term frequencies in `postings_tf`.
+    The whole index is one `.npz` file (no pickle).
+
+    Args:
+        doc_ids (np.ndarray): Docstore ID per document (unicode array).
+        vocabulary (dict[str, int]): Term → row in `offsets`.
+        offsets (np.ndarray): int64, len(vocabulary) + 1.
+        postings_docs (np.ndarray): int32 document numbers.
+        postings_tf (np.ndarray): float32 term frequencies.
+        doc_lengths (np.ndarray): float32 terms per document.
+    """
+
+    def __init__(self, doc_ids, vocabulary, offsets, postings_docs, postings_tf, doc_lengths):
+        self.doc_ids = doc_ids
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        self.postings_tf = postings_tf
+        self.doc_lengths = doc_lengths
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, doc_ids: list, texts: list) -> "BM25Index":
+        """
+        Index `texts`.
+
+        Args:
+            doc_ids (list[str]): Docstore ID per text.
+            texts (list[str]): Chunk texts.
+
+        Returns:
+            BM25Index: The index.
+        """
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for number, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths[number] = len(terms)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((number, count))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for row, term in enumerate(terms):
+            offsets[row + 1] = offsets[row] + len(postings[term])
+        flat = [posting for term in terms for posting in postings[term]]
+        postings_docs = np.fromiter((number for number, _ in flat), dtype=np.int32, count=len(flat))
+        postings_tf = np.fromiter((count for _, count in flat), dtype=np.float32, count=len(flat))
+        return cls(np.asarray(doc_ids, dtype=str), {term: row for row, term in enumerate(terms)},
+                   offsets, postings_docs, postings_tf, doc_lengths)
+
+    def save(self, index_dir: str) -> None:
+        """Write the index next to the FAISS files (atomically)."""
+        path = Path(index_dir) / BM25_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, doc_ids=self.doc_ids, terms=np.asarray(list(self.vocabulary), dtype=str),
+                     offsets=self.offsets, postings_docs=self.postings_docs,
+                     postings_tf=self.postings_tf, doc_lengths=self.doc_lengths)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, index_dir: str):
+        """
+        Load the index saved by `save`.
+
+        Args:
+            index_dir (str): VECTOR_DB_PATH.
+
+        Returns:
+            BM25Index | None: None when the index was built before BM25 support.
+        """
+        path = Path(index_dir) / BM25_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            terms = data["terms"].tolist()
+            return cls(data["doc_ids"], {term: row for row, term in enumerate(terms)}, data["offsets"],
+                       data["postings_docs"], data["postings_tf"], data["doc_lengths"])
+
+    def search(self, query: str, k: int) -> list:
+        """
+        Return the k best-scoring documents for `query`.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of documents.
+
+        Returns:
+            list[tuple[str, float]]: (docstore id, BM25 score) pairs, best first;
+            documents sharing no term with the query are never returned.
+        """
+        n_docs = len(self.doc_ids)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            row = self.vocabulary.get(term)
+            if row is None:
+                continue
+            start, end = self.offsets[row], self.offsets[row + 1]
+            docs, tf = self.postings_docs[start:end], self.postings_tf[start:end]
+            idf = math.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[docs] / max(self.avg_length, 1e-9))
+            scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(str(self.doc_ids[i]), float(scores[i])) for i in top]
+#endregion
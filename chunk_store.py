@@ -0,0 +1,229 @@
+#region Imports
+import os
+import json
+import sqlite3
+import weakref
+import logging
+import threading
+from pathlib import Path
+from collections.abc import Mapping
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+#endregion
+
+#region Config
+# Both names start with "index." so they are part of the index fingerprint.
+FAISS_FILE = "index.faiss"
+CHUNK_STORE_FILE = "index.chunks.sqlite"
+LEGACY_PICKLE_FILE = "index.pkl"  # LangChain's save_local docstore (pickle); migrated at ingestion
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Read-only views
+class ChunkStoreReplacedError(RuntimeError):
+    """The chunk store file was replaced after its FAISS index was loaded; reload both together."""
+
+class _Connections:
+    """
+    Read-only access to the chunk store file that was in place when the index was loaded.
+
+    Ingestion renames a new file into place. One connection is opened at load time and shared
+    by every thread (Streamlit reruns, asyncio executors), so threads started later still read
+    the rows that match the memory-mapped FAISS index rather than reopening the path.
+
+    A forked worker (see `prefork`) cannot use the parent's connection. It reopens the path
+    only if the file is still the one loaded, else raises `ChunkStoreReplacedError`
+    (`shared_resources` reloads a rebuilt index in new workers before that happens).
+    """
+
+    _instances = weakref.WeakSet()
+    _inherited = []  # the parent's connections in a forked child: never used, never closed
+
+    def __init__(self, path: Path):
+        self.path = path.resolve()
+        # immutable=1: the file is replaced atomically, never written in place, so no locking is needed.
+        self.uri = f"{self.path.as_uri()}?mode=ro&immutable=1"
+        self._lock = threading.Lock()
+        while True:  # stat on both sides of the open, so `identity` is the file actually opened
+            self.identity = self._stat()
+            self._connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            if self._stat() == self.identity:
+                break
+            self._connection.close()
+        _Connections._instances.add(self)
+
+    def _stat(self) -> tuple:
+        stat = self.path.stat()
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def _forget_after_fork(cls) -> None:
+        for connections in list(cls._instances):
+            connections._lock = threading.Lock()  # another parent thread may have held it
+            if connections._connection is not None:
+                cls._inherited.append(connections._connection)
+                connections._connection = None
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """Run a read query on the loaded snapshot and return all rows."""
+        with self._lock:
+            if self._connection is None:
+                if self._stat() != self.identity:
+                    raise ChunkStoreReplacedError(f"{self.path} was replaced after the index was loaded")
+                self._connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            return self._connection.execute(sql, params).fetchall()
+
+os.register_at_fork(after_in_child=_Connections._forget_after_fork)
+
+class SQLiteDocstore(Docstore):
+    """
+    Docstore reading chunk text and metadata by ID from the SQLite chunk store on demand.
+
+    Nothing is loaded up front; SQLite's pages live in the OS page cache, which every
+    worker process serving the same index shares.
+
+    Args:
+        connections (_Connections): The loaded chunk store (shared by the docstore and position map).
+    """
+
+    def __init__(self, connections: _Connections):
+        self._connections = connections
+
+    def search(self, search: str):
+        """
+        Return the chunk with docstore ID `search`.
+
+        Returns:
+            Document | str: The chunk, or a "not found" message like `InMemoryDocstore`.
+        """
+        rows = self._connections.query("SELECT text, metadata FROM chunks WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=rows[0][0], metadata=json.loads(rows[0][1]))
+
+    def __len__(self) -> int:
+        return self._connections.query("SELECT COUNT(*) FROM chunks")[0][0]
+
+class PositionMap(Mapping):
+    """
+    Read-only `index_to_docstore_id` (FAISS row → docstore ID) backed by the chunk store.
+
+    Args:
+        connections (_Connections): The loaded chunk store (shared by the docstore and position map).
+    """
+
+    def __init__(self, connections: _Connections):
+        self._connections = connections
+
+    def __getitem__(self, position: int) -> str:
+        rows = self._connections.query("SELECT id FROM chunks WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self):
+        return (position for (position,) in self._connections.query("SELECT position FROM chunks ORDER BY position"))
+
+    def __len__(self) -> int:
+        return self._connections.query("SELECT COUNT(*) FROM chunks")[0][0]
+#endregion
+
+#region Load / save
+def has_chunk_store(index_dir: str) -> bool:
+    """Return True when `index_dir` holds an index in the pickle-free format."""
+    return (Path(index_dir) / CHUNK_STORE_FILE).exists() and (Path(index_dir) / FAISS_FILE).exists()
+
+def _read_index(path: Path, mmap: bool):
+    """Read a FAISS index, memory-mapping its vectors when `mmap` (falls back to a normal read)."""
+    import faiss
+    if mmap:
+        try:
+            # Flat codes and HNSW storage stay in the file mapping: no copy, shared page cache.
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP_IFC)
+        except RuntimeError as exc:
+            logger.info("Index type cannot be memory-mapped (%s); reading it into memory", exc)
+    return faiss.read_index(str(path))
+
+def load_store(index_dir: str, embeddings, mmap: bool = True) -> FAISS:
+    """
+    Open a saved index for querying without unpickling anything.
+
+    The FAISS file is memory-mapped and chunks are read lazily from SQLite, so opening
+    takes milliseconds regardless of library size. The result is read-only.
+
+    Args:
+        index_dir (str): VECTOR_DB_PATH.
+        embeddings (Embeddings): Query embedder.
+        mmap (bool): Memory-map the vectors instead of reading them into memory.
+
+    Returns:
+        FAISS: LangChain store over the mapped index.
+    """
+    path = Path(index_dir)
+    chunks = _Connections(path / CHUNK_STORE_FILE)
+    return FAISS(embeddings, _read_index(path / FAISS_FILE, mmap), SQLiteDocstore(chunks), PositionMap(chunks))
+
+def load_editable_store(index_dir: str, embeddings) -> FAISS:
+    """
+    Load a saved index fully into memory so ingestion can add and delete chunks.
+
+    Indexes still in LangChain's pickle format (written before the chunk store existed)
+    are read with `FAISS.load_local` once; `save_store` then migrates them.
+
+    Args:
+        index_dir (str): VECTOR_DB_PATH.
+        embeddings (Embeddings): Embedder used at ingestion.
+
+    Returns:
+        FAISS: Store with an in-memory docstore.
+    """
+    path = Path(index_dir)
+    if not (path / CHUNK_STORE_FILE).exists():
+        logger.warning("Loading legacy pickled docstore from %s (trusted path only)", path)
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    documents, positions = {}, {}
+    with sqlite3.connect(f"{(path / CHUNK_STORE_FILE).resolve().as_uri()}?mode=ro", uri=True) as connection:
+        for position, doc_id, text, metadata in connection.execute(
+                "SELECT position, id, text, metadata FROM chunks ORDER BY position"):
+            documents[doc_id] = Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            positions[position] = doc_id
+    return FAISS(embeddings, _read_index(path / FAISS_FILE, mmap=False), InMemoryDocstore(documents), positions)
+
+def save_store(vector_store: FAISS, index_dir: str) -> None:
+    """
+    Write the FAISS index and the SQLite chunk store, replacing any legacy pickle.
+
+    Each file is written to a temporary name and renamed into place, so readers
+    never see a half-written file.
+
+    Args:
+        vector_store (FAISS): Store to save (any docstore that supports `search`).
+        index_dir (str): VECTOR_DB_PATH.
+    """
+    import faiss
+    path = Path(index_dir)
+    path.mkdir(parents=True, exist_ok=True)
+
+    chunks_tmp = path / (CHUNK_STORE_FILE + ".tmp")
+    chunks_tmp.unlink(missing_ok=True)
+    connection = sqlite3.connect(chunks_tmp)
+    try:
+        connection.execute("CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+                           "text TEXT NOT NULL, metadata TEXT NOT NULL)")
+        rows = ((position, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                for position, doc_id in sorted(vector_store.index_to_docstore_id.items())
+                for doc in (vector_store.docstore.search(doc_id),))
+        connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+    faiss_tmp = path / (FAISS_FILE + ".tmp")
+    faiss.write_index(vector_store.index, str(faiss_tmp))
+    faiss_tmp.replace(path / FAISS_FILE)
+    chunks_tmp.replace(path / CHUNK_STORE_FILE)
+    (path / LEGACY_PICKLE_FILE).unlink(missing_ok=True)
+#endregion
@@ -0,0 +1,97 @@
+#region Imports
+import re
+#endregion
+
+#region Config
+# Bump whenever the keyword lists change; it is part of the ingestion settings, so
+# existing indexes are re-tagged (vectors come from the embedding cache, not the API).
+TAGGER_VERSION = "1"
+
+# Option lists of the Streamlit pages; "General" / "Overall" mean "no filter".
+DOSHAS = ["Vata", "Pitta", "Kapha"]
+REMEDY_CATEGORIES = [
+    "Herbal/Ayurvedic medications",
+    "Dietary/Nutritional Changes",
+    "Yoga Postures/Exercise",
+    "Cleansing Procedures",
+    "Breathing Exercises",
+]
+
+# NOTE: Keyword stems tuned on the Book.pdf vocabulary (Lad-style home remedies).
+# Cheap and local: a chunk is tagged when any stem starts a word in it.
+_CATEGORY_KEYWORDS = {
+    "Herbal/Ayurvedic medications": [
+        "herb", "churna", "powder", "tea", "ghee", "triphala", "ashwagandha", "turmeric", "ginger",
+        "licorice", "guduchi", "shatavari", "brahmi", "neem", "aloe", "tulsi", "trikatu", "cardamom",
+        "cumin", "coriander", "fennel", "teaspoon", "capsule", "tablet", "decoction", "paste", "guggul",
+        "sandalwood", "oil", "massage",
+    ],
+    "Dietary/Nutritional Changes": [
+        "diet", "food", "eat", "meal", "fruit", "vegetable", "rice", "milk", "yogurt", "spic", "sweet",
+        "salt", "sour", "fried", "juice", "drink", "lassi", "kitchari", "nutrition", "fast",
+    ],
+    "Yoga Postures/Exercise": [
+        "yoga", "pose", "posture", "asana", "exercise", "stretch", "walk", "swim", "jog",
+        "shoulder stand", "cobra", "locust", "sun salutation", "lotus",
+    ],
+    "Cleansing Procedures": [
+        "cleans", "panchakarma", "enema", "basti", "nasya", "virechan", "vaman", "purgat", "detox",
+        "neti", "laxative", "tongue scrap", "gargl", "sweat",
+    ],
+    "Breathing Exercises": [
+        "pranayama", "breath", "bhastrika", "kapalabhati", "ujjayi", "shitali", "nostril",
+    ],
+}
+
+_DOSHA_PATTERN = re.compile(r"\b(vata|pitta|kapha)", re.IGNORECASE)
+_CATEGORY_PATTERNS = {
+    category: re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + ")", re.IGNORECASE)
+    for category, words in _CATEGORY_KEYWORDS.items()
+}
+#endregion
+
+#region Tagging
+def tag_chunk(text: str) -> dict:
+    """
+    Tag a chunk with the doshas and remedy categories it talks about.
+
+    Args:
+        text (str): Chunk text.
+
+    Returns:
+        dict: {"doshas": [...], "remedy_types": [...]} using the UI option labels; a chunk
+        mentioning no dosha is tagged "General".
+    """
+    doshas = sorted({match.capitalize() for match in _DOSHA_PATTERN.findall(text)}, key=DOSHAS.index)
+    remedy_types = [category for category in REMEDY_CATEGORIES if _CATEGORY_PATTERNS[category].search(text)]
+    return {"doshas": doshas or ["General"], "remedy_types": remedy_types}
+
+def matches_filters(metadata: dict, body_type: str, remedy_type: str) -> bool:
+    """
+    Check whether a chunk can answer a (body type, remedy type) query.
+
+    "General" and "Overall" accept everything; chunks from an index built before
+    tagging (no tag metadata) also match, so old indexes behave as before.
+
+    Args:
+        metadata (dict): Chunk metadata.
+        body_type (str): Requested body type (any case).
+        remedy_type (str): Requested remedy type (any case).
+
+    Returns:
+        bool: True if the chunk is a candidate.
+    """
+    if "doshas" not in metadata:
+        return True
+    body = (body_type or "general").lower()
+    rtype = (remedy_type or "overall").lower()
+    if body != "general" and body not in (d.lower() for d in metadata["doshas"]):
+        return False
+    if rtype != "overall" and rtype not in (r.lower() for r in metadata["remedy_types"]):
+        return False
+    return True
+
+def is_unfiltered(body_type: str, remedy_type: str) -> bool:
+    """True when the query accepts every chunk ("General" body type and "Overall" remedy type)."""
+    return (body_type or "general").lower() == "general" and (remedy_type or "overall").lower() == "overall"
+#endregion
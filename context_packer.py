@@ -0,0 +1,193 @@
+#region Imports
+import os
+import re
+import logging
+import threading
+from dotenv import load_dotenv
+from embedding_pipeline import token_counter
+from metrics import span
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# NOTE: 12 chunks × ~250 tokens is ~3k tokens before dedup; 2500 keeps the prompt bounded
+# while leaving every non-duplicate passage in for typical queries. 0 disables trimming.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2500))
+# Passages whose word 5-grams overlap this much (Jaccard) with a better-ranked one are dropped.
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+# The splitter overlaps neighbours by up to 200 characters; look a little further for the seam.
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 30
+# A trimmed tail shorter than this is not worth sending.
+MIN_TAIL_TOKENS = 40
+
+SEPARATOR = "\n\n"
+
+logger = logging.getLogger(__name__)
+_count_tokens = token_counter()
+_stats_lock = threading.Lock()
+_stats = {"packed": 0, "raw_tokens": 0, "packed_tokens": 0, "saved_tokens": 0,
+          "merged_chunks": 0, "dropped_duplicates": 0, "trimmed_passages": 0}
+#endregion
+
+#region Helpers
+def _overlap(first: str, second: str) -> int:
+    """
+    Return how many leading characters of `second` repeat the end of `first` (0 if none).
+
+    Args:
+        first (str): Earlier chunk text.
+        second (str): Possibly following chunk text.
+
+    Returns:
+        int: Overlap length in characters.
+    """
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    tail = first[-MAX_OVERLAP_CHARS:]
+    start = tail.find(probe)
+    while start != -1:
+        if second.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(probe, start + 1)
+    return 0
+
+def _shingles(text: str) -> set:
+    """Word 5-grams of `text` (lower-cased) for near-duplicate detection."""
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + 5]) for i in range(max(len(words) - 4, 1))}
+
+def _merge_neighbours(passages: list) -> tuple:
+    """
+    Merge chunks from the same page whose texts overlap into one passage.
+
+    Args:
+        passages (list[dict]): {"text", "page", "rank"} in rank order.
+
+    Returns:
+        tuple[list, int]: (merged passages in rank order, number of merges).
+    """
+    merges = 0
+    merged = True
+    while merged:
+        merged = False
+        for i, a in enumerate(passages):
+            for j, b in enumerate(passages):
+                if i == j or a["page"] is None or a["page"] != b["page"]:
+                    continue
+                overlap = _overlap(a["text"], b["text"])
+                if overlap:
+                    # Keep the better rank so the merged passage is ordered like its best chunk.
+                    a.update(text=a["text"] + b["text"][overlap:], rank=min(a["rank"], b["rank"]))
+                    del passages[j]
+                    merges += 1
+                    merged = True
+                    break
+            if merged:
+                break
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages, merges
+
+def _trim(text: str, max_tokens: int) -> str:
+    """Cut `text` to roughly `max_tokens`, ending at a sentence or word boundary."""
+    # Estimate the cut from the token/char ratio, then shrink until it fits.
+    cut = max(int(len(text) * max_tokens / max(_count_tokens(text), 1)), 1)
+    while cut > 0 and _count_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    head = text[:cut]
+    boundary = max(head.rfind(". "), head.rfind("\n"))
+    if boundary > len(head) // 2:
+        return head[:boundary + 1]
+    return head.rsplit(" ", 1)[0]
+#endregion
+
+#region Public API
+def pack_context(docs: list, budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> dict:
+    """
+    Turn retrieved chunks into a compact prompt context.
+
+    Steps:
+        1. Merge chunks from the same page that overlap (the splitter repeats up to
+           200 characters between neighbours) into one passage.
+        2. Drop passages that are near-duplicates of a better-ranked one.
+        3. Keep passages in score order (the retrieval order; a merged passage takes
+           the rank of its best chunk).
+        4. Add passages until the tiktoken budget is reached; the passage that crosses
+           it is trimmed at a sentence boundary.
+
+    Args:
+        docs (list[Document]): Retrieved chunks, best first.
+        budget_tokens (int): Token budget for the joined context; 0 disables trimming.
+        dedup_threshold (float): Jaccard similarity above which a passage is a duplicate.
+
+    Returns:
+        dict: {"text", "tokens", "raw_tokens", "saved_tokens"}; `raw_tokens` is what
+        the plain "\\n\\n" join of all chunks would have cost.
+    """
+    with span("pack_context", chunks=len(docs)):
+        return _pack(docs, budget_tokens, dedup_threshold)
+
+def _pack(docs: list, budget_tokens: int, dedup_threshold: float) -> dict:
+    """Body of `pack_context` (timed as one step)."""
+    raw_text = SEPARATOR.join(doc.page_content for doc in docs).strip()
+    raw_tokens = _count_tokens(raw_text) if raw_text else 0
+
+    passages = []
+    for rank, doc in enumerate(docs):
+        metadata = getattr(doc, "metadata", None) or {}
+        page = (metadata.get("source"), metadata.get("page")) if "page" in metadata else None
+        passages.append({"text": doc.page_content.strip(), "page": page, "rank": rank})
+    passages, merges = _merge_neighbours(passages)
+
+    kept, kept_shingles, duplicates = [], [], 0
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        if any(len(shingles & other) / max(len(shingles | other), 1) >= dedup_threshold
+               for other in kept_shingles):
+            duplicates += 1
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+
+    parts, used, trimmed = [], 0, 0
+    separator_tokens = _count_tokens(SEPARATOR)
+    for passage in kept:
+        tokens = _count_tokens(passage["text"])
+        cost = tokens + (separator_tokens if parts else 0)
+        if budget_tokens and used + cost > budget_tokens:
+            remaining = budget_tokens - used - (separator_tokens if parts else 0)
+            if remaining >= MIN_TAIL_TOKENS:
+                parts.append(_trim(passage["text"], remaining))
+                trimmed += 1
+            break
+        parts.append(passage["text"])
+        used += cost
+
+    text = SEPARATOR.join(parts).strip()
+    tokens = _count_tokens(text) if text else 0
+    saved = max(raw_tokens - tokens, 0)
+    with _stats_lock:
+        _stats["packed"] += 1
+        _stats["raw_tokens"] += raw_tokens
+        _stats["packed_tokens"] += tokens
+        _stats["saved_tokens"] += saved
+        _stats["merged_chunks"] += merges
+        _stats["dropped_duplicates"] += duplicates
+        _stats["trimmed_passages"] += trimmed
+    logger.info("Context packed: %d → %d tokens (saved %d; %d merged, %d duplicates dropped)",
+                raw_tokens, tokens, saved, merges, duplicates)
+    return {"text": text, "tokens": tokens, "raw_tokens": raw_tokens, "saved_tokens": saved}
+
+def packing_signature() -> str:
+    """Packer settings that change prompt text; part of the response cache key."""
+    return f"budget={CONTEXT_TOKEN_BUDGET}|dedup={CONTEXT_DEDUP_THRESHOLD}"
+
+def packer_stats() -> dict:
+    """Return cumulative token counts (raw vs packed) across all packed contexts."""
+    with _stats_lock:
+        return dict(_stats)
+#endregion
@@ -0,0 +1,259 @@
+#region Imports
+import os
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# OpenAI allows far more per request, but smaller batches retry cheaply after a 429.
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", 20000))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))  # hard cap on texts per request
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 6))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Token counting
+def token_counter():
+    """Return a text → token-count function (tiktoken when available, else ~4 chars/token)."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:  # tiktoken missing or its encoding file cannot be downloaded
+        return lambda text: len(text) // 4 + 1
+
+def batch_by_tokens(texts: list, max_tokens: int, max_size: int, count_tokens) -> list:
+    """
+    Group texts into consecutive batches that stay under a token budget.
+
+    Args:
+        texts (list[str]): Texts to embed.
+        max_tokens (int): Token budget per batch (a single longer text gets its own batch).
+        max_size (int): Maximum texts per batch.
+        count_tokens (Callable[[str], int]): Token counter.
+
+    Returns:
+        list[list[int]]: Batches of indexes into `texts`.
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+#endregion
+
+#region Disk cache
+class EmbeddingDiskCache:
+    """
+    Append-only on-disk vector cache keyed by (model, text hash).
+
+    Vectors live in one raw float32 file per model and are read back through a
+    memory map; a small SQLite table maps text hash → row. Vectors are appended
+    before their rows are committed, so a crash can only leave unreferenced rows.
+
+    Args:
+        directory (str): Cache directory (created if missing).
+        model (str): Embedding model name; each model gets its own files.
+    """
+
+    def __init__(self, directory: str, model: str):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        stem = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.vectors_path = Path(directory) / f"{stem}.f32"
+        self._db = sqlite3.connect(Path(directory) / f"{stem}.sqlite", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._lock = threading.Lock()
+        self._memmap = None
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Return the cache key for `text`."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _rows(self):
+        """Memory-map the vector file, re-mapping when it has grown; caller holds the lock."""
+        rows = self.vectors_path.stat().st_size // (self.dim * 4) if self.vectors_path.exists() else 0
+        if self._memmap is None or self._memmap.shape[0] < rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+        return self._memmap
+
+    def get_many(self, hashes: list) -> dict:
+        """
+        Look up cached vectors.
+
+        Args:
+            hashes (list[str]): Text hashes.
+
+        Returns:
+            dict: hash → list[float] for the hashes that are cached.
+        """
+        if self.dim is None or not hashes:
+            return {}
+        with self._lock:
+            found = {}
+            for start in range(0, len(hashes), 500):  # stay under SQLite's variable limit
+                part = hashes[start:start + 500]
+                marks = ",".join("?" * len(part))
+                found.update(self._db.execute(f"SELECT hash, row FROM vectors WHERE hash IN ({marks})", part).fetchall())
+            if not found:
+                return {}
+            matrix = self._rows()
+            return {h: matrix[row].tolist() for h, row in found.items() if matrix is not None and row < matrix.shape[0]}
+
+    def put_many(self, items: dict) -> None:
+        """
+        Append vectors and index them.
+
+        Args:
+            items (dict): hash → vector.
+        """
+        if not items:
+            return
+        array = np.asarray(list(items.values()), dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = array.shape[1]
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            first_row = self.vectors_path.stat().st_size // (self.dim * 4) if self.vectors_path.exists() else 0
+            with open(self.vectors_path, "ab") as f:
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._db.executemany("INSERT OR REPLACE INTO vectors (hash, row) VALUES (?, ?)",
+                                 [(h, first_row + i) for i, h in enumerate(items)])
+            self._db.commit()
+#endregion
+
+#region Embedder
+def _is_rate_limit(error: Exception) -> bool:
+    """Recognise HTTP 429 errors from openai (RateLimitError) or any client exposing status_code."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def _retry_after(error: Exception):
+    """Return the server's Retry-After hint in seconds, if the error carries one."""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that batches by token budget, bounds concurrency, backs off on 429s
+    and caches vectors on disk.
+
+    It can be passed anywhere LangChain expects an `Embeddings` object (e.g.
+    `FAISS.from_documents`). Duplicate texts in a call are embedded once, and texts
+    already cached for this model are not sent at all, so re-running ingestion after
+    a crash or a splitter tweak only embeds what is missing.
+
+    Args:
+        base (Embeddings): Underlying embedder (OpenAIEmbeddings or FakeEmbeddings).
+        model (str): Model name used to key the disk cache.
+        cache_dir (str | None): Disk cache directory; None disables caching.
+        max_batch_tokens (int): Token budget per request.
+        max_batch_size (int): Maximum texts per request.
+        max_concurrency (int): Requests in flight at once.
+        max_retries (int): Retries per batch on rate limits / transient errors.
+    """
+
+    def __init__(self, base, model, cache_dir=EMBEDDING_CACHE_DIR, max_batch_tokens=EMBED_BATCH_TOKENS,
+                 max_batch_size=EMBED_BATCH_SIZE, max_concurrency=EMBED_MAX_CONCURRENCY,
+                 max_retries=EMBED_MAX_RETRIES):
+        self.base = base
+        self.model = model
+        self.cache = EmbeddingDiskCache(cache_dir, model) if cache_dir else None
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.max_retries = max_retries
+        self.count_tokens = token_counter()
+        self.stats = {"texts": 0, "cached": 0, "embedded": 0, "requests": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        """Increment a stats counter (batches run on several threads)."""
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _embed_batch(self, texts: list) -> list:
+        """Embed one batch, retrying with exponential backoff (or Retry-After) on failure."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count("requests")
+                return self.base.embed_documents(texts)
+            except Exception as error:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                delay = _retry_after(error) or min(2 ** attempt, 60) * (0.5 + random.random())
+                if _is_rate_limit(error):
+                    logger.warning("Embedding rate limited; retrying in %.1fs", delay)
+                time.sleep(delay)
+
+    def embed_documents(self, texts: list) -> list:
+        """
+        Embed `texts`, serving cached vectors and batching the rest.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text, in order.
+        """
+        hashes = [EmbeddingDiskCache.text_hash(text) for text in texts]
+        vectors = self.cache.get_many(list(set(hashes))) if self.cache else {}
+        self._count("texts", len(texts))
+        self._count("cached", sum(1 for h in hashes if h in vectors))
+
+        unique = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors:
+                unique.setdefault(h, text)
+        missing_hashes, missing_texts = list(unique), list(unique.values())
+        batches = batch_by_tokens(missing_texts, self.max_batch_tokens, self.max_batch_size, self.count_tokens)
+
+        def run(batch):
+            embedded = self._embed_batch([missing_texts[i] for i in batch])
+            results = {missing_hashes[i]: vector for i, vector in zip(batch, embedded)}
+            # Persist per batch so a crash mid-run keeps everything embedded so far.
+            if self.cache:
+                self.cache.put_many(results)
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for results in pool.map(run, batches):
+                vectors.update(results)
+                self._count("embedded", len(results))
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text: str) -> list:
+        """Embed a single query (not cached; queries have their own cache in `retrieval`)."""
+        return self.base.embed_query(text)
+#endregion
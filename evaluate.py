@@ -1,12 +1,37 @@
 #region Imports
+import os
 import csv
+import time
+import random
+import argparse
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from context_packer import packer_stats
 from langchain_remedy import find_remedy
 from langgraph_remedy import get_remedy_graph
+from bm25_index import tokenize
+from chunk_tags import matches_filters
+from reranker import RERANK_FETCH_K
+from retrieval import cache_stats, resolve_hits, search_hits, select_hits
+from response_cache import response_cache
+from shared_resources import resource_stats
 #endregion
 
 #region Setup
 graph = get_remedy_graph()
+
+# Throughput knobs; override on the command line. 0 for the rate means "no limit".
+EVAL_MAX_IN_FLIGHT = int(os.getenv("EVAL_MAX_IN_FLIGHT", 4))
+EVAL_ROWS_PER_SECOND = float(os.getenv("EVAL_ROWS_PER_SECOND", 0))
+EVAL_MAX_RETRIES = int(os.getenv("EVAL_MAX_RETRIES", 3))
+# --rerank-sweep: a chunk counts as evidence when it names at least this share of the ailment's terms.
+EVIDENCE_TERM_SHARE = 0.5
+
+# (desc, body, remedy, lc_preview, lg_preview, lc_found, lg_found)
+FIELDNAMES = ["ailment_description", "body_type", "remedy_type",
+              "langchain_preview", "langgraph_preview",
+              "langchain_found", "langgraph_found"]
 #endregion
 
 #region Helpers
@@ -18,7 +43,7 @@ def read_test_cases(csv_path):
         csv_path (str): Path to the CSV file containing test case data.
 
     Returns:
-        List[Dict[str, str]]: A list of rows from the CSV file, where each row 
+        List[Dict[str, str]]: A list of rows from the CSV file, where each row
         is represented as a dictionary with column headers as keys.
 
     Raises:
@@ -27,21 +52,90 @@ def read_test_cases(csv_path):
     csv_path = Path(csv_path)
     if not csv_path.exists():
         raise FileNotFoundError(f"CSV file not found: {csv_path}")
-    
+
     with csv_path.open(newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         return [row for row in reader]
-#endregion
 
-#region Processing test cases
-remedies_array = []
-total_cases = 0
-langchain_remedies_found = 0
-langgraph_remedies_found = 0
+def case_key(row):
+    """Identify a test case (and its result row) by its three inputs."""
+    return (row["ailment_description"], row["body_type"], row["remedy_type"])
+
+def read_completed(out_path):
+    """
+    Load results already written by an earlier (possibly interrupted) run.
+
+    Args:
+        out_path (Path): Results CSV.
+
+    Returns:
+        dict: case_key → result row. Empty if the file is missing or was written
+        with a different header (e.g. by the old serial script), so it gets rebuilt.
+    """
+    if not out_path.exists():
+        return {}
+    with out_path.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != FIELDNAMES:
+            return {}
+        return {case_key(row): row for row in reader}
+
+class RateLimiter:
+    """
+    Space out row starts so that at most `rows_per_second` begin each second.
+
+    Args:
+        rows_per_second (float): Target start rate; 0 or less disables limiting.
+    """
 
-cases = read_test_cases("remedy_test_cases.csv")
+    def __init__(self, rows_per_second):
+        self.interval = 1.0 / rows_per_second if rows_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = time.monotonic()
 
-for case in cases:
+    def wait(self):
+        """Block until the caller may start its next row."""
+        if not self.interval:
+            return
+        with self._lock:
+            start_at = max(self._next_start, time.monotonic())
+            self._next_start = start_at + self.interval
+        time.sleep(max(start_at - time.monotonic(), 0))
+
+def with_retry(func, max_retries, base_delay=1.0):
+    """
+    Call `func`, retrying with exponential backoff and jitter when it raises.
+
+    Args:
+        func (Callable[[], T]): Zero-argument call to attempt.
+        max_retries (int): Retries after the first attempt.
+        base_delay (float): Delay before the first retry, doubled each time.
+
+    Returns:
+        T: The first successful result.
+
+    Raises:
+        Exception: The last error once retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            # Jitter keeps parallel workers from retrying into the same rate-limit window.
+            time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+
+def evaluate_case(case):
+    """
+    Run one test case through both pipelines.
+
+    Args:
+        case (dict): Row with `ailment_description`, `body_type`, `remedy_type`.
+
+    Returns:
+        dict: Result row keyed by FIELDNAMES.
+    """
     # Run through LangChain pipeline
     langchain_remedy = find_remedy(case["ailment_description"], case["remedy_type"], case["body_type"])
     found_using_langchain = not ("No remedy found" in langchain_remedy)
@@ -63,36 +157,190 @@ for case in cases:
     found_using_langgraph = not ("None" in langgraph_remedy["response"])
 
     # Store only first 100 chars of each remedy preview to keep CSV compact
-    remedies_array.append((
-        case["ailment_description"],
-        case["body_type"],
-        case["remedy_type"],
-        langchain_remedy[:100],
-        langgraph_remedy["response"][:100]
-    ))
-
-    total_cases += 1
-    langchain_remedies_found += int(found_using_langchain)
-    langgraph_remedies_found += int(found_using_langgraph)
-    print("Working on remedy for ailment description ", total_cases)
+    return {
+        "ailment_description": case["ailment_description"],
+        "body_type": case["body_type"],
+        "remedy_type": case["remedy_type"],
+        "langchain_preview": langchain_remedy[:100],
+        "langgraph_preview": langgraph_remedy["response"][:100],
+        "langchain_found": int(found_using_langchain),
+        "langgraph_found": int(found_using_langgraph),
+    }
 #endregion
 
-#region Summary output
-print("Summary:")
-print(f"  Total cases              : {total_cases}")
-print(f"  LangChain remedies found : {langchain_remedies_found}")
-print(f"  LangGraph remedies found : {langgraph_remedies_found}")
+#region Rerank sweep
+def is_evidence(doc, case):
+    """
+    Proxy label for "this chunk can answer the case" (no LLM call): the chunk is tagged
+    for the case's body/remedy type and names at least EVIDENCE_TERM_SHARE of the ailment terms.
+    """
+    metadata = getattr(doc, "metadata", None) or {}
+    if not matches_filters(metadata, case["body_type"], case["remedy_type"]):
+        return False
+    terms = set(tokenize(case["ailment_description"]))
+    return bool(terms) and len(terms & set(tokenize(doc.page_content))) >= EVIDENCE_TERM_SHARE * len(terms)
+
+def rerank_hit_rates(cases, ns, fetch_k=RERANK_FETCH_K):
+    """
+    Hit rate versus prompt size N, with and without the reranker.
+
+    For every case the first stage fetches `fetch_k` candidates once; a case is a hit at
+    N when one of the N chunks sent to the LLM is evidence (see `is_evidence`).
+
+    Args:
+        cases (list[dict]): Test cases.
+        ns (list[int]): Prompt sizes to report.
+        fetch_k (int): First-stage candidates.
+
+    Returns:
+        dict: N → {"first_stage": rate, "reranked": rate, "answerable": rate}; "answerable"
+        is the share of cases with any evidence among the `fetch_k` candidates (the ceiling).
+    """
+    top = max(ns)
+    hits = {n: {"first_stage": 0, "reranked": 0} for n in ns}
+    answerable = 0
+    for case in cases:
+        ailment, body, remedy = case["ailment_description"], case["body_type"], case["remedy_type"]
+        pool = search_hits(ailment, max(fetch_k, top))
+        evidence = {doc_id for (doc_id, _), (doc, _) in zip(pool, resolve_hits(pool)) if is_evidence(doc, case)}
+        answerable += bool(evidence)
+        for label, reranked in (("first_stage", False), ("reranked", True)):
+            selected = [doc_id for doc_id, _ in select_hits(ailment, pool, body, remedy, top, reranked)]
+            for n in ns:
+                hits[n][label] += bool(evidence & set(selected[:n]))
+    total = max(len(cases), 1)
+    return {n: {label: count / total for label, count in hits[n].items()} | {"answerable": answerable / total}
+            for n in ns}
 #endregion
 
-#region Save results
-out_path = Path("results_compare.csv")
+#region Batch runner
+def run_batch(cases, out_path, max_in_flight=EVAL_MAX_IN_FLIGHT, rows_per_second=EVAL_ROWS_PER_SECOND,
+              max_retries=EVAL_MAX_RETRIES, fresh=False):
+    """
+    Evaluate `cases` concurrently, appending each finished row to `out_path` as it completes.
+
+    Rows already present in `out_path` are skipped, so re-running after a crash or
+    Ctrl-C resumes where the last run stopped. When every case is done the file is
+    rewritten in test-case order so results diff cleanly between runs.
+
+    Args:
+        cases (list[dict]): Test cases.
+        out_path (Path): Results CSV.
+        max_in_flight (int): Worker threads (rows evaluated at the same time).
+        rows_per_second (float): Start-rate limit; 0 disables it.
+        max_retries (int): Retries per row before it is reported as failed.
+        fresh (bool): Ignore and overwrite existing results.
+
+    Returns:
+        tuple[dict, list]: (case_key → result row, [(case, error), ...] for failed rows).
+    """
+    completed = {} if fresh else read_completed(out_path)
+    pending = [case for case in cases if case_key(case) not in completed]
+    if completed:
+        print(f"Resuming: {len(completed)} cases already done, {len(pending)} to go")
+
+    if not completed:
+        with out_path.open("w", newline="", encoding="utf-8") as f:
+            csv.DictWriter(f, fieldnames=FIELDNAMES).writeheader()
+
+    limiter = RateLimiter(rows_per_second)
+    write_lock = threading.Lock()
+    failures = []
+
+    def task(case):
+        limiter.wait()
+        return with_retry(lambda: evaluate_case(case), max_retries)
+
+    pool = ThreadPoolExecutor(max_workers=max(max_in_flight, 1))
+    with out_path.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        futures = {pool.submit(task, case): case for case in pending}
+        try:
+            for future in as_completed(futures):
+                case = futures[future]
+                try:
+                    row = future.result()
+                except Exception as error:
+                    failures.append((case, error))
+                    print(f"Failed after {max_retries} retries: {case_key(case)}: {error}")
+                    continue
+                with write_lock:
+                    writer.writerow(row)
+                    f.flush()  # a crash after this point never loses the row
+                    completed[case_key(case)] = row
+                print("Working on remedy for ailment description ", len(completed))
+        except BaseException:
+            # NOTE: On Ctrl-C (or any error) drop the queued cases instead of waiting for all of them;
+            # only the rows already in flight finish, and the next run resumes from the saved results.
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    pool.shutdown()
+
+    if not failures:
+        with out_path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(completed[case_key(case)] for case in cases)
+    return completed, failures
+#endregion
+
+#region Entry point
+def main():
+    """Parse CLI options, run the batch evaluation and print the summary."""
+    parser = argparse.ArgumentParser(description="Compare LangChain vs LangGraph remedy recall.")
+    parser.add_argument("--cases", default="remedy_test_cases.csv")
+    parser.add_argument("--out", default="results_compare.csv")
+    parser.add_argument("--max-in-flight", type=int, default=EVAL_MAX_IN_FLIGHT)
+    parser.add_argument("--rows-per-second", type=float, default=EVAL_ROWS_PER_SECOND)
+    parser.add_argument("--max-retries", type=int, default=EVAL_MAX_RETRIES)
+    parser.add_argument("--fresh", action="store_true", help="ignore existing results instead of resuming")
+    parser.add_argument("--rerank-sweep", metavar="N,N,...",
+                        help="only report retrieval hit rate vs prompt size N (no LLM calls), e.g. 2,4,6,8,12")
+    args = parser.parse_args()
+
+    cases = read_test_cases(args.cases)
+    if args.rerank_sweep:
+        rates = rerank_hit_rates(cases, sorted(int(n) for n in args.rerank_sweep.split(",")))
+        print(f"Hit rate vs N over {len(cases)} cases (first stage: top {RERANK_FETCH_K}):")
+        print(f"  {'N':>3}  {'first stage':>11}  {'reranked':>8}  {'ceiling':>7}")
+        for n, rate in rates.items():
+            print(f"  {n:>3}  {rate['first_stage']:>11.0%}  {rate['reranked']:>8.0%}  {rate['answerable']:>7.0%}")
+        return
+    out_path = Path(args.out)
+    started = time.perf_counter()
+    completed, failures = run_batch(cases, out_path, args.max_in_flight, args.rows_per_second,
+                                    args.max_retries, args.fresh)
+    elapsed = time.perf_counter() - started
+
+    rows = [completed[case_key(case)] for case in cases if case_key(case) in completed]
+    langchain_remedies_found = sum(int(row["langchain_found"]) for row in rows)
+    langgraph_remedies_found = sum(int(row["langgraph_found"]) for row in rows)
+
+    print("Summary:")
+    print(f"  Total cases              : {len(rows)}")
+    print(f"  Failed cases             : {len(failures)}")
+    print(f"  LangChain remedies found : {langchain_remedies_found}")
+    print(f"  LangGraph remedies found : {langgraph_remedies_found}")
+    print(f"  Wall time                : {elapsed:.1f}s")
+
+    # Both pipelines share one index/LLM instance; report what loading them cost this process.
+    stats = resource_stats()
+    for name, stat in stats["resources"].items():
+        print(f"  Loaded {name:<14}: {stat['load_seconds']:.3f}s, +{stat['rss_delta_bytes'] / 2**20:.1f} MiB RSS")
+    print(f"  Process RSS              : {stats['process_rss_bytes'] / 2**20:.1f} MiB")
+    for name, stat in cache_stats().items():
+        print(f"  Cache {name:<18}: {stat['hits'] + stat['disk_hits']} hits, {stat['misses']} misses")
+    stat = response_cache.stats()
+    print(f"  Cache remedy_responses  : {stat['hits'] + stat['disk_hits']} hits, "
+          f"{stat['semantic_hits']} near-duplicate hits, {stat['misses']} misses")
+
+    stat = packer_stats()
+    if stat["packed"]:
+        print(f"  Context tokens           : {stat['packed_tokens']} sent, {stat['saved_tokens']} saved "
+              f"({stat['saved_tokens'] / max(stat['raw_tokens'], 1):.0%}) over {stat['packed']} prompts")
 
-with out_path.open("w", newline="", encoding="utf-8") as f:
-    w = csv.writer(f)
-    # (desc, body, remedy, lc_preview, lg_preview)
-    w.writerow(["ailment_description", "body_type", "remedy_type",
-                "langchain_preview", "langgraph_preview"])  # header
-    w.writerows(remedies_array)
+    print(f"Saved to {out_path.resolve()}")
 
-print(f"Saved to {out_path.resolve()}")
+if __name__ == "__main__":
+    main()
 #endregion
@@ -0,0 +1,56 @@
+#region Imports
+import os
+from dotenv import load_dotenv
+from bm25_index import tokenize
+from chunk_tags import matches_filters
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Local pre-check before every LangGraph generation attempt: a (body_type, remedy_type) step
+# whose retrieved chunks show no evidence is routed to the next fallback step without an LLM
+# call. Off = tag signal only (the routing before the keyword check existed).
+EVIDENCE_PRECHECK = os.getenv("EVIDENCE_PRECHECK", "true").lower() == "true"
+
+# NOTE: Deliberately loose. A missed remedy ("No remedy found." for a step the LLM could have
+# answered) is worse than one extra LLM call, so one shared ailment term per chunk is enough.
+EVIDENCE_MIN_TERMS = int(os.getenv("EVIDENCE_MIN_TERMS", 1))
+#endregion
+
+#region Public API
+def chunk_has_evidence(query_terms: set, doc, body_type: str, remedy_type: str) -> bool:
+    """
+    Check one chunk: tagged for the filters (metadata signal) and naming the ailment (keyword signal).
+
+    Args:
+        query_terms (set[str]): `tokenize`d ailment terms.
+        doc (Document): Retrieved chunk.
+        body_type (str): Body type of the step.
+        remedy_type (str): Remedy type of the step.
+
+    Returns:
+        bool: True if the chunk could support a remedy for this step.
+    """
+    if not matches_filters(getattr(doc, "metadata", None) or {}, body_type, remedy_type):
+        return False
+    if not EVIDENCE_PRECHECK or not query_terms:
+        return True  # nothing to match on (e.g. a query of stopwords): leave it to the LLM
+    return len(query_terms & set(tokenize(getattr(doc, "page_content", "")))) >= min(EVIDENCE_MIN_TERMS, len(query_terms))
+
+def count_evidence(ailment_description: str, docs: list, body_type: str, remedy_type: str) -> int:
+    """
+    Count the retrieved chunks that show evidence for a (body_type, remedy_type) step.
+
+    Args:
+        ailment_description (str): Ailment text.
+        docs (list[Document]): The step's retrieved chunks.
+        body_type (str): Body type of the step.
+        remedy_type (str): Remedy type of the step.
+
+    Returns:
+        int: Chunks passing `chunk_has_evidence`; 0 means the LLM could only answer "No remedy found.".
+    """
+    query_terms = set(tokenize(ailment_description or ""))
+    return sum(chunk_has_evidence(query_terms, doc, body_type, remedy_type) for doc in docs)
+#endregion
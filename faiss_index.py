@@ -0,0 +1,258 @@
+#region Imports
+import os
+import math
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# flat | ivf_flat | hnsw | ivf_pq. Flat is exact brute force; the others trade a little
+# recall for speed/memory once the library grows (run bench_faiss_index.py to choose).
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", 0))  # IVF cells; 0 = about 4·sqrt(n)
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", 32))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", 200))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", 16))  # sub-quantizers; must divide the dimension
+FAISS_PQ_BITS = int(os.getenv("FAISS_PQ_BITS", 8))
+# Search-time knobs. They are saved inside the index at build time; setting them here
+# also overrides the saved value when the app loads the index.
+FAISS_NPROBE = os.getenv("FAISS_NPROBE", "")
+FAISS_EF_SEARCH = os.getenv("FAISS_EF_SEARCH", "")
+
+# How vectors are stored: float32 is exact; float16 / int8 scalar quantization halves / quarters
+# the memory (and the bytes scanned per query) at a small cost in recall. ivf_pq is already compressed.
+FAISS_STORAGE = os.getenv("FAISS_STORAGE", "float32").lower()
+# Keep only the first N dimensions of each vector, re-normalised: text-embedding-3 models are
+# trained so shortened vectors still rank well (the API's `dimensions` does the same). 0 = all.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+STORAGE_TYPES = ("float32", "float16", "int8")
+DEFAULT_NPROBE = 8
+DEFAULT_EF_SEARCH = 64
+# FAISS warns below ~39 training points per IVF cell.
+MIN_POINTS_PER_CELL = 39
+#endregion
+
+#region Config helpers
+def index_config(index_type: str = FAISS_INDEX_TYPE, storage: str = FAISS_STORAGE,
+                 dimensions: int = EMBEDDING_DIMENSIONS) -> dict:
+    """
+    Collect the build parameters for `index_type` from the environment.
+
+    Args:
+        index_type (str): One of INDEX_TYPES.
+        storage (str): One of STORAGE_TYPES (ignored for ivf_pq).
+        dimensions (int): Dimensions kept per vector; 0 keeps all.
+
+    Returns:
+        dict: {"type", ...parameters}; stored in the ingest manifest so a change
+        triggers a rebuild of the index (not of the embeddings). Default storage and
+        dimensions are left out, so manifests written before they existed still match.
+
+    Raises:
+        ValueError: For an unknown index type or storage type.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"FAISS_INDEX_TYPE must be one of {INDEX_TYPES}, got {index_type!r}")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"FAISS_STORAGE must be one of {STORAGE_TYPES}, got {storage!r}")
+    config = {"type": index_type}
+    if storage != "float32" and index_type != "ivf_pq":
+        config["storage"] = storage
+    if dimensions > 0:
+        config["dimensions"] = dimensions
+    if index_type in ("ivf_flat", "ivf_pq"):
+        config.update(nlist=FAISS_NLIST, nprobe=int(FAISS_NPROBE or DEFAULT_NPROBE))
+    if index_type == "ivf_pq":
+        config.update(pq_m=FAISS_PQ_M, pq_bits=FAISS_PQ_BITS)
+    if index_type == "hnsw":
+        config.update(m=FAISS_HNSW_M, ef_construction=FAISS_HNSW_EF_CONSTRUCTION,
+                      ef_search=int(FAISS_EF_SEARCH or DEFAULT_EF_SEARCH))
+    return config
+
+def describe(index) -> str:
+    """Return a short type name for a loaded FAISS index, e.g. "IndexHNSWFlat"."""
+    import faiss
+    return type(faiss.downcast_index(index)).__name__
+
+def vector_bytes(index) -> int:
+    """Bytes the index spends on stored vectors (codes), excluding graph/list overhead."""
+    import faiss
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    try:
+        return index.ntotal * index.sa_code_size()
+    except RuntimeError:
+        return index.ntotal * index.d * 4
+#endregion
+
+#region Build
+def _nlist(config: dict, n: int) -> int:
+    """Pick the number of IVF cells: configured or 4·sqrt(n), capped by the training set size."""
+    nlist = config.get("nlist") or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CELL or 1))
+
+def reduce_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Keep the first `dimensions` columns and re-normalise each row to unit length.
+
+    Args:
+        vectors (np.ndarray): One vector per row.
+        dimensions (int): Columns to keep; 0 or at least the current width keeps all.
+
+    Returns:
+        np.ndarray: Contiguous float32 matrix.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if not dimensions or dimensions >= vectors.shape[1]:
+        return vectors
+    reduced = np.ascontiguousarray(vectors[:, :dimensions])
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.where(norms > 0, norms, 1.0)
+
+def _scalar_quantizer(storage: str):
+    """FAISS scalar-quantizer type for `storage`, or None for exact float32."""
+    import faiss
+    return {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}.get(storage)
+
+def build_index(vectors: np.ndarray, config: dict):
+    """
+    Build (and train) a FAISS L2 index of the configured type over `vectors`.
+
+    Args:
+        vectors (np.ndarray): float32 matrix, one row per chunk, in docstore order.
+        config (dict): Output of `index_config`.
+
+    Returns:
+        faiss.Index: Index whose row i is `vectors[i]` (the FAISS wrapper's
+        `index_to_docstore_id` mapping stays valid), shortened to `config["dimensions"]`
+        and stored as `config["storage"]` when set.
+    """
+    import faiss
+    vectors = reduce_dimensions(vectors, config.get("dimensions", 0))
+    n, dim = vectors.shape
+    index_type = config["type"]
+    qtype = _scalar_quantizer(config.get("storage", "float32"))
+    if index_type == "flat":
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2) if qtype is not None else faiss.IndexFlatL2(dim)
+        index.train(vectors)  # no-op for float32; learns the value ranges for int8
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWSQ(dim, qtype, config["m"]) if qtype is not None else faiss.IndexHNSWFlat(dim, config["m"])
+        index.hnsw.efConstruction = config["ef_construction"]
+        index.hnsw.efSearch = config["ef_search"]
+        index.train(vectors)
+    else:
+        nlist = _nlist(config, n)
+        if index_type == "ivf_flat" and qtype is not None:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, nlist, qtype, faiss.METRIC_L2)
+        elif index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        else:
+            pq_m = config["pq_m"] if dim % config["pq_m"] == 0 else math.gcd(dim, config["pq_m"])
+            # Each sub-quantizer trains 2**bits centroids and FAISS wants MIN_POINTS_PER_CELL points
+            # per centroid, so small corpora get fewer bits (2**bits * MIN_POINTS_PER_CELL <= n).
+            bits = min(config["pq_bits"], max(int(math.log2(max(n // MIN_POINTS_PER_CELL, 2))), 1))
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, pq_m, bits)
+        index.train(vectors)
+        index.nprobe = min(config["nprobe"], nlist)
+    index.add(vectors)
+    return index
+
+def apply_search_params(index) -> None:
+    """
+    Override saved search-time parameters with FAISS_NPROBE / FAISS_EF_SEARCH, if set.
+
+    Args:
+        index (faiss.Index): Loaded index (any type; unknown parameters are ignored).
+    """
+    import faiss
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", FAISS_NPROBE), ("efSearch", FAISS_EF_SEARCH)):
+        if value:
+            try:
+                params.set_index_parameter(index, name, int(value))
+            except RuntimeError:
+                pass  # parameter does not apply to this index type
+#endregion
+
+#region Vector access
+class IndexEmbeddings(Embeddings):
+    """
+    Embedder whose vectors are shortened to an index's dimension (see `reduce_dimensions`),
+    so LangChain's own FAISS searches work on an index built with EMBEDDING_DIMENSIONS.
+
+    Args:
+        base (Embeddings): Full-size embedder.
+        dimensions (int): The index's dimension.
+    """
+
+    def __init__(self, base: Embeddings, dimensions: int):
+        self.base = base
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: list) -> list:
+        return reduce_dimensions(np.asarray(self.base.embed_documents(texts)), self.dimensions).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return reduce_dimensions(np.asarray([self.base.embed_query(text)]), self.dimensions)[0].tolist()
+
+    async def aembed_query(self, text: str) -> list:
+        return reduce_dimensions(np.asarray([await self.base.aembed_query(text)]), self.dimensions)[0].tolist()
+
+def _holds_exact_vectors(vector_store, embeddings) -> bool:
+    """
+    True when the index stores the embedder's vectors unchanged: float32 flat or HNSW-flat,
+    at full size (checked by re-embedding one chunk, a disk-cache hit at ingestion).
+    """
+    import faiss
+    index = faiss.downcast_index(vector_store.index)
+    if not isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat)):
+        return False
+    if index.ntotal == 0:
+        return True
+    first = vector_store.docstore.search(vector_store.index_to_docstore_id[0]).page_content
+    return len(embeddings.embed_documents([first])[0]) == index.d
+
+def stored_vectors(vector_store, embeddings) -> np.ndarray:
+    """
+    Return the exact vectors of every chunk in the store, in index order.
+
+    Full-size float32 flat and HNSW-flat indexes hold the raw vectors; for the others
+    (IVF/PQ, scalar-quantized or shortened, i.e. lossy or without a direct map) the chunk
+    texts are re-embedded, which the `BatchedEmbeddings` disk cache serves without API calls.
+
+    Args:
+        vector_store (FAISS): LangChain FAISS store.
+        embeddings (Embeddings): Embedder used at ingestion (ideally cache-backed).
+
+    Returns:
+        np.ndarray: float32 matrix (ntotal × dim).
+    """
+    index = vector_store.index
+    if _holds_exact_vectors(vector_store, embeddings):
+        return index.reconstruct_n(0, index.ntotal)
+    doc_ids = [vector_store.index_to_docstore_id[i] for i in range(index.ntotal)]
+    texts = [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+def ensure_flat(vector_store, embeddings) -> None:
+    """
+    Swap the store's index for an exact flat one so it supports add and delete.
+
+    Incremental ingestion edits the flat index and converts it back with
+    `build_index` before saving (HNSW, for one, cannot remove vectors).
+
+    Args:
+        vector_store (FAISS): Store loaded from disk.
+        embeddings (Embeddings): Embedder used at ingestion.
+    """
+    import faiss
+    if isinstance(faiss.downcast_index(vector_store.index), faiss.IndexFlat) and _holds_exact_vectors(vector_store, embeddings):
+        return
+    vector_store.index = build_index(stored_vectors(vector_store, embeddings), {"type": "flat"})
+#endregion
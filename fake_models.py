@@ -0,0 +1,144 @@
+#region Imports
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from pydantic import PrivateAttr
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+#endregion
+
+#region Embeddings
+class FakeRateLimitError(Exception):
+    """Stand-in for openai.RateLimitError (HTTP 429) raised by the fake backends."""
+    status_code = 429
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic, offline embedder for tests and benchmarks.
+
+    Each text becomes a hashed bag of words (feature hashing, L2-normalised), so
+    texts sharing words are close, exactly as reproducible from run to run.
+
+    Args:
+        size (int): Vector dimension.
+        latency (float): Seconds to sleep per request, to mimic a remote API.
+        rate_limit_every (int): Raise FakeRateLimitError on every N-th request; 0 disables.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0, rate_limit_every: int = 0):
+        self.size = size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _request(self) -> None:
+        """Count a request and simulate its latency / rate limiting."""
+        with self._lock:
+            self.requests += 1
+            throttled = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise FakeRateLimitError("Rate limit reached (fake)")
+
+    def _vector(self, text: str) -> list:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        """Embed a batch of texts as one simulated request."""
+        self._request()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        """Embed one query as one simulated request."""
+        self._request()
+        return self._vector(text)
+#endregion
+
+#region Chat model
+NO_REMEDY = "No remedy found."
+
+_CONTEXT_PATTERN = re.compile(r"CONTEXT:\s*\n(.*?)\n\s*(?:###\s*)?USER QUERY", re.DOTALL)
+_BODY_PATTERN = re.compile(r"^\W*Body Type:\s*(.*)$", re.MULTILINE)
+_REMEDY_PATTERN = re.compile(r"^\W*Requested Remedy Type:\s*(.*)$", re.MULTILINE)
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, offline stand-in for ChatOpenAI with the remedy prompts' sentinel behaviour.
+
+    It answers "No remedy found." when the prompt's body type or remedy type is listed in
+    `no_remedy_for` or the context is empty. Otherwise it quotes the first sentence of the
+    context as the remedy, so the same prompt always gets the same answer. Token usage is
+    approximated by whitespace-separated words.
+
+    Args:
+        latency (float): Seconds per call (awaited, not blocking, on the async path).
+        no_remedy_for (list[str]): Body/remedy type labels (any case) that get the sentinel.
+    """
+
+    latency: float = 0.0
+    no_remedy_for: list = []
+    calls: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-remedy-chat"
+
+    def _answer(self, messages: list) -> str:
+        """Build the reply for a remedy prompt and count the call."""
+        with self._lock:
+            self.calls += 1
+        prompt = "\n".join(str(message.content) for message in messages)
+        blocked = {label.lower() for label in self.no_remedy_for}
+        filters = [match.group(1).strip().lower() for pattern in (_BODY_PATTERN, _REMEDY_PATTERN)
+                   for match in [pattern.search(prompt)] if match]
+        context = _CONTEXT_PATTERN.search(prompt)
+        context = context.group(1).strip() if context else ""
+        if blocked.intersection(filters) or not context or context == "No relevant reference found.":
+            return NO_REMEDY
+        return "Remedy: " + re.split(r"(?<=[.!?])\s", context, maxsplit=1)[0][:200]
+
+    @staticmethod
+    def _usage(messages: list, text: str) -> dict:
+        """Token usage approximated by word counts."""
+        prompt_words = sum(len(str(message.content).split()) for message in messages)
+        return {"input_tokens": prompt_words, "output_tokens": len(text.split()),
+                "total_tokens": prompt_words + len(text.split())}
+
+    @classmethod
+    def _result(cls, messages: list, text: str) -> ChatResult:
+        usage = cls._usage(messages, text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages, self._answer(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages, self._answer(messages))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._answer(messages)
+        for word in re.findall(r"\S+\s*", text):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+        # Like OpenAI with stream_usage=True: usage arrives on a final empty chunk.
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+#endregion
@@ -0,0 +1,147 @@
+#region Imports
+import json
+import hashlib
+from pathlib import Path
+#endregion
+
+#region Config
+MANIFEST_FILE = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+#endregion
+
+#region Hashing
+def content_hash(text: str) -> str:
+    """
+    Hash text content for change detection.
+
+    Args:
+        text (str): Page or chunk text.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def page_key(doc) -> str:
+    """
+    Identify a page across runs by its source file and page number.
+
+    Args:
+        doc (Document): Page document from the PDF loader.
+
+    Returns:
+        str: "<source>#page=<n>".
+    """
+    return f"{doc.metadata.get('source')}#page={doc.metadata.get('page')}"
+
+def chunk_ids(key: str, chunks: list) -> list:
+    """
+    Derive stable, content-addressed docstore IDs for the chunks of one page.
+
+    The ID depends on the page key, the chunk text and how many identical chunks
+    precede it on that page, so unchanged chunks keep their ID (and their vector)
+    even when other parts of the page are edited.
+
+    Args:
+        key (str): `page_key` of the page.
+        chunks (list[Document]): Chunks split from that page, in order.
+
+    Returns:
+        list[str]: One ID per chunk.
+    """
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        text_hash = content_hash(chunk.page_content)
+        occurrence = seen.get(text_hash, 0)
+        seen[text_hash] = occurrence + 1
+        ids.append(content_hash(f"{key}|{text_hash}|{occurrence}")[:32])
+    return ids
+#endregion
+
+#region Manifest
+def new_manifest(settings: dict) -> dict:
+    """
+    Create an empty manifest.
+
+    Args:
+        settings (dict): Everything that invalidates all vectors when it changes
+            (embedding model, splitter parameters).
+
+    Returns:
+        dict: {"version", "settings", "pages": {}}.
+    """
+    return {"version": MANIFEST_VERSION, "settings": settings, "pages": {}}
+
+def load_manifest(index_dir: str, settings: dict):
+    """
+    Load the manifest saved next to the index, if it is usable for an incremental run.
+
+    Args:
+        index_dir (str): VECTOR_DB_PATH.
+        settings (dict): Current ingestion settings.
+
+    Returns:
+        dict | None: The manifest, or None when it is missing, from another format
+        version, written with different settings, or the index files are gone.
+    """
+    path = Path(index_dir) / MANIFEST_FILE
+    if not path.exists() or not (Path(index_dir) / "index.faiss").exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        return None
+    return manifest
+
+def save_manifest(index_dir: str, manifest: dict) -> None:
+    """
+    Write the manifest next to the index (after the index itself has been saved).
+
+    Args:
+        index_dir (str): VECTOR_DB_PATH.
+        manifest (dict): Manifest to persist.
+    """
+    path = Path(index_dir) / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    tmp.replace(path)  # atomic: a crash never leaves a half-written manifest
+
+def plan_page(previous, key: str, page_hash: str, chunks: list) -> tuple:
+    """
+    Work out which chunks of one page must be embedded.
+
+    Args:
+        previous (dict | None): The page's entry in the previous manifest.
+        key (str): `page_key` of the page.
+        page_hash (str): Content hash of the cleaned page text.
+        chunks (list[Document]): Chunks split from the page.
+
+    Returns:
+        tuple[list, list, dict]: (chunks to embed, their IDs, manifest entry for the page).
+    """
+    if previous is not None and previous["hash"] == page_hash:
+        return [], [], previous
+    ids = chunk_ids(key, chunks)
+    known = set(previous["chunk_ids"]) if previous else set()
+    to_add, add_ids = [], []
+    for chunk, chunk_id in zip(chunks, ids):
+        if chunk_id not in known:
+            to_add.append(chunk)
+            add_ids.append(chunk_id)
+    return to_add, add_ids, {"hash": page_hash, "chunk_ids": ids}
+
+def removed_chunk_ids(old_pages: dict, new_pages: dict) -> list:
+    """
+    List vectors whose chunks no longer exist (edited or removed pages/documents).
+
+    Args:
+        old_pages (dict): "pages" section of the previous manifest.
+        new_pages (dict): "pages" section being built by this run.
+
+    Returns:
+        list[str]: IDs to delete from the index.
+    """
+    old_ids = {cid for entry in old_pages.values() for cid in entry["chunk_ids"]}
+    new_ids = {cid for entry in new_pages.values() for cid in entry["chunk_ids"]}
+    return sorted(old_ids - new_ids)
+#endregion
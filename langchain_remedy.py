@@ -1,60 +1,41 @@
 #region Imports
-from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from langchain.prompts import PromptTemplate
 from langchain_core.runnables import RunnableMap
 from langchain_core.output_parsers import StrOutputParser
-import os
+from context_packer import pack_context
+from metrics import span, traced
+from reranker import context_k
+from retrieval import (aembed_query, aretrieve_hits, embed_query, get_hybrid_retriever, resolve_hits,
+                       retrieve_hits, uses_embeddings)
+from response_cache import response_cache
+from shared_resources import get_llm, llm_slot
 #endregion 
 
 #region llm
-load_dotenv()
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Loaded via .env so keys aren't hard-coded
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
-
-# NOTE: Local FAISS indices created by LangChain may require `allow_dangerous_deserialization=True`.
-# This can execute pickled metadata during load—**only** load from trusted paths.
-VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH") 
-vector_store = FAISS.load_local(
-    VECTOR_DB_PATH,
-    embeddings,
-    allow_dangerous_deserialization=True
-)
+# Embeddings, vector store and LLM client live in `shared_resources` and are loaded lazily
+# on the first query, so importing this module (Streamlit, evaluate.py) stays cheap.
 
 def format_docs(retrieved_docs):
     """
     Format a list of retrieved document objects into a single context string.
 
     Args:
-        retrieved_docs (list): A list of document objects.
+        retrieved_docs (list): A list of document objects, best first.
 
     Returns:
-        str: A concatenated string of all document contents separated by two newlines,
-        or "No relevant reference found." if the list is empty.
+        str: The packed document contents (see `context_packer.pack_context`) separated
+        by two newlines, or "No relevant reference found." if the list is empty.
     """
     # If retriever returns nothing, be explicit so the LLM knows to fall back.
     if not retrieved_docs:
         return "No relevant reference found."
-    # Join page contents with a blank line to avoid merging sentences across docs.
-    context_text = "\n\n".join(doc.page_content for doc in retrieved_docs).strip()
-    return context_text
-
-# We use k=12 as a balance between recall (getting enough varied matches)
-# and precision (not flooding the prompt). Tuned empirically for this corpus size.
-retriever_remedy = vector_store.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 12}
-)
+    # Overlapping neighbours are merged, near-duplicates dropped and the text fits the token budget.
+    return pack_context(retrieved_docs)["text"]
+
+# Bump whenever the template below changes so cached answers from the old prompt are not served.
+PROMPT_VERSION = "1"
 
-# For the test cases for the metrics, we set it to 0.0 for consistent results.
-# Temperature 0.2 in production allows mild variation without drifting off-spec.
-LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")  # default if not set
-LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.2))  # default if not set
-llm_remedy = ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE)
 # Prompt strictly enforces "No remedy found." sentinel for routing logic.
 prompt_remedy = PromptTemplate(
     input_variables=["context", "ailment_description", "remedy_type", "body_type"],
@@ -85,17 +66,27 @@ If no matching remedy is found, respond with:
 """
 )
 
-# Map inputs → prompt fields; keeps retrieval + formatting separate from LLM call.
-chain_remedy = RunnableMap({
-    "context": lambda inputs: format_docs(retriever_remedy.invoke( inputs["ailment_description"])),
-    "ailment_description": lambda inputs: inputs["ailment_description"],
-    "remedy_type": lambda inputs: inputs["remedy_type"],
-    "body_type": lambda inputs: inputs["body_type"],
-}) | prompt_remedy | llm_remedy | StrOutputParser()
+@lru_cache(maxsize=None)
+def get_chain_remedy():
+    """
+    Build the retrieval + prompt + LLM chain once, on first use.
+
+    Returns:
+        Runnable: Chain taking {"ailment_description", "remedy_type", "body_type"} and returning text.
+    """
+    # Map inputs → prompt fields; keeps retrieval + formatting separate from LLM call.
+    # Callers that already retrieved (e.g. `find_remedy`) pass "context" in and skip retrieval here.
+    return RunnableMap({
+        "context": lambda inputs: inputs.get("context") or format_docs(get_hybrid_retriever(context_k()).invoke(inputs["ailment_description"])),
+        "ailment_description": lambda inputs: inputs["ailment_description"],
+        "remedy_type": lambda inputs: inputs["remedy_type"],
+        "body_type": lambda inputs: inputs["body_type"],
+    }) | prompt_remedy | get_llm() | StrOutputParser()
 
 #endregion 
 
 #region function
+@traced("langchain")
 def find_remedy(ailment_description: str, remedy_type: str, body_type:str):
     """
     Retrieve a remedy based on an ailment description, remedy type, and body type.
@@ -110,14 +101,107 @@ def find_remedy(ailment_description: str, remedy_type: str, body_type:str):
     """
     # Guard against empty inputs so we don't waste tokens or route ambiguous queries.
     if ailment_description.strip():
+       # Chunks tagged with the requested body/remedy type are ranked first (see `chunk_tags`).
+       with span("retrieve"):
+           hits = retrieve_hits(ailment_description, context_k(), body_type=body_type, remedy_type=remedy_type)
+       chunk_ids = [doc_id for doc_id, _ in hits]
+       # Repeated (or, with RESPONSE_CACHE_SIMILARITY set, paraphrased) questions skip the LLM.
+       filters_key = response_cache.filters_key("langchain", body_type, remedy_type, PROMPT_VERSION)
+       query_vector = embed_query(ailment_description) if response_cache.similarity_threshold > 0 and uses_embeddings() else None
+       remedy = response_cache.lookup(filters_key, ailment_description, chunk_ids, query_vector)
+       if remedy is not None:
+           return remedy
+
        formatted_input = {
+        "context": format_docs([doc for doc, _ in resolve_hits(hits)]),
         "ailment_description": ailment_description,
         "remedy_type": remedy_type,
         "body_type": body_type
     }
-       remedy = chain_remedy.invoke(formatted_input)
+       with span("generate"):
+           remedy = get_chain_remedy().invoke(formatted_input)
+       response_cache.store(filters_key, ailment_description, chunk_ids, remedy, query_vector)
        return remedy
     else:
         return "Please enter an ailment to get a remedy."
+
+@traced("langchain")
+def stream_remedy(ailment_description: str, remedy_type: str, body_type: str):
+    """
+    Streaming variant of `find_remedy`: yields the remedy text as the LLM produces it.
+
+    Cached answers are yielded in one piece; fresh answers are cached once complete.
+
+    Args:
+        ailment_description (str): Description of the ailment or symptoms provided by the user.
+        remedy_type (str): Type of remedy requested (e.g., herbal, diet, lifestyle).
+        body_type (str): Ayurvedic body type (e.g., Pitta, Kapha, Vata, General).
+
+    Yields:
+        str: Successive chunks of the remedy text.
+    """
+    if not ailment_description.strip():
+        yield "Please enter an ailment to get a remedy."
+        return
+
+    with span("retrieve"):
+        hits = retrieve_hits(ailment_description, context_k(), body_type=body_type, remedy_type=remedy_type)
+    chunk_ids = [doc_id for doc_id, _ in hits]
+    filters_key = response_cache.filters_key("langchain", body_type, remedy_type, PROMPT_VERSION)
+    query_vector = embed_query(ailment_description) if response_cache.similarity_threshold > 0 and uses_embeddings() else None
+    remedy = response_cache.lookup(filters_key, ailment_description, chunk_ids, query_vector)
+    if remedy is not None:
+        yield remedy
+        return
+
+    formatted_input = {
+        "context": format_docs([doc for doc, _ in resolve_hits(hits)]),
+        "ailment_description": ailment_description,
+        "remedy_type": remedy_type,
+        "body_type": body_type,
+    }
+    parts = []
+    with span("generate"):
+        for token in get_chain_remedy().stream(formatted_input):
+            parts.append(token)
+            yield token
+    response_cache.store(filters_key, ailment_description, chunk_ids, "".join(parts), query_vector)
+
+@traced("langchain")
+async def afind_remedy(ailment_description: str, remedy_type: str, body_type: str):
+    """
+    Async variant of `find_remedy`: embedding and LLM calls are awaited, not blocking a thread.
+
+    Args:
+        ailment_description (str): Description of the ailment or symptoms provided by the user.
+        remedy_type (str): Type of remedy requested (e.g., herbal, diet, lifestyle).
+        body_type (str): Ayurvedic body type (e.g., Pitta, Kapha, Vata, General).
+
+    Returns:
+        str: Suggested remedy text from the chain, or a prompt asking the user to provide an ailment description.
+    """
+    if not ailment_description.strip():
+        return "Please enter an ailment to get a remedy."
+
+    with span("retrieve"):
+        hits = await aretrieve_hits(ailment_description, context_k(), body_type=body_type, remedy_type=remedy_type)
+    chunk_ids = [doc_id for doc_id, _ in hits]
+    filters_key = response_cache.filters_key("langchain", body_type, remedy_type, PROMPT_VERSION)
+    query_vector = await aembed_query(ailment_description) if response_cache.similarity_threshold > 0 and uses_embeddings() else None
+    remedy = response_cache.lookup(filters_key, ailment_description, chunk_ids, query_vector)
+    if remedy is not None:
+        return remedy
+
+    formatted_input = {
+        "context": format_docs([doc for doc, _ in resolve_hits(hits)]),
+        "ailment_description": ailment_description,
+        "remedy_type": remedy_type,
+        "body_type": body_type,
+    }
+    with span("generate"):
+        async with llm_slot():
+            remedy = await get_chain_remedy().ainvoke(formatted_input)
+    response_cache.store(filters_key, ailment_description, chunk_ids, remedy, query_vector)
+    return remedy
    
 #endregion
@@ -1,39 +1,30 @@
 #region Imports — core libs and LangChain/LangGraph
 import os
+import re
+import asyncio
 from dotenv import load_dotenv
 from typing_extensions import TypedDict
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.graph import StateGraph
 from langgraph.runtime import Runtime
-from langchain_community.vectorstores import FAISS
 from langchain.schema import SystemMessage, HumanMessage
+from chunk_tags import matches_filters
+from context_packer import pack_context
+from evidence import count_evidence
+from metrics import instrument, record_fallback, record_llm_avoided, trace_request
+from reranker import context_k
+from retrieval import aembed_query, aretrieve_hits, embed_query, resolve_hits, retrieve_hits, uses_embeddings
+from response_cache import response_cache
+from shared_resources import get_llm, llm_slot
 #endregion
 
-#region Loading — models, vector store, retriever
+#region Loading — config
 load_dotenv()
 
-# Mild variation while staying stable; for metric runs set to 0.0 for determinism.
-LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")  # default if not set
-LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.2))  # default if not set
+# LLM, embeddings (EMBEDDING_MODEL) and the FAISS index are shared with the
+# LangChain pipeline via `shared_resources` and loaded lazily on the first query.
 
-llm = ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE)
-
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-
-# NOTE: allow_dangerous_deserialization=True is required for FAISS index metadata with LangChain.
-# Only load from trusted paths to avoid code execution risks.
-VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH") 
-vector_store = FAISS.load_local(
-    VECTOR_DB_PATH,
-    embeddings,
-    allow_dangerous_deserialization=True,
-)
-
-# We use k=12 based on internal testing; good recall without too much irrelevant context.
-retriever_remedy = vector_store.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 12},
-)
+# Bump whenever the prompts in `build_remedy_messages` change so cached answers are not reused.
+PROMPT_VERSION = "1"
 #endregion
 
 #region Graph Init — state schema
@@ -46,6 +37,10 @@ class State(TypedDict):
         body_type: Ayurvedic body type ('Vata', 'Pitta', 'Kapha', 'General').
         remedy_type: Requested remedy type ('Herbal', 'Dietary', 'Yoga', 'Overall').
         context: Joined text from retrieved documents.
+        context_ids: Docstore IDs of the retrieved documents (response cache key).
+        context_tags: Dosha/remedy-type tags of those documents (see `chunk_tags`).
+        evidence: How many of those documents show evidence for the current filters (see `evidence`).
+        sent_ids: Docstore IDs already sent to the LLM by earlier attempts of this query.
         response: Final or intermediate response text.
         is_specific: True when both body_type and remedy_type are not general/overall.
         stored_remedy_type: Original remedy_type (kept for fallback routing).
@@ -54,6 +49,10 @@ class State(TypedDict):
     body_type: str
     remedy_type: str
     context: str
+    context_ids: list[str]
+    context_tags: list[dict]
+    evidence: int
+    sent_ids: list[str]
     response: str  # Final output shown to the user after all graph logic completes
     is_specific: bool  # to check if the body type and remedy type are both specific and not general
     stored_remedy_type: str  # preferred remedy type stored separately; fallback logic may modify remedy_type
@@ -80,32 +79,128 @@ def check_specificity(state: State, runtime: Runtime[Context]) -> dict:
     rtype = (state.get("remedy_type") or "").lower()
     return {"is_specific": True} if body != "general" and rtype != "overall" else {}
 
+def _tags_of(doc) -> dict:
+    """Return a chunk's tag metadata ({} for chunks from an index built before tagging)."""
+    metadata = getattr(doc, "metadata", None) or {}
+    return {key: metadata[key] for key in ("doshas", "remedy_types") if key in metadata}
+
+def _evidence_update(state: State, docs: list) -> dict:
+    """Return {"context_tags": ..., "evidence": ...} for a step's chunks (enough for `has_candidates`)."""
+    return {"context_tags": [_tags_of(doc) for doc in docs],
+            "evidence": count_evidence(state.get("ailment_description", ""), docs,
+                                       state.get("body_type"), state.get("remedy_type"))}
+
+def _context_update(state: State, hits: list) -> dict:
+    """Build the state update for a step's retrieved hits: packed text, IDs, tags and evidence."""
+    docs = [doc for doc, _ in resolve_hits(hits)]
+    # Overlapping neighbours are merged, near-duplicates dropped and the text fits the token budget.
+    context = pack_context(docs)["text"]
+    return {"context": context, "context_ids": [doc_id for doc_id, _ in hits], **_evidence_update(state, docs)}
+
+def _step_fetch_k(state: State) -> int:
+    """Fetch extra neighbours for a retry so chunks already sent can be swapped for new ones."""
+    return context_k() + min(len(state.get("sent_ids") or []), context_k())
+
+def _prioritise_new(state: State, hits: list) -> list:
+    """
+    Order a step's hits for its prompt and keep the top `context_k()`.
+
+    Chunks tagged for the step's body/remedy type come first; within each group, chunks
+    not yet sent by an earlier (failed) attempt come before repeats, so a retry spends its
+    tokens on evidence the LLM has not seen yet.
+
+    Args:
+        state (State): Uses `body_type`, `remedy_type`, `sent_ids`.
+        hits (list[tuple[str, float]]): Filter-aware hits for the step (already de-duplicated).
+
+    Returns:
+        list[tuple[str, float]]: At most `context_k()` hits.
+    """
+    sent = set(state.get("sent_ids") or [])
+    if not sent:
+        return hits[:context_k()]
+    docs = [doc for doc, _ in resolve_hits(hits)]
+    body, rtype = state.get("body_type"), state.get("remedy_type")
+    rank = {
+        doc_id: (not matches_filters(_tags_of(doc), body, rtype), doc_id in sent)
+        for (doc_id, _), doc in zip(hits, docs)
+    }
+    return sorted(hits, key=lambda hit: rank[hit[0]])[:context_k()]  # stable: keeps similarity order
+
+def step_hits(state: State) -> list:
+    """
+    Retrieve chunks for the state's current (body_type, remedy_type) step.
+
+    Runs once per fallback step. The query embedding and each step's hits are cached
+    (see `retrieval`), so revisiting a step or a repeat query costs no API call.
+
+    Args:
+        state (State): Uses `ailment_description`, `body_type`, `remedy_type`, `sent_ids`.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, similarity) pairs for the prompt.
+    """
+    hits = retrieve_hits(state.get("ailment_description", ""), _step_fetch_k(state),
+                         body_type=state.get("body_type"), remedy_type=state.get("remedy_type"))
+    return _prioritise_new(state, hits)
+
+async def astep_hits(state: State) -> list:
+    """Async variant of `step_hits`."""
+    hits = await aretrieve_hits(state.get("ailment_description", ""), _step_fetch_k(state),
+                                body_type=state.get("body_type"), remedy_type=state.get("remedy_type"))
+    return _prioritise_new(state, hits)
+
 def retrieve_context(state: State, runtime: Runtime[Context]) -> dict:
     """
-    Retrieve documents for the ailment and set the concatenated text as context.
+    Retrieve documents for the ailment and the current filters and set them as context.
+
+    Runs before the first attempt and again after every reroute, so relaxed filters see
+    chunks that match them rather than the first attempt's chunks. Chunks tagged with
+    the requested body/remedy type are ranked first.
 
     Args:
-        state (State): Requires `ailment_description`.
+        state (State): Requires `ailment_description`; uses `body_type`, `remedy_type`, `sent_ids`.
         runtime (Runtime[Context]): LangGraph runtime (unused).
 
     Returns:
-        dict: {"context": <joined document text>}.
+        dict: {"context": <packed document text>, "context_ids": <docstore IDs>,
+        "context_tags": <tags per document>, "evidence": <documents with evidence>}.
     """
-    docs = retriever_remedy.invoke(state.get("ailment_description", ""))
-    # Join with a generator to avoid building an intermediate list.
-    context = "\n\n".join(doc.page_content for doc in docs).strip()
-    return {"context": context}
+    # Cached: repeat ailments skip the embedding round trip and the FAISS search.
+    return _context_update(state, step_hits(state))
 
-def generate_remedy_node(state: State, runtime: Runtime[Context]) -> dict:
+async def aretrieve_context(state: State, runtime: Runtime[Context]) -> dict:
+    """Async variant of `retrieve_context`; the embedding call is awaited."""
+    return _context_update(state, await astep_hits(state))
+
+def has_candidates(state: State) -> bool:
     """
-    Generate a remedy using the provided context, body_type, and remedy_type.
+    Deterministic pre-check: is a generation attempt for this step worth an LLM call?
+
+    Args:
+        state (State): Uses `evidence`, else `context_tags`, `body_type`, `remedy_type`.
+
+    Returns:
+        bool: False when no retrieved chunk is tagged for the step's body/remedy type and
+        names the ailment (see `evidence`), i.e. the LLM could only answer "No remedy found.";
+        states without `evidence` or `context_tags` always return True.
+    """
+    if state.get("evidence") is not None:
+        return state["evidence"] > 0
+    tags = state.get("context_tags")
+    if tags is None:
+        return True
+    return any(matches_filters(tag, state.get("body_type"), state.get("remedy_type")) for tag in tags)
+
+def build_remedy_messages(state: State) -> list:
+    """
+    Build the system + user messages for one remedy generation attempt.
 
     Args:
         state (State): Uses `context`, `ailment_description`, `remedy_type`, `body_type`.
-        runtime (Runtime[Context]): LangGraph runtime (unused).
 
     Returns:
-        dict: {"response": <LLM output or 'No remedy found.'>}.
+        list: [SystemMessage, HumanMessage] ready for `invoke` / `batch` on the shared LLM.
     """
     system_prompt = """You are an expert Ayurvedic practitioner.
 Use ONLY the information provided in the CONTEXT to answer the user's query.
@@ -131,18 +226,124 @@ Body Type: {state.get("body_type", "")}
 
 Answer:"""
 
-    messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
-    response = llm.invoke(messages).content
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
+
+def generate_remedy_node(state: State, runtime: Runtime[Context]) -> dict:
+    """
+    Generate a remedy using the provided context, body_type, and remedy_type.
+
+    Args:
+        state (State): Uses `context`, `ailment_description`, `remedy_type`, `body_type`.
+        runtime (Runtime[Context]): LangGraph runtime (unused).
+
+    Returns:
+        dict: {"response": <LLM output or 'No remedy found.'>, "sent_ids": <IDs sent so far>}.
+    """
+    response = generate_remedies([state])[0]
     # Keep exact sentinel match for downstream routing.
-    return {"response": response}
+    return {"response": response, "sent_ids": _merge_sent(state)}
 
-def reroute_query_node(state: State, runtime: Runtime[Context]) -> dict:
+async def agenerate_remedy_node(state: State, runtime: Runtime[Context]) -> dict:
+    """Async variant of `generate_remedy_node`; awaits the LLM instead of blocking a thread."""
+    response = (await agenerate_remedies([state]))[0]
+    return {"response": response, "sent_ids": _merge_sent(state)}
+
+def _merge_sent(state: State) -> list:
+    """Add this attempt's chunk IDs to `sent_ids` (de-duplicated, order kept)."""
+    return list(dict.fromkeys((state.get("sent_ids") or []) + (state.get("context_ids") or [])))
+
+def _lookup_cached(attempts: list, query_vectors: list) -> tuple:
     """
-    Broaden body_type and/or remedy_type in steps when no remedy is found.
+    Split generation attempts into response-cache hits and misses.
+
+    Args:
+        attempts (list[State]): Generation attempts.
+        query_vectors (list): Query embedding per attempt (None when near-duplicate lookup is off).
+
+    Returns:
+        tuple[list, list, list]: (responses with None for misses, cache keys per attempt, miss indexes).
+        Attempts without candidate chunks are answered with the sentinel and never miss.
+    """
+    responses, keys, misses = [], [], []
+    for i, (attempt, query_vector) in enumerate(zip(attempts, query_vectors)):
+        if not has_candidates(attempt):
+            # No chunk shows evidence for this body/remedy type: answer without an LLM call.
+            record_llm_avoided("no_evidence")
+            responses.append(NO_REMEDY_SENTINEL)
+            keys.append(None)
+            continue
+        filters_key = response_cache.filters_key(
+            "langgraph", attempt.get("body_type", ""), attempt.get("remedy_type", ""), PROMPT_VERSION)
+        ailment = attempt.get("ailment_description", "")
+        chunk_ids = attempt.get("context_ids") or []
+        keys.append((filters_key, ailment, chunk_ids, query_vector))
+        responses.append(response_cache.lookup(filters_key, ailment, chunk_ids, query_vector))
+        if responses[-1] is None:
+            misses.append(i)
+        else:
+            record_llm_avoided("response_cache")
+    return responses, keys, misses
+
+def _store_generated(responses: list, keys: list, misses: list, generated: list) -> list:
+    """Fill the missed slots with fresh LLM output and cache it; returns `responses`."""
+    for i, message in zip(misses, generated):
+        responses[i] = message.content
+        filters_key, ailment, chunk_ids, query_vector = keys[i]
+        response_cache.store(filters_key, ailment, chunk_ids, message.content, query_vector)
+    return responses
+
+def generate_remedies(attempts: list) -> list:
+    """
+    Answer one or more generation attempts, serving repeats from the response cache.
+
+    Only cache misses reach the LLM; several misses go out together via `batch`.
+
+    Args:
+        attempts (list[State]): States carrying `context`, `context_ids`, `ailment_description`,
+            `body_type` and `remedy_type`.
+
+    Returns:
+        list[str]: One response per attempt, in order.
+    """
+    query_vectors = [embed_query(attempt.get("ailment_description", ""))
+                     if response_cache.similarity_threshold > 0 and uses_embeddings() else None for attempt in attempts]
+    responses, keys, misses = _lookup_cached(attempts, query_vectors)
+    if len(misses) == 1:
+        generated = [get_llm().invoke(build_remedy_messages(attempts[misses[0]]))]
+    else:
+        generated = get_llm().batch([build_remedy_messages(attempts[i]) for i in misses]) if misses else []
+    return _store_generated(responses, keys, misses, generated)
+
+async def agenerate_remedies(attempts: list) -> list:
+    """
+    Async variant of `generate_remedies` (uses `ainvoke` / `abatch`).
+
+    Args:
+        attempts (list[State]): Generation attempts.
+
+    Returns:
+        list[str]: One response per attempt, in order.
+    """
+    if response_cache.similarity_threshold > 0 and uses_embeddings():
+        query_vectors = [await aembed_query(attempt.get("ailment_description", "")) for attempt in attempts]
+    else:
+        query_vectors = [None] * len(attempts)
+    responses, keys, misses = _lookup_cached(attempts, query_vectors)
+    if not misses:
+        return responses
+    async with llm_slot():
+        if len(misses) == 1:
+            generated = [await get_llm().ainvoke(build_remedy_messages(attempts[misses[0]]))]
+        else:
+            generated = await get_llm().abatch([build_remedy_messages(attempts[i]) for i in misses])
+    return _store_generated(responses, keys, misses, generated)
+
+def _next_relaxation(state: State) -> dict:
+    """
+    Return the next, broader (body_type, remedy_type) step of the fallback ladder.
 
     Args:
         state (State): Contains `body_type`, `remedy_type`, `is_specific`, `stored_remedy_type`.
-        runtime (Runtime[Context]): LangGraph runtime (unused).
 
     Returns:
         dict: Updated fields and/or a terminal "response".
@@ -173,6 +374,50 @@ def reroute_query_node(state: State, runtime: Runtime[Context]) -> dict:
     elif body_type != "general" and remedy_type != "overall":
         return {"remedy_type": "overall", "response": "finding"}
 
+def _reroute(state: State) -> tuple:
+    """
+    Walk the fallback ladder to the next step worth an LLM attempt.
+
+    Returns:
+        tuple[dict, int]: (state update, number of ladder steps moved down).
+    """
+    current = dict(state)
+    update, moved = {}, 0
+    for _ in range(MAX_LADDER_STEPS):
+        step = _next_relaxation(current)
+        if not step:
+            break
+        update.update(step)
+        current.update(step)
+        if step.get("response") == "None":
+            break
+        moved += 1
+        docs = [doc for doc, _ in resolve_hits(step_hits(current))]
+        if has_candidates({**current, **_evidence_update(current, docs)}):
+            break
+        # Skipped without generating: the sequential graph would have spent an LLM call here.
+        record_llm_avoided("no_evidence")
+    return update, moved
+
+def reroute_query_node(state: State, runtime: Runtime[Context]) -> dict:
+    """
+    Broaden body_type and/or remedy_type in steps when no remedy is found.
+
+    Steps whose retrieved chunks show no evidence for their filters (tags and ailment terms,
+    see `evidence`) are skipped, since generating for them could only return "No remedy found.". The step's
+    retrieval is cached, so `retrieve_context` reuses it on the next pass.
+
+    Args:
+        state (State): Contains `body_type`, `remedy_type`, `is_specific`, `stored_remedy_type`.
+        runtime (Runtime[Context]): LangGraph runtime (unused).
+
+    Returns:
+        dict: Updated fields and/or a terminal "response".
+    """
+    update, moved = _reroute(state)
+    record_fallback(moved)
+    return update
+
 
 def final_response_node(state: State, runtime: Runtime[Context]) -> dict:
     """
@@ -193,40 +438,118 @@ def final_response_node(state: State, runtime: Runtime[Context]) -> dict:
     }
 #endregion
 
-#region Graph wiring — nodes & edges
-graph = StateGraph(state_schema=State)
-graph.add_node("check_specificity", check_specificity)
-graph.add_node("retrieve_context", retrieve_context)
-graph.add_node("generate_remedy_node", generate_remedy_node)
-graph.add_node("reroute_query_node", reroute_query_node)
-graph.add_node("final_response_node", final_response_node)
+#region Speculative ladder — parallel fallback attempts
+# Opt-in: send every fallback relaxation to the LLM at once instead of walking the ladder.
+# Latency becomes ~one LLM round trip; token spend is up to one call per ladder step.
+SPECULATIVE_LADDER = os.getenv("SPECULATIVE_LADDER", "false").lower() in ("1", "true", "yes")
+
+# The ladder is at most 4 steps deep; the cap only guards against a routing change looping forever.
+MAX_LADDER_STEPS = 8
+
+def plan_fallback_ladder(state: State) -> tuple[list[dict], dict]:
+    """
+    List every (body_type, remedy_type) attempt the sequential graph would make, in order.
+
+    The ladder is derived by replaying the reroute logic (`_reroute`), so the speculative mode can never
+    drift from the sequential routing rules (including the lower-cased "general"/"overall" values).
+    `sent_ids` is carried forward as `_merge_sent` does after each sequential attempt, so every
+    step retrieves (and is skipped or kept) exactly as it would be when walked one by one.
+
+    Args:
+        state (State): Contains `body_type`, `remedy_type`, `is_specific`, `stored_remedy_type`.
+
+    Returns:
+        tuple[list[dict], dict]: ([{"body_type", "remedy_type", "sent_ids", "depth"}, ...], most
+        specific first; {"body_type", "remedy_type", "depth"} where the sequential graph ends when
+        every attempt fails). Depths are positions on the full ladder, counting the steps the
+        evidence pre-check skips, as `reroute_query_node` does.
+    """
+    current = dict(state)
+    steps, depth = [], 0
+    while len(steps) < MAX_LADDER_STEPS:
+        sent_ids = list(current.get("sent_ids") or [])
+        steps.append({"body_type": current.get("body_type"), "remedy_type": current.get("remedy_type"),
+                      "sent_ids": sent_ids, "depth": depth})
+        context_ids = [doc_id for doc_id, _ in step_hits(current)]  # cached; reused by the attempt
+        current["sent_ids"] = _merge_sent({"sent_ids": sent_ids, "context_ids": context_ids})
+        update, moved = _reroute(current)
+        depth += moved
+        current.update(update)
+        # "None" (or no update at all) means the sequential graph would stop here.
+        if not update or update.get("response") == "None":
+            break
+    exhausted = {"body_type": current.get("body_type"), "remedy_type": current.get("remedy_type"), "depth": depth}
+    return steps, exhausted
+
+def _step_state(state: State, step: dict) -> State:
+    """The state the sequential graph would generate from at a planned ladder step."""
+    return {**state, "body_type": step["body_type"], "remedy_type": step["remedy_type"], "sent_ids": step["sent_ids"]}
+
+def _pick_speculative(steps: list, results: list, exhausted: dict) -> dict:
+    """Keep the most specific step that found a remedy (the one the sequential graph stops at)."""
+    for step, result in zip(steps, results):
+        if not is_no_remedy(result):
+            record_fallback(step["depth"])
+            return {"body_type": step["body_type"], "remedy_type": step["remedy_type"], "response": result}
+    record_fallback(exhausted["depth"])
+    return {"body_type": exhausted["body_type"], "remedy_type": exhausted["remedy_type"], "response": "None"}
+
+def speculative_remedy_node(state: State, runtime: Runtime[Context]) -> dict:
+    """
+    Run all fallback attempts in parallel and keep the most specific one that found a remedy.
+
+    Args:
+        state (State): Uses `ailment_description`, `body_type`, `remedy_type`,
+            `is_specific`, `stored_remedy_type`.
+        runtime (Runtime[Context]): LangGraph runtime (unused).
+
+    Returns:
+        dict: The winning step's `body_type`/`remedy_type` plus its `response`, or the step
+        the sequential graph ends on with the terminal "None" when every attempt returned the sentinel.
+    """
+    steps, exhausted = plan_fallback_ladder(state)
+    # Each step gets the chunks retrieved for its own filters (cached by the ladder replay),
+    # with the chunks its earlier sequential attempts would have sent moved to the back.
+    step_states = [_step_state(state, step) for step in steps]
+    attempts = [{**step_state, **_context_update(step_state, step_hits(step_state))} for step_state in step_states]
+    # Uncached steps go out in one llm.batch, so wall time ≈ the slowest single call.
+    results = generate_remedies(attempts)
+    return _pick_speculative(steps, results, exhausted)
+
+async def aspeculative_remedy_node(state: State, runtime: Runtime[Context]) -> dict:
+    """Async variant of `speculative_remedy_node` (uncached steps go out via `abatch`)."""
+    # The first step's retrieval is awaited (its embedding goes through the async embedder); the
+    # rest of the ladder replay searches FAISS and reads chunks, so it runs off the event loop.
+    await astep_hits(state)
+    steps, exhausted = await asyncio.to_thread(plan_fallback_ladder, state)
+    step_states = [_step_state(state, step) for step in steps]
+    all_hits = await asyncio.gather(*(astep_hits(step_state) for step_state in step_states))
+    attempts = [{**step_state, **_context_update(step_state, hits)} for step_state, hits in zip(step_states, all_hits)]
+    results = await agenerate_remedies(attempts)
+    return _pick_speculative(steps, results, exhausted)
 #endregion
 
-#region Graph flow — entry, conditionals, finish
-# First check specificity → retrieve context → attempt remedy generation.
-graph.set_entry_point("check_specificity")
-graph.add_edge("check_specificity", "retrieve_context")
-graph.add_edge("retrieve_context", "generate_remedy_node")
+#region Graph flow — conditionals
+# The system prompt asks for exactly "No remedy found."; models sometimes quote it, change the
+# case, drop the period or add an explanation, none of which should count as a remedy.
+_NO_REMEDY_PATTERN = re.compile(r"^\W*no\s+remed(?:y|ies)\s+(?:was\s+|were\s+)?found\b", re.IGNORECASE)
+# Every phrase the pattern accepts, once leading symbols are dropped and whitespace collapsed
+# (see `SentinelFilter`, which must not stream a prefix of any of them).
+_NO_REMEDY_PHRASES = tuple(f"no {noun} {verb}found" for noun in ("remedy", "remedies") for verb in ("", "was ", "were "))
+
+def is_no_remedy(response: str) -> bool:
+    """True when an LLM answer is the "No remedy found." sentinel (or a rephrasing of it)."""
+    return bool(_NO_REMEDY_PATTERN.match(response or ""))
 
 def check_remedy_found(state: State) -> str:
     """
     Decide next step based on LLM output.
 
     Returns:
-        "no_remedy_found" if the response is exactly the sentinel "No remedy found.",
+        "no_remedy_found" if the response is the sentinel "No remedy found." (see `is_no_remedy`),
         else "remedy_found".
     """
-    # Exact string match is intentional; keep it synchronized with the system prompt.
-    return "no_remedy_found" if state["response"] == "No remedy found." else "remedy_found"
-
-graph.add_conditional_edges(
-    source="generate_remedy_node",
-    path=check_remedy_found,
-    path_map={
-        "no_remedy_found": "reroute_query_node",
-        "remedy_found": "final_response_node",
-    },
-)
+    return "no_remedy_found" if is_no_remedy(state["response"]) else "remedy_found"
 
 def check_after_rerouting(state: State) -> str:
     """
@@ -234,26 +557,212 @@ def check_after_rerouting(state: State) -> str:
 
     Returns:
         "no_remedy_found" if terminal sentinel "None" is set,
-        else "finding" to loop back to generation.
+        else "finding" to loop back to retrieval and generation.
     """
     # "None" denotes we've exhausted fallbacks and found nothing.
     return "no_remedy_found" if state["response"] == "None" else "finding"
+#endregion
+
+#region Streaming — token filter for the sentinel
+NO_REMEDY_SENTINEL = "No remedy found."
+
+class SentinelFilter:
+    """
+    Hold streamed tokens back until `is_no_remedy` can tell whether the answer is the sentinel.
+
+    The text is held while it could still become any phrasing the routing treats as "No
+    remedy found." (quoted, bold, "No remedies were found ..."). Once it cannot, it is
+    released (buffer first, then every later token passes straight through), so real
+    remedies stream with at most a few tokens of delay while a sentinel answer is never shown.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.released = False
+
+    def feed(self, token: str) -> str:
+        """
+        Add a token.
+
+        Args:
+            token (str): Next streamed chunk.
+
+        Returns:
+            str: Text that is safe to display now ("" while still ambiguous).
+        """
+        self.text += token
+        if self.released:
+            return token
+        if self._undecided() or is_no_remedy(self.text):
+            return ""
+        self.released = True
+        return self.text
+
+    def _undecided(self) -> bool:
+        """True while the text so far is a prefix of some sentinel phrasing."""
+        start = re.sub(r"\s+", " ", re.sub(r"^\W+", "", self.text)).lower()
+        return any(phrase.startswith(start) for phrase in _NO_REMEDY_PHRASES)
+#endregion
 
-graph.add_conditional_edges(
-    source="reroute_query_node",
-    path=check_after_rerouting,
-    path_map={
-        "no_remedy_found": "final_response_node",
-        "finding": "generate_remedy_node",
-    },
-)
+#region Graph wiring — nodes, edges, entry & finish
+def build_remedy_graph(speculative: bool = False, use_async: bool = False) -> StateGraph:
+    """
+    Wire the remedy graph.
+
+    Args:
+        speculative (bool): When True, replace the generate → reroute loop with a single
+            `speculative_remedy_node` that tries every fallback step in parallel.
+        use_async (bool): Use the async retrieval/generation nodes (run with `ainvoke`).
+
+    Returns:
+        StateGraph: The uncompiled graph.
+    """
+    graph = StateGraph(state_schema=State)
+
+    def add_node(name, node):
+        # Every node run is timed into the request trace and the step histogram (see `metrics`).
+        graph.add_node(name, instrument(name, node))
+
+    add_node("check_specificity", check_specificity)
+    add_node("retrieve_context", aretrieve_context if use_async else retrieve_context)
+    add_node("final_response_node", final_response_node)
+
+    # First check specificity → retrieve context → attempt remedy generation.
+    graph.set_entry_point("check_specificity")
+    graph.add_edge("check_specificity", "retrieve_context")
+
+    if speculative:
+        add_node("speculative_remedy_node", aspeculative_remedy_node if use_async else speculative_remedy_node)
+        graph.add_edge("retrieve_context", "speculative_remedy_node")
+        graph.add_edge("speculative_remedy_node", "final_response_node")
+    else:
+        add_node("generate_remedy_node", agenerate_remedy_node if use_async else generate_remedy_node)
+        add_node("reroute_query_node", reroute_query_node)
+        graph.add_edge("retrieve_context", "generate_remedy_node")
+        graph.add_conditional_edges(
+            source="generate_remedy_node",
+            path=check_remedy_found,
+            path_map={
+                "no_remedy_found": "reroute_query_node",
+                "remedy_found": "final_response_node",
+            },
+        )
+        graph.add_conditional_edges(
+            source="reroute_query_node",
+            path=check_after_rerouting,
+            path_map={
+                "no_remedy_found": "final_response_node",
+                # Re-retrieve for the relaxed filters before the next attempt.
+                "finding": "retrieve_context",
+            },
+        )
+
+    graph.set_finish_point("final_response_node")
+    return graph
+
+class TracedGraph:
+    """
+    Compiled graph whose runs are each traced as one "langgraph" request (see `metrics`).
+
+    Everything else is delegated to the compiled graph.
+
+    Args:
+        compiled: A compiled StateGraph.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def __getattr__(self, name):
+        return getattr(self.compiled, name)
+
+    def invoke(self, *args, **kwargs):
+        with trace_request("langgraph"):
+            return self.compiled.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        with trace_request("langgraph"):
+            return await self.compiled.ainvoke(*args, **kwargs)
 
-graph.set_finish_point("final_response_node")
+    def stream(self, *args, **kwargs):
+        with trace_request("langgraph"):
+            yield from self.compiled.stream(*args, **kwargs)
+
+graph = build_remedy_graph()
 compiled = graph.compile()
+compiled_speculative = build_remedy_graph(speculative=True).compile()
+compiled_async = build_remedy_graph(use_async=True).compile()
+compiled_async_speculative = build_remedy_graph(speculative=True, use_async=True).compile()
 #endregion
 
 #region Public API
-def get_remedy_graph():
-    """Return the compiled LangGraph for external use (e.g., Streamlit or tests)."""
-    return compiled
+def get_remedy_graph(speculative: bool = SPECULATIVE_LADDER):
+    """
+    Return the compiled LangGraph for external use (e.g., Streamlit or tests).
+
+    Args:
+        speculative (bool): Return the parallel fallback variant; defaults to the
+            SPECULATIVE_LADDER env flag.
+    """
+    return TracedGraph(compiled_speculative if speculative else compiled)
+
+def get_async_remedy_graph(speculative: bool = SPECULATIVE_LADDER):
+    """
+    Return the compiled LangGraph built from async nodes; run it with `await graph.ainvoke(state)`.
+
+    One event loop can then serve many concurrent queries without a thread per request.
+
+    Args:
+        speculative (bool): Return the parallel fallback variant; defaults to the
+            SPECULATIVE_LADDER env flag.
+    """
+    return TracedGraph(compiled_async_speculative if speculative else compiled_async)
+
+def stream_remedy_graph(input_state: State, speculative: bool = SPECULATIVE_LADDER):
+    """
+    Run the graph and yield progress as it happens, for progressive rendering in the UI.
+
+    LLM tokens are streamed from each `generate_remedy_node` attempt through a
+    `SentinelFilter`, so an attempt that ends in "No remedy found." (in any phrasing
+    `is_no_remedy` accepts) emits no tokens and the routing in `check_remedy_found` is
+    unchanged. Each attempt starts with a reset event (drop any text shown so far) and
+    each fallback round is announced as a status event.
+
+    Args:
+        input_state (State): Same initial state as for `invoke`.
+        speculative (bool): Use the parallel fallback variant (statuses + final only;
+            tokens of concurrent attempts are not streamed).
+
+    Yields:
+        tuple[str, str]: ("status", message), ("reset", ""), ("token", text) or ("final", formatted response).
+    """
+    body_type, remedy_type = input_state.get("body_type"), input_state.get("remedy_type")
+    yield ("status", f"Searching for body type: {body_type} and remedy type: {remedy_type}")
+    if speculative:
+        yield ("status", "Trying every fallback combination in parallel")
+
+    token_filter = SentinelFilter()
+    stream = get_remedy_graph(speculative).stream(input_state, stream_mode=["messages", "updates"])
+    for mode, chunk in stream:
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "generate_remedy_node" and isinstance(message.content, str):
+                visible = token_filter.feed(message.content)
+                if visible:
+                    yield ("token", visible)
+            continue
+
+        for node, update in chunk.items():
+            update = update or {}
+            if node == "retrieve_context":
+                yield ("reset", "")
+            elif node == "generate_remedy_node":
+                # Cache hits produce no tokens; the final event still carries the answer.
+                token_filter = SentinelFilter()
+            elif node == "reroute_query_node" and update.get("response") == "finding":
+                body_type = update.get("body_type", body_type)
+                remedy_type = update.get("remedy_type", remedy_type)
+                yield ("status", f"No match yet — trying body type: {body_type} and remedy type: {remedy_type}")
+            elif node == "final_response_node":
+                yield ("final", update.get("response", ""))
 #endregion
@@ -0,0 +1,550 @@
+#region Imports
+import os
+import glob
+import json
+import asyncio
+import inspect
+import functools
+import time
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Optional Prometheus textfile (node_exporter textfile collector); rewritten after every request.
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+
+PREFIX = "healthguru"
+# Seconds; an LLM round trip is 0.5–5 s, embeddings/searches are milliseconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEPTH_BUCKETS = (0, 1, 2, 3, 4)
+
+# One JSON line per request: {"event": "request", "pipeline", "total_ms", "steps", ...}
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Registry
+class _Metric:
+    """Base for labelled metrics; values are keyed on a sorted (label, value) tuple."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted((labels or {}).items()))
+
+    def dump(self) -> list:
+        """Return every series as JSON-serialisable [[label pairs], value] (see `merge`)."""
+        with self._lock:
+            return [[[list(pair) for pair in key], value] for key, value in self._values.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def _labels(key: tuple, extra: tuple = ()) -> str:
+        """Format labels as {name="value",...}, escaping per the exposition format."""
+        pairs = []
+        for name, value in key + extra:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{name}="{value}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def inc(self, labels: dict = None, value: float = 1.0) -> None:
+        """Add `value` to the series for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def merge(self, series: list) -> None:
+        """Add series from `dump` (e.g. another worker's) to this counter."""
+        for key, value in series:
+            self.inc(dict(key), value)
+
+    def render(self) -> list:
+        with self._lock:
+            return [f"{self.name}{self._labels(key)} {value:g}" for key, value in sorted(self._values.items())]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {self._labels(key) or "total": value for key, value in self._values.items()}
+
+    def total(self, **labels) -> float:
+        """Sum of every series whose labels include `labels` (e.g. total(reason="no_evidence"))."""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for key, value in self._values.items() if wanted <= set(key))
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: dict = None, value: float = 0.0) -> None:
+        """Record one observation for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[[list(pair) for pair in key], {**s, "counts": list(s["counts"])}] for key, s in self._values.items()]
+
+    def merge(self, series: list) -> None:
+        """Add series from `dump` (same buckets) to this histogram."""
+        with self._lock:
+            for key, other in series:
+                mine = self._values.setdefault(self._key(dict(key)),
+                                               {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                mine["counts"] = [a + b for a, b in zip(mine["counts"], other["counts"])]
+                mine["sum"] += other["sum"]
+                mine["count"] += other["count"]
+
+    def render(self) -> list:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{self._labels(key, (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{self.name}_bucket{self._labels(key, (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {series['sum']:g}")
+                lines.append(f"{self.name}_count{self._labels(key)} {series['count']}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {self._labels(key) or "total": {"count": s["count"], "sum": s["sum"]}
+                    for key, s in self._values.items()}
+
+class Registry:
+    """In-process metrics registry; `render_prometheus` produces the text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help_text, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        """Return (creating on first use) the counter `name`."""
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        """Return (creating on first use) the histogram `name`."""
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Return every metric in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Return {metric name: {labels: value}} for dashboards and tests."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def dump(self) -> dict:
+        """Return the raw state of every metric as JSON-serialisable data (see `merge`)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {"kind": metric.kind, "help": metric.help, "buckets": list(getattr(metric, "buckets", ())),
+                              "series": metric.dump()} for metric in metrics}
+
+    def merge(self, dump: dict) -> None:
+        """Add another registry's `dump` to this one (counters and histograms are summed)."""
+        for name, data in dump.items():
+            if data["kind"] == Histogram.kind:
+                metric = self.histogram(name, data["help"], buckets=tuple(data["buckets"]))
+            else:
+                metric = self.counter(name, data["help"])
+            metric.merge(data["series"])
+
+    def clear(self) -> None:
+        """Drop every recorded value (the metrics themselves stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+registry = Registry()
+
+REQUESTS = registry.counter(f"{PREFIX}_requests_total", "Remedy requests served.")
+REQUEST_SECONDS = registry.histogram(f"{PREFIX}_request_seconds", "End-to-end remedy request latency.")
+STEP_SECONDS = registry.histogram(f"{PREFIX}_step_seconds", "Time per pipeline step (graph node or chain stage).")
+LLM_CALLS = registry.counter(f"{PREFIX}_llm_calls_total", "LLM calls made.")
+LLM_CALLS_AVOIDED = registry.counter(f"{PREFIX}_llm_calls_avoided_total",
+                                     "LLM calls skipped by reason (no_evidence/response_cache).")
+LLM_TOKENS = registry.counter(f"{PREFIX}_llm_tokens_total", "LLM tokens by kind (prompt/completion).")
+FALLBACK_DEPTH = registry.histogram(f"{PREFIX}_fallback_depth", "Fallback steps taken per LangGraph request.",
+                                    buckets=DEPTH_BUCKETS)
+CACHE_LOOKUPS = registry.counter(f"{PREFIX}_cache_lookups_total", "Cache lookups by cache and result.")
+#endregion
+
+#region Request traces
+_current = contextvars.ContextVar("healthguru_trace", default=None)
+_depth = contextvars.ContextVar("healthguru_span_depth", default=0)
+
+class RequestTrace:
+    """
+    Per-request record of steps, LLM tokens, fallback depth and cache hits.
+
+    Steps are appended from whichever thread runs them (LangGraph and LangChain copy the
+    context into their worker threads, so they all see the same trace).
+
+    Args:
+        pipeline (str): "langchain" or "langgraph".
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started = time.perf_counter()
+        self.steps = []
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.llm_calls = 0
+        self.llm_calls_avoided = {}
+        self.fallback_depth = 0
+        self.cache = {}
+        self.total_ms = None
+        self._lock = threading.Lock()
+
+    def add_step(self, step: str, started: float, ms: float, **fields) -> None:
+        """Append a finished step (nested steps carry their depth for indentation)."""
+        entry = {"step": step, "start_ms": round((started - self.started) * 1000, 2), "ms": round(ms, 2),
+                 "depth": _depth.get(), **fields}
+        with self._lock:
+            self.steps.append(entry)
+
+    def add_cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def add_llm(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.tokens["prompt"] += prompt_tokens
+            self.tokens["completion"] += completion_tokens
+
+    def as_dict(self) -> dict:
+        """Return the trace as JSON-serialisable data (what the log line and debug panel show)."""
+        with self._lock:
+            return {"pipeline": self.pipeline, "total_ms": self.total_ms, "llm_calls": self.llm_calls,
+                    "llm_calls_avoided": dict(self.llm_calls_avoided), "tokens": dict(self.tokens), "fallback_depth": self.fallback_depth,
+                    "cache": {name: dict(counts) for name, counts in self.cache.items()},
+                    "steps": sorted((dict(step) for step in self.steps), key=lambda step: step["start_ms"])}
+
+def current_trace():
+    """Return the active RequestTrace, or None outside `trace_request`."""
+    return _current.get()
+
+def _pipeline() -> str:
+    trace = _current.get()
+    return trace.pipeline if trace else "none"
+
+def _reset(var: contextvars.ContextVar, token) -> None:
+    """Reset a context variable, tolerating generators closed from another context (e.g. by GC)."""
+    try:
+        var.reset(token)
+    except ValueError:
+        var.set(None if var is _current else 0)
+
+@contextmanager
+def trace_request(pipeline: str):
+    """
+    Trace one remedy request: time it, collect its steps and log it as one JSON line.
+
+    Nested calls (e.g. the Streamlit page wrapping `stream_remedy_graph`) join the
+    outer trace instead of starting a new one.
+
+    Args:
+        pipeline (str): "langchain" or "langgraph".
+
+    Yields:
+        RequestTrace: The active trace.
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    trace = RequestTrace(pipeline)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _reset(_current, token)
+        elapsed = time.perf_counter() - trace.started
+        trace.total_ms = round(elapsed * 1000, 2)
+        REQUESTS.inc({"pipeline": pipeline})
+        REQUEST_SECONDS.observe({"pipeline": pipeline}, elapsed)
+        if pipeline == "langgraph":
+            FALLBACK_DEPTH.observe({"pipeline": pipeline}, trace.fallback_depth)
+        logger.info(json.dumps({"event": "request", **trace.as_dict()}))
+        try:
+            if _worker_dir:
+                write_worker_file()
+            if METRICS_TEXTFILE:
+                write_textfile(METRICS_TEXTFILE)
+        except Exception:
+            # The export must never fail the request it describes.
+            logger.exception("Could not export metrics")
+
+@contextmanager
+def span(step: str, **fields):
+    """
+    Time a pipeline step into the step histogram and the active trace (if any).
+
+    Args:
+        step (str): Step name, e.g. a graph node or "embed".
+        **fields: Extra data shown with the step (e.g. k).
+    """
+    trace = _current.get()
+    depth_token = _depth.set(_depth.get() + 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _reset(_depth, depth_token)
+        if trace:
+            trace.add_step(step, started, elapsed * 1000, **fields)
+        STEP_SECONDS.observe({"pipeline": _pipeline(), "step": step}, elapsed)
+
+def instrument(step: str, func):
+    """
+    Wrap a LangGraph node (sync or async) so every call is recorded as a step.
+
+    The wrapper keeps the node's signature (LangGraph inspects it to pass `runtime`).
+
+    Args:
+        step (str): Node name.
+        func (Callable): Node function.
+
+    Returns:
+        Callable: Instrumented node.
+    """
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_node(*args, **kwargs):
+            with span(step):
+                return await func(*args, **kwargs)
+        return async_node
+
+    @functools.wraps(func)
+    def node(*args, **kwargs):
+        with span(step):
+            return func(*args, **kwargs)
+    return node
+
+def traced(pipeline: str):
+    """
+    Decorator: run a pipeline entry point (sync, async or generator) inside `trace_request`.
+
+    Args:
+        pipeline (str): "langchain" or "langgraph".
+
+    Returns:
+        Callable: Decorator.
+    """
+    def decorate(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator(*args, **kwargs):
+                with trace_request(pipeline):
+                    yield from func(*args, **kwargs)
+            return generator
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def coroutine(*args, **kwargs):
+                with trace_request(pipeline):
+                    return await func(*args, **kwargs)
+            return coroutine
+
+        @functools.wraps(func)
+        def function(*args, **kwargs):
+            with trace_request(pipeline):
+                return func(*args, **kwargs)
+        return function
+    return decorate
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup (registry and active trace)."""
+    CACHE_LOOKUPS.inc({"cache": cache, "result": "hit" if hit else "miss"})
+    trace = _current.get()
+    if trace:
+        trace.add_cache(cache, hit)
+
+def record_llm_avoided(reason: str, calls: int = 1) -> None:
+    """Count LLM calls the pipeline did not need to make (registry and active trace)."""
+    if calls <= 0:
+        return
+    LLM_CALLS_AVOIDED.inc({"pipeline": _pipeline(), "reason": reason}, calls)
+    trace = _current.get()
+    if trace:
+        with trace._lock:
+            trace.llm_calls_avoided[reason] = trace.llm_calls_avoided.get(reason, 0) + calls
+
+def record_fallback(steps: int) -> None:
+    """Add `steps` fallback-ladder steps to the active trace (0 = the first attempt answered)."""
+    trace = _current.get()
+    if trace:
+        with trace._lock:
+            trace.fallback_depth += steps
+#endregion
+
+#region LLM callback
+class LLMUsageHandler(BaseCallbackHandler):
+    """
+    Callback attached to the shared LLM: times every call and records its token usage.
+
+    Usage comes from `AIMessage.usage_metadata` (OpenAI reports it for invoke, batch and,
+    with `stream_usage=True`, streaming).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        pipeline = _pipeline()
+        LLM_CALLS.inc({"pipeline": pipeline})
+        LLM_TOKENS.inc({"pipeline": pipeline, "kind": "prompt"}, prompt_tokens)
+        LLM_TOKENS.inc({"pipeline": pipeline, "kind": "completion"}, completion_tokens)
+        trace = _current.get()
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            STEP_SECONDS.observe({"pipeline": pipeline, "step": "llm"}, elapsed)
+            if trace:
+                trace.add_step("llm", started, elapsed * 1000,
+                               prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if trace:
+            trace.add_llm(prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+
+llm_usage_handler = LLMUsageHandler()
+#endregion
+
+#region Export
+# Set in pre-forked servers (see `use_worker_files`): every process keeps its registry in
+# <dir>/<pid>.json and `render_prometheus` sums all of them, so whichever worker answers a
+# scrape reports the totals of the whole server.
+_worker_dir = None
+
+def render_prometheus() -> str:
+    """Return all metrics in Prometheus text format (serve at /metrics or write to a textfile)."""
+    if not _worker_dir:
+        return registry.render_prometheus()
+    merged = Registry()
+    own = os.path.join(_worker_dir, f"{os.getpid()}.json")
+    for path in sorted(glob.glob(os.path.join(_worker_dir, "*.json"))):
+        if path == own:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                merged.merge(json.load(f))
+        except (OSError, ValueError):
+            logger.warning("Skipping unreadable metrics file %s", path)
+    merged.merge(registry.dump())  # this process: live values rather than its last file
+    return merged.render_prometheus()
+
+_export_lock = threading.Lock()
+
+def _write_atomically(path: str, render) -> None:
+    """Write `render()` to `path` via a unique temp file in the same directory and a rename."""
+    with _export_lock:  # writers take turns, so an older render never replaces a newer one
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(render())
+            os.chmod(tmp, 0o644)  # mkstemp creates 0600 files; the collector may run as another user
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+def write_textfile(path: str) -> None:
+    """Atomically write the Prometheus text to `path` (node_exporter textfile collector)."""
+    _write_atomically(path, render_prometheus)
+
+def write_worker_file() -> None:
+    """Save this process's registry to its file in the worker directory (see `use_worker_files`)."""
+    _write_atomically(os.path.join(_worker_dir, f"{os.getpid()}.json"), lambda: json.dumps(registry.dump()))
+
+def _clear_after_fork() -> None:
+    # The parent's values are in its own file; keeping a copy would count them once per worker.
+    registry.clear()
+
+def use_worker_files(directory: str) -> None:
+    """
+    Aggregate metrics across pre-forked worker processes through files in `directory`.
+
+    Call in the parent before forking. The parent's values so far are saved once; each
+    worker starts from zero and saves its registry after every request. Files of workers
+    that exited stay, so counters never go backwards when a worker is replaced.
+
+    Args:
+        directory (str): Empty directory private to this server.
+    """
+    global _worker_dir
+    os.makedirs(directory, exist_ok=True)
+    _worker_dir = directory
+    write_worker_file()
+    os.register_at_fork(after_in_child=_clear_after_fork)
+#endregion
@@ -0,0 +1,160 @@
+#region Imports
+import os
+import glob
+import time
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ingest_manifest import content_hash
+from chunk_tags import tag_chunk
+from text_normalizer import CIDNormalizer, mapping_for_source
+#endregion
+
+#region Sources
+def resolve_pdf_paths(spec: str) -> list:
+    """
+    Expand PDF_PATH into the list of PDFs to ingest.
+
+    Args:
+        spec (str): A single PDF, a directory (searched recursively for *.pdf) or a glob pattern.
+
+    Returns:
+        list[str]: PDF paths in a stable (sorted) order.
+
+    Raises:
+        FileNotFoundError: If nothing matches.
+    """
+    if os.path.isdir(spec):
+        paths = sorted(glob.glob(os.path.join(spec, "**", "*.pdf"), recursive=True))
+    elif any(ch in spec for ch in "*?["):
+        paths = sorted(glob.glob(spec, recursive=True))
+    else:
+        paths = [spec] if os.path.exists(spec) else []
+    if not paths:
+        raise FileNotFoundError(f"No PDF found for PDF_PATH={spec!r}")
+    return paths
+
+def page_count(path: str) -> int:
+    """Return the number of pages in a PDF."""
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+#endregion
+
+#region Worker — runs in a separate process per page range
+def process_page_range(path, start, end, splitter_settings):
+    """
+    Extract, clean, chunk and tag pages [start, end) of one PDF.
+
+    Runs inside a worker process, so the expensive pdfplumber parsing of different
+    page ranges (and documents) happens in parallel. Page documents mirror what
+    `PDFPlumberLoader` produces, so page hashes match earlier single-process runs.
+
+    Args:
+        path (str): PDF path.
+        start (int): First page index (0-based, inclusive).
+        end (int): Last page index (exclusive).
+        splitter_settings (dict): `RecursiveCharacterTextSplitter` keyword arguments.
+
+    Returns:
+        dict: {"path", "pages": [(page Document, page hash, chunk Documents)],
+        "cid_counts": Counter, "unmapped_cids": Counter, "timings": {stage: seconds}}.
+    """
+    import pdfplumber
+
+    timings = Counter()
+    normalizer = CIDNormalizer(mapping_for_source(path))
+    splitter = RecursiveCharacterTextSplitter(**splitter_settings)
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        pdf_metadata = {k: v for k, v in pdf.metadata.items() if type(v) in [str, int]}
+        for index in range(start, min(end, len(pdf.pages))):
+            started = time.perf_counter()
+            page = pdf.pages[index]
+            text = page.extract_text() + "\n"
+            page.close()  # release pdfplumber's per-page object cache
+            timings["extract"] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            doc = Document(
+                page_content=normalizer.normalize(text),
+                metadata=dict({"source": path, "file_path": path, "page": index,
+                               "total_pages": len(pdf.pages)}, **pdf_metadata),
+            )
+            timings["clean"] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            chunks = splitter.split_documents([doc])
+            timings["split"] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            for chunk in chunks:
+                chunk.metadata.update(tag_chunk(chunk.page_content))
+            timings["tag"] += time.perf_counter() - started
+            pages.append((doc, content_hash(doc.page_content), chunks))
+    return {"path": path, "pages": pages, "cid_counts": normalizer.counts,
+            "unmapped_cids": normalizer.unmapped, "timings": dict(timings)}
+#endregion
+
+#region Orchestration
+def iter_page_batches(paths, splitter_settings, workers=None, pages_per_task=16):
+    """
+    Stream cleaned, chunked page batches from many PDFs using a process pool.
+
+    Every document is cut into page ranges that are processed in parallel; batches
+    are yielded in document/page order as soon as they (and every batch before them)
+    are ready, so downstream embedding starts long before the last page is parsed
+    and only in-flight batches are held in memory.
+
+    Args:
+        paths (list[str]): PDFs to ingest.
+        splitter_settings (dict): `RecursiveCharacterTextSplitter` keyword arguments.
+        workers (int | None): Worker processes (default: CPU count).
+        pages_per_task (int): Pages per work item.
+
+    Yields:
+        dict: Output of `process_page_range`, plus "pages_total" for the document.
+    """
+    tasks = []
+    for path in paths:
+        total = page_count(path)
+        for start in range(0, total, pages_per_task):
+            tasks.append((path, start, start + pages_per_task, total))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Bound the queue so finished-but-unconsumed batches cannot pile up in memory.
+        window = (workers or os.cpu_count() or 1) * 2
+        futures = []
+        for i, (path, start, end, total) in enumerate(tasks):
+            futures.append((total, pool.submit(process_page_range, path, start, end, splitter_settings)))
+            if i + 1 >= window:
+                total_pages, future = futures.pop(0)
+                yield {**future.result(), "pages_total": total_pages}
+        for total_pages, future in futures:
+            yield {**future.result(), "pages_total": total_pages}
+
+class StageTimer:
+    """Accumulate seconds per ingestion stage and report them."""
+
+    def __init__(self):
+        self.seconds = Counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block under `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+
+    def add(self, timings):
+        """Add timings measured inside worker processes (CPU-seconds summed across workers)."""
+        self.seconds.update(timings)
+
+    def report(self):
+        """Return a one-line summary, e.g. "extract=12.3s clean=0.2s ..."."""
+        return " ".join(f"{name}={seconds:.1f}s" for name, seconds in self.seconds.items())
+#endregion
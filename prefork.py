@@ -0,0 +1,93 @@
+#region Imports
+import os
+import gc
+import time
+import signal
+import logging
+#endregion
+
+#region Config
+# A worker that dies sooner than this after starting is respawned only after a pause,
+# so a worker that crashes on startup does not turn the supervisor into a fork loop.
+MIN_WORKER_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Helpers
+def _spawn(serve) -> int:
+    """Fork one worker running `serve()`; returns its pid (never returns in the child)."""
+    pid = os.fork()
+    if pid:
+        return pid
+    # Child: the parent's handlers only forward signals to workers.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        serve()
+    except BaseException:
+        logger.exception("Worker %d failed", os.getpid())
+        code = 1
+    finally:
+        logging.shutdown()
+        os._exit(code)
+#endregion
+
+#region Public API
+def run_prefork(workers: int, serve, preload) -> None:
+    """
+    Load the shared state once, fork `workers` processes that each run `serve()`, and supervise them.
+
+    The FAISS index is memory-mapped and the chunk store is SQLite, so their pages are in the
+    OS page cache, shared by every worker. What `preload` builds on the heap (BM25 arrays,
+    Python objects) is shared copy-on-write. `gc.freeze()` keeps the collector from
+    touching, and thereby copying, those pages. Each worker builds its own API clients and
+    SQLite connections (see the `os.register_at_fork` hooks in `shared_resources`,
+    `chunk_store` and `query_cache`), so per-worker memory is clients and caches.
+
+    Workers that exit are replaced. SIGTERM/SIGINT stop every worker and return.
+
+    Args:
+        workers (int): Number of worker processes.
+        serve (Callable[[], None]): Runs in each worker until it should exit.
+        preload (Callable[[], Any]): Loads the shared state in the parent, e.g. `shared_resources.warm_up`.
+    """
+    preload()
+    gc.collect()
+    gc.freeze()  # objects loaded so far are never scanned again, in the parent or the workers
+
+    started = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(started):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(max(workers, 1)):
+        started[_spawn(serve)] = time.monotonic()
+    logger.info("Pre-forked %d workers: %s", len(started), sorted(started))
+
+    while started:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        lived = time.monotonic() - started.pop(pid, time.monotonic())
+        if stopping:
+            continue
+        logger.warning("Worker %d exited (status %d) after %.1f s; starting a new one", pid, status, lived)
+        if lived < MIN_WORKER_SECONDS:
+            time.sleep(MIN_WORKER_SECONDS)
+        if not stopping:
+            started[_spawn(serve)] = time.monotonic()
+    logger.info("All workers stopped")
+#endregion
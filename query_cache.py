@@ -0,0 +1,165 @@
+#region Imports
+import os
+import json
+import time
+import sqlite3
+import weakref
+import threading
+from typing import Optional
+from collections import OrderedDict
+from metrics import record_cache
+#endregion
+
+#region Cache
+class QueryCache:
+    """
+    Size-bounded LRU cache with optional TTL and optional SQLite persistence.
+
+    Values must be JSON-serialisable so they can be written to disk. The in-memory
+    LRU is the hot tier; when `path` is set every write also lands in SQLite and
+    memory misses fall through to disk (then get promoted), so a restarted process
+    starts warm.
+
+    Args:
+        name (str): Label used in stats and as the SQLite table name.
+        max_entries (int): Maximum entries kept in memory (and, roughly, on disk).
+        ttl_seconds (float): Entry lifetime; 0 or less disables expiry.
+        path (str | None): SQLite file for persistence; None keeps the cache in memory only.
+    """
+
+    # Prune the disk tier every N writes rather than on every put.
+    _PRUNE_EVERY = 64
+
+    _instances = weakref.WeakSet()
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: float = 0, path: Optional[str] = None):
+        self.name = name
+        self.max_entries = max(int(max_entries), 1)
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._writes = 0
+        self.path = path
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        QueryCache._instances.add(self)
+
+    @classmethod
+    def _reopen_after_fork(cls) -> None:
+        """Give a forked worker its own lock and SQLite connection (neither may cross a fork)."""
+        for cache in list(cls._instances):
+            cache._lock = threading.Lock()
+            if cache._db is not None:
+                cache._db = sqlite3.connect(cache.path, check_same_thread=False)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str):
+        """
+        Look up `key`, refreshing its LRU position on a hit.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Any | None: The cached value, or None on a miss or an expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    record_cache(self.name, True)
+                    return value
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f'SELECT value, stored_at FROM "{self.name}" WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self._counters["disk_hits"] += 1
+                    record_cache(self.name, True)
+                    return value
+
+            self._counters["misses"] += 1
+            record_cache(self.name, False)
+            return None
+
+    def put(self, key: str, value) -> None:
+        """
+        Insert or replace `key`, evicting the least recently used entry when full.
+
+        Args:
+            key (str): Cache key.
+            value (Any): JSON-serialisable value.
+        """
+        stored_at = time.time()
+        with self._lock:
+            self._store(key, value, stored_at)
+            if self._db is not None:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, stored_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), stored_at),
+                )
+                self._writes += 1
+                if self._writes % self._PRUNE_EVERY == 0:
+                    self._prune_disk()
+                self._db.commit()
+
+    def _store(self, key, value, stored_at) -> None:
+        """Memory-tier insert; caller holds the lock."""
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _prune_disk(self) -> None:
+        """Drop expired rows and keep only the newest `max_entries` rows; caller holds the lock."""
+        if self.ttl_seconds > 0:
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE stored_at < ?',
+                             (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            f'DELETE FROM "{self.name}" WHERE key NOT IN '
+            f'(SELECT key FROM "{self.name}" ORDER BY stored_at DESC LIMIT ?)',
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        """Drop every entry from memory and disk (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}"')
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current size.
+
+        Returns:
+            dict: {"name", "size", "hits", "disk_hits", "misses", "evictions", "expirations", "hit_rate"}.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["disk_hits"] + counters["misses"]
+        hit_rate = (counters["hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        return {"name": self.name, "size": size, **counters, "hit_rate": round(hit_rate, 4)}
+
+os.register_at_fork(after_in_child=QueryCache._reopen_after_fork)
+#endregion
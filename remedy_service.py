@@ -0,0 +1,325 @@
+#region Imports
+import os
+import json
+import shutil
+import socket
+import asyncio
+import tempfile
+import logging
+import argparse
+from dotenv import load_dotenv
+from chunk_tags import DOSHAS, REMEDY_CATEGORIES
+from langchain_remedy import afind_remedy
+from langgraph_remedy import SPECULATIVE_LADDER, get_async_remedy_graph
+from metrics import PREFIX, registry, render_prometheus, use_worker_files
+from prefork import run_prefork
+from retrieval import use_async_embedder
+from shared_resources import get_embeddings, index_version, is_index_loaded, resource_stats, warm_up
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Query embeddings arriving within EMBED_BATCH_WINDOW_MS of each other go out as one
+# embeddings request (at most EMBED_BATCH_MAX texts). The LLM limit is LLM_MAX_CONCURRENCY
+# (see `shared_resources.llm_slot`).
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", 32))
+
+# Request bodies larger than this are rejected (an ailment description is a few hundred bytes).
+MAX_BODY_BYTES = 64 * 1024
+
+# Accepted labels (the Streamlit page options), keyed case-insensitively to their canonical spelling.
+BODY_TYPES = {label.lower(): label for label in [*DOSHAS, "General"]}
+REMEDY_TYPES = {label.lower(): label for label in [*REMEDY_CATEGORIES, "Overall"]}
+
+BATCH_SIZES = registry.histogram(f"{PREFIX}_embedding_batch_size", "Query embeddings per micro-batch.",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64))
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Embedding micro-batcher
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent query embeddings into one `aembed_documents` request.
+
+    The first query of a batch starts a `window_ms` timer; every query arriving before it
+    fires (or until `max_batch` are waiting) joins the same request. Identical texts are
+    sent once. An API error fails every query of the batch.
+
+    Args:
+        window_ms (float): How long the first query waits for company.
+        max_batch (int): Flush as soon as this many queries are waiting.
+    """
+
+    def __init__(self, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_BATCH_MAX):
+        self.window = window_ms / 1000
+        self.max_batch = max(max_batch, 1)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def embed(self, text: str) -> list:
+        """
+        Return the embedding of one (normalised) query.
+
+        Args:
+            text (str): Query text.
+
+        Returns:
+            list[float]: Its vector.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)  # keep a reference until done
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        BATCH_SIZES.observe({}, len(batch))
+        try:
+            vectors = await get_embeddings().aembed_documents(texts)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+#endregion
+
+#region ASGI app
+class HTTPError(Exception):
+    """Error answered to the client as {"error": message} with `status`."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _remedy_inputs(payload: dict) -> tuple:
+    """Validate a remedy request body; returns (ailment_description, body_type, remedy_type).
+
+    Labels are matched case-insensitively against `chunk_tags.DOSHAS` + "General" and
+    `chunk_tags.REMEDY_CATEGORIES` + "Overall"; anything else is a 400.
+    """
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Request body must be a JSON object.")
+    ailment = payload.get("ailment_description")
+    if not isinstance(ailment, str) or not ailment.strip():
+        raise HTTPError(400, "'ailment_description' is required.")
+    body_type = payload.get("body_type") or "General"
+    remedy_type = payload.get("remedy_type") or "Overall"
+    if not isinstance(body_type, str) or not isinstance(remedy_type, str):
+        raise HTTPError(400, "'body_type' and 'remedy_type' must be strings.")
+    if body_type.strip().lower() not in BODY_TYPES:
+        raise HTTPError(400, f"'body_type' must be one of: {', '.join(BODY_TYPES.values())}.")
+    if remedy_type.strip().lower() not in REMEDY_TYPES:
+        raise HTTPError(400, f"'remedy_type' must be one of: {', '.join(REMEDY_TYPES.values())}.")
+    # NOTE: Labels go on in their canonical spelling; the filters, fallbacks and cache keys compare them exactly.
+    return ailment, BODY_TYPES[body_type.strip().lower()], REMEDY_TYPES[remedy_type.strip().lower()]
+
+class RemedyService:
+    """
+    Minimal ASGI application exposing the remedy engine as JSON endpoints.
+
+    Endpoints:
+        POST /remedy           LangChain pipeline (`afind_remedy`) → {"remedy"}
+        POST /remedy/adaptive  LangGraph pipeline with fallbacks → {"remedy", "body_type", "remedy_type"}
+        GET  /healthz          Liveness: the process answers
+        GET  /readyz           Readiness: 200 once the index is loaded, else 503
+        GET  /metrics          Prometheus text (see `metrics`)
+
+    Request bodies are {"ailment_description": ..., "body_type": "General", "remedy_type": "Overall"}.
+    Loading starts at ASGI lifespan startup (or on the first request for servers without
+    lifespan support) and runs in a thread, so /healthz answers while the index loads.
+    """
+
+    def __init__(self):
+        self.batcher = EmbeddingBatcher()
+        self._startup = None
+        self._routes = {
+            ("POST", "/remedy"): self.remedy,
+            ("POST", "/remedy/adaptive"): self.adaptive_remedy,
+            ("GET", "/healthz"): self.healthz,
+            ("GET", "/readyz"): self.readyz,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    def start(self) -> asyncio.Future:
+        """Install the micro-batcher and load the resources in the background (idempotent)."""
+        if self._startup is None:
+            use_async_embedder(self.batcher.embed)
+            self._startup = asyncio.ensure_future(asyncio.to_thread(warm_up))
+        return self._startup
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            self.start()
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                use_async_embedder(None)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        handler = self._routes.get((scope["method"], scope["path"]))
+        try:
+            if handler is None:
+                allowed = any(path == scope["path"] for _, path in self._routes)
+                raise HTTPError(405 if allowed else 404, "Method not allowed." if allowed else "Not found.")
+            payload = await self._read_json(receive) if scope["method"] == "POST" else None
+            status, body, content_type = await handler(payload)
+        except HTTPError as error:
+            status, body, content_type = error.status, {"error": str(error)}, "application/json"
+        except Exception:
+            logger.exception("Request to %s failed", scope["path"])
+            status, body, content_type = 500, {"error": "Internal server error."}, "application/json"
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+
+    @staticmethod
+    async def _read_json(receive) -> dict:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large.")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks) or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON.")
+
+    async def _ready(self) -> None:
+        """Wait for the startup load; a failed load is a 503 rather than a 500."""
+        startup = self.start()
+        try:
+            await asyncio.shield(startup)
+        except asyncio.CancelledError:
+            if not startup.cancelled():
+                raise  # this request was cancelled, not the startup
+            raise HTTPError(503, "Index not available: startup was cancelled.")
+        except Exception as error:
+            raise HTTPError(503, f"Index not available: {error}")
+
+    async def remedy(self, payload):
+        ailment, body_type, remedy_type = _remedy_inputs(payload)
+        await self._ready()
+        remedy = await afind_remedy(ailment, remedy_type, body_type)
+        return 200, {"remedy": remedy}, "application/json"
+
+    async def adaptive_remedy(self, payload):
+        ailment, body_type, remedy_type = _remedy_inputs(payload)
+        speculative = payload.get("speculative", SPECULATIVE_LADDER)
+        if not isinstance(speculative, bool):
+            raise HTTPError(400, "'speculative' must be true or false.")
+        await self._ready()
+        state = await get_async_remedy_graph(speculative).ainvoke({
+            "ailment_description": ailment,
+            "body_type": body_type,
+            "remedy_type": remedy_type,
+            "context": "",
+            "response": "",
+            "is_specific": False,
+            "stored_remedy_type": remedy_type,
+        })
+        return 200, {"remedy": state["response"], "body_type": state["body_type"],
+                     "remedy_type": state["remedy_type"]}, "application/json"
+
+    async def healthz(self, payload):
+        return 200, {"status": "ok"}, "application/json"
+
+    async def readyz(self, payload):
+        startup = self.start()
+        if startup.cancelled():
+            return 503, {"ready": False, "index_loaded": False, "error": "Startup was cancelled."}, "application/json"
+        if startup.done() and startup.exception() is not None:
+            return 503, {"ready": False, "index_loaded": False, "error": str(startup.exception())}, "application/json"
+        loaded = is_index_loaded()
+        body = {"ready": loaded and startup.done(), "index_loaded": loaded}
+        if loaded:
+            body.update(index_version=index_version(), index=resource_stats().get("index"))
+        return (200 if body["ready"] else 503), body, "application/json"
+
+    async def metrics(self, payload):
+        return 200, render_prometheus(), "text/plain; version=0.0.4"
+
+app = RemedyService()
+#endregion
+
+#region Entry point
+def main():
+    """
+    Serve `app` with uvicorn (pip install uvicorn); e.g. python remedy_service.py --port 8000.
+
+    With --workers N > 1 the index is loaded once and N pre-forked workers share it and
+    the listening socket (see `prefork`). /metrics then reports the sum over all workers
+    (see `metrics.use_worker_files`), whichever worker answers.
+    """
+    parser = argparse.ArgumentParser(description="HTTP service for the remedy engine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", 1)))
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The HTTP service needs an ASGI server: pip install uvicorn "
+                         "(or run any ASGI server on remedy_service:app).")
+    logging.basicConfig(level=logging.INFO)
+    if args.workers <= 1:
+        logger.info("Serving on http://%s:%d (the index loads in the background; see /readyz)", args.host, args.port)
+        uvicorn.run(app, host=args.host, port=args.port)
+        return
+
+    # Bound before forking so every worker accepts on the same socket.
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.set_inheritable(True)
+    logger.info("Serving on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    metrics_dir = tempfile.mkdtemp(prefix="healthguru-metrics-")
+    try:
+        def preload():
+            warm_up()
+            use_worker_files(metrics_dir)  # after loading, so the parent's file includes it
+
+        run_prefork(args.workers, lambda: uvicorn.Server(uvicorn.Config(app, fd=sock.fileno())).run(), preload)
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
+#endregion
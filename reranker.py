@@ -0,0 +1,81 @@
+#region Imports
+import os
+from dotenv import load_dotenv
+from bm25_index import tokenize
+from chunk_tags import is_unfiltered
+from shared_resources import RETRIEVER_K
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Two-stage retrieval: over-fetch RERANK_FETCH_K candidates, rescore them locally and send
+# only the best RERANK_TOP_N to the LLM. Off by default (one-stage top RETRIEVER_K).
+RERANK = os.getenv("RERANK", "false").lower() == "true"
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", 50))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 6))
+
+# NOTE: Term overlap carries most weight: remedies name the ailment ("acne", "cough") in the
+# text, while the first-stage rank already reflects embedding/BM25 similarity.
+WEIGHT_OVERLAP = 0.5
+WEIGHT_TAGS = 0.2
+WEIGHT_RANK = 0.3
+#endregion
+
+#region Helpers
+def context_k() -> int:
+    """Number of chunks sent to the LLM: RERANK_TOP_N when reranking, else RETRIEVER_K."""
+    return RERANK_TOP_N if RERANK else RETRIEVER_K
+
+def fetch_k(k: int) -> int:
+    """First-stage candidate count for a request of k chunks."""
+    return max(RERANK_FETCH_K, k)
+
+def signature() -> str:
+    """Reranker settings that change which chunks are returned; part of the chunk-ID cache key."""
+    return f"rerank={RERANK_FETCH_K}" if RERANK else "rerank=off"
+
+def _tag_score(metadata: dict, body_type: str, remedy_type: str) -> float:
+    """Fraction of the requested filters (dosha, remedy type) the chunk is tagged for."""
+    if is_unfiltered(body_type, remedy_type) or "doshas" not in metadata:
+        return 0.0
+    wanted = []
+    if (body_type or "general").lower() != "general":
+        wanted.append(body_type.lower() in (d.lower() for d in metadata["doshas"]))
+    if (remedy_type or "overall").lower() != "overall":
+        wanted.append(remedy_type.lower() in (r.lower() for r in metadata["remedy_types"]))
+    return sum(wanted) / len(wanted)
+#endregion
+
+#region Public API
+def rerank(query: str, hits: list, docs: list, body_type: str = None, remedy_type: str = None) -> list:
+    """
+    Rescore first-stage hits with cheap local signals, no model call.
+
+    score = WEIGHT_OVERLAP × (share of query terms in the chunk)
+          + WEIGHT_TAGS × (share of requested dosha/remedy tags on the chunk)
+          + WEIGHT_RANK × (1 − first-stage rank / len(hits))
+
+    The first-stage rank is used instead of its raw score so dense, BM25 and fused
+    scores need no calibration.
+
+    Args:
+        query (str): Ailment text.
+        hits (list[tuple[str, float]]): First-stage (docstore id, score) pairs, best first.
+        docs (list[Document]): The chunks of `hits`, same order.
+        body_type (str | None): Requested body type.
+        remedy_type (str | None): Requested remedy type.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, rerank score) pairs, best first.
+    """
+    query_terms = set(tokenize(query))
+    scored = []
+    for rank, ((doc_id, _), doc) in enumerate(zip(hits, docs)):
+        text = getattr(doc, "page_content", "")
+        overlap = len(query_terms & set(tokenize(text))) / len(query_terms) if query_terms else 0.0
+        tags = _tag_score(getattr(doc, "metadata", None) or {}, body_type, remedy_type)
+        score = WEIGHT_OVERLAP * overlap + WEIGHT_TAGS * tags + WEIGHT_RANK * (1.0 - rank / len(hits))
+        scored.append((doc_id, score))
+    return sorted(scored, key=lambda hit: hit[1], reverse=True)  # stable: ties keep first-stage order
+#endregion
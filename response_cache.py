@@ -0,0 +1,172 @@
+#region Imports
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from context_packer import packing_signature
+from metrics import record_cache
+from query_cache import QueryCache
+from retrieval import normalize_query
+from shared_resources import LLM_MODEL, LLM_TEMPERATURE, index_version, on_index_reload
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))  # seconds; 0 disables expiry
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # optional SQLite file; unset = memory only
+# Cosine similarity above which a paraphrased ailment reuses a cached answer; 0 disables the lookup.
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0))
+#endregion
+
+#region Cache
+class ResponseCache:
+    """
+    Cache of final remedy text, with an optional near-duplicate (semantic) lookup.
+
+    Exact entries are keyed on everything that determines the LLM output: normalised ailment
+    text, retrieved chunk IDs, body_type, remedy_type, model, temperature and prompt version. Near-duplicate
+    entries are grouped by the same filters minus the chunk IDs; a lookup whose query
+    embedding is within `similarity_threshold` (cosine) of a cached query in the same
+    group is served from cache. The semantic tier is memory-only.
+
+    Args:
+        max_entries (int): Bound for both tiers (LRU eviction).
+        ttl_seconds (float): Lifetime of exact entries; 0 disables expiry.
+        path (str | None): SQLite file for the exact tier.
+        similarity_threshold (float): Cosine threshold for near-duplicates; 0 disables them.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=0, path=None, similarity_threshold=0.0):
+        self.similarity_threshold = float(similarity_threshold)
+        self.max_entries = max(int(max_entries), 1)
+        self._exact = QueryCache("remedy_responses", max_entries, ttl_seconds, path)
+        self._lock = threading.Lock()
+        self._semantic = OrderedDict()  # (filters_key, exact_key) -> (unit vector, response)
+        self._counters = {"semantic_hits": 0, "invalidations": 0}
+
+    @staticmethod
+    def filters_key(pipeline: str, body_type: str, remedy_type: str, prompt_version: str) -> str:
+        """
+        Build the group key shared by queries that may reuse each other's answers.
+
+        Args:
+            pipeline (str): "langchain" or "langgraph" (different prompts).
+            body_type (str): Body type of this attempt.
+            remedy_type (str): Remedy type of this attempt.
+            prompt_version (str): Bump whenever the prompt text changes.
+
+        Returns:
+            str: Group key; also pins model, temperature, context packing and index version.
+        """
+        return json.dumps([pipeline, body_type, remedy_type, LLM_MODEL, LLM_TEMPERATURE,
+                           prompt_version, packing_signature(), index_version()])
+
+    @staticmethod
+    def exact_key(filters_key: str, ailment: str, chunk_ids: list) -> str:
+        """
+        Build the exact key from the group key plus the ailment and the retrieved chunk IDs.
+
+        The ailment is part of the prompt, so two questions that retrieve the same chunks
+        must not share an answer; paraphrases are the semantic tier's job.
+
+        Args:
+            filters_key (str): Output of `filters_key`.
+            ailment (str): Ailment description (normalised with `retrieval.normalize_query`).
+            chunk_ids (list[str]): Docstore IDs sent to the LLM, in prompt order.
+
+        Returns:
+            str: SHA-1 hex digest.
+        """
+        return hashlib.sha1(json.dumps([filters_key, normalize_query(ailment), list(chunk_ids)]).encode()).hexdigest()
+
+    def lookup(self, filters_key: str, ailment: str, chunk_ids: list, query_vector=None):
+        """
+        Return a cached answer for the exact key, else for a near-duplicate query.
+
+        Args:
+            filters_key (str): Output of `filters_key`.
+            ailment (str): Ailment description.
+            chunk_ids (list[str]): Retrieved chunk IDs.
+            query_vector (list[float] | None): Query embedding for the near-duplicate lookup.
+
+        Returns:
+            str | None: Cached remedy text, or None on a miss.
+        """
+        response = self._exact.get(self.exact_key(filters_key, ailment, chunk_ids))
+        if response is not None or self.similarity_threshold <= 0 or query_vector is None:
+            return response
+
+        vector = _unit(query_vector)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key, (cached_vector, _) in self._semantic.items():
+                if key[0] != filters_key:
+                    continue
+                score = float(np.dot(vector, cached_vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            record_cache("remedy_responses_semantic", best_key is not None)
+            if best_key is None:
+                return None
+            self._semantic.move_to_end(best_key)
+            self._counters["semantic_hits"] += 1
+            return self._semantic[best_key][1]
+
+    def store(self, filters_key: str, ailment: str, chunk_ids: list, response: str, query_vector=None) -> None:
+        """
+        Cache `response` under the exact key and, if a vector is given, in the semantic tier.
+
+        Args:
+            filters_key (str): Output of `filters_key`.
+            ailment (str): Ailment description.
+            chunk_ids (list[str]): Retrieved chunk IDs.
+            response (str): Remedy text returned by the LLM.
+            query_vector (list[float] | None): Query embedding.
+        """
+        key = self.exact_key(filters_key, ailment, chunk_ids)
+        self._exact.put(key, response)
+        if self.similarity_threshold <= 0 or query_vector is None:
+            return
+        with self._lock:
+            self._semantic[(filters_key, key)] = (_unit(query_vector), response)
+            self._semantic.move_to_end((filters_key, key))
+            while len(self._semantic) > self.max_entries:
+                self._semantic.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop every cached answer, e.g. after the FAISS index was rebuilt."""
+        self._exact.clear()
+        with self._lock:
+            self._semantic.clear()
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        """
+        Return cache metrics.
+
+        Returns:
+            dict: Exact-tier counters plus "semantic_hits", "semantic_size" and "invalidations".
+        """
+        with self._lock:
+            semantic = {**self._counters, "semantic_size": len(self._semantic)}
+        return {**self._exact.stats(), **semantic}
+
+def _unit(vector) -> np.ndarray:
+    """Return `vector` as a float32 unit vector (cosine similarity becomes a dot product)."""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+#endregion
+
+#region Shared instance
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH,
+                               RESPONSE_CACHE_SIMILARITY)
+
+# Keys already include the index version; this also frees memory held for the old index.
+on_index_reload(response_cache.invalidate)
+#endregion
@@ -0,0 +1,383 @@
+#region Imports
+import os
+import re
+import asyncio
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.retrievers import BaseRetriever
+from query_cache import QueryCache
+from chunk_tags import is_unfiltered, matches_filters
+from faiss_index import reduce_dimensions
+from metrics import span
+from reranker import RERANK, fetch_k, rerank, signature as rerank_signature
+from shared_resources import (
+    EMBEDDING_MODEL,
+    RETRIEVER_K,
+    get_bm25_index,
+    get_embeddings,
+    get_vector_store,
+    index_version,
+)
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# Repeat traffic ("acidity", "pimples on face with oily skin") dominates, so a small LRU goes far.
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 24 * 3600))  # seconds; 0 disables expiry
+RETRIEVAL_CACHE_PATH = os.getenv("RETRIEVAL_CACHE_PATH")  # optional SQLite file; unset = memory only
+
+# "hybrid" fuses FAISS and BM25 rankings (RRF); "dense" is FAISS only; "bm25" needs no
+# embedding call at all (use it when the embeddings API is slow or rate-limited).
+# Indexes built before BM25 support fall back to "dense".
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+# Standard reciprocal-rank-fusion constant; larger values flatten the rank weighting.
+RRF_K = 60
+
+# Filtered queries search FILTER_OVERFETCH × k neighbours so enough matching chunks survive the filter.
+FILTER_OVERFETCH = int(os.getenv("FILTER_OVERFETCH", 4))
+
+# Query embeddings depend only on the text and the embedding model; chunk IDs also depend on the index.
+embedding_cache = QueryCache("query_embeddings", RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL, RETRIEVAL_CACHE_PATH)
+chunk_id_cache = QueryCache("retrieved_chunk_ids", RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL, RETRIEVAL_CACHE_PATH)
+
+# Optional coroutine function (text) -> vector that `aembed_query` uses for cache misses instead
+# of calling the embeddings API directly, e.g. the HTTP service's micro-batcher.
+_async_embedder = None
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Helpers
+def normalize_query(text: str) -> str:
+    """
+    Canonicalise ailment text so trivially different spellings share a cache entry.
+
+    Args:
+        text (str): Raw ailment description.
+
+    Returns:
+        str: Lower-cased text with collapsed whitespace and no leading/trailing punctuation.
+    """
+    text = re.sub(r"\s+", " ", (text or "").lower())
+    return text.strip(" \t\n.,;:!?")
+
+def embed_query(text: str) -> list:
+    """
+    Embed a (normalised) query, reusing the cached vector when available.
+
+    Args:
+        text (str): Ailment description.
+
+    Returns:
+        list[float]: Query embedding.
+    """
+    query = normalize_query(text)
+    key = f"{EMBEDDING_MODEL}|{query}"
+    vector = embedding_cache.get(key)
+    if vector is None:
+        with span("embed"):
+            vector = get_embeddings().embed_query(query)
+        embedding_cache.put(key, vector)
+    return vector
+
+async def aembed_query(text: str) -> list:
+    """Async variant of `embed_query`; the embeddings API call is awaited."""
+    query = normalize_query(text)
+    key = f"{EMBEDDING_MODEL}|{query}"
+    vector = embedding_cache.get(key)
+    if vector is None:
+        with span("embed"):
+            vector = await (_async_embedder or get_embeddings().aembed_query)(query)
+        embedding_cache.put(key, vector)
+    return vector
+
+def use_async_embedder(embedder) -> None:
+    """
+    Route `aembed_query` cache misses through `embedder` (None restores direct API calls).
+
+    Args:
+        embedder (Callable[[str], Awaitable[list[float]]] | None): Returns the vector of a normalised query.
+    """
+    global _async_embedder
+    _async_embedder = embedder
+
+def search_by_vector(vector, k: int) -> list:
+    """
+    Run a k-NN search against the shared FAISS index.
+
+    Args:
+        vector (list[float]): Query embedding.
+        k (int): Number of neighbours.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, similarity) pairs, best first.
+        Similarity is 1 / (1 + L2 distance) so that higher is better.
+    """
+    vector_store = get_vector_store()
+    # Shortened like the stored vectors when the index was built with EMBEDDING_DIMENSIONS.
+    query = reduce_dimensions(np.asarray([vector], dtype=np.float32), vector_store.index.d)
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+        faiss.normalize_L2(query)
+    with span("faiss_search", k=k):
+        distances, positions = vector_store.index.search(query, k)
+    return [
+        (vector_store.index_to_docstore_id[int(pos)], 1.0 / (1.0 + float(dist)))
+        for dist, pos in zip(distances[0], positions[0])
+        if pos != -1
+    ]
+
+def reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    """
+    Fuse several rankings with reciprocal rank fusion (score = Σ 1 / (RRF_K + rank)).
+
+    RRF only uses ranks, so dense similarities and BM25 scores need no calibration.
+
+    Args:
+        rankings (list[list[tuple[str, float]]]): (docstore id, score) lists, best first.
+        k (int): Number of fused hits to keep.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, fused score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
+def retrieval_mode() -> str:
+    """Return the mode actually served: RETRIEVAL_MODE, or "dense" when no BM25 index was built."""
+    if RETRIEVAL_MODE == "dense":
+        return "dense"
+    if get_bm25_index() is None:
+        if RETRIEVAL_MODE == "bm25":
+            logger.warning("RETRIEVAL_MODE=bm25 but the index has no BM25 file; re-run ingestion. Using dense.")
+        return "dense"
+    return RETRIEVAL_MODE
+
+def uses_embeddings() -> bool:
+    """False in BM25-only mode, where queries must not call the embeddings API."""
+    return retrieval_mode() != "bm25"
+
+def bm25_search(ailment_description: str, n: int) -> list:
+    """Return the n best BM25 hits for an ailment as (docstore id, score) pairs."""
+    with span("bm25_search", k=n):
+        return get_bm25_index().search(normalize_query(ailment_description), n)
+
+def search_hits(ailment_description: str, n: int) -> list:
+    """
+    Return the n best chunks for an ailment in the configured retrieval mode.
+
+    Args:
+        ailment_description (str): Ailment text.
+        n (int): Number of hits.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, score) pairs, best first.
+    """
+    mode = retrieval_mode()
+    if mode == "bm25":
+        return bm25_search(ailment_description, n)
+    dense = search_by_vector(embed_query(ailment_description), n)
+    if mode == "dense":
+        return dense
+    return reciprocal_rank_fusion([dense, bm25_search(ailment_description, n)], n)
+
+async def asearch_hits(ailment_description: str, n: int) -> list:
+    """Async variant of `search_hits`; the embedding is awaited and the searches run in a worker thread."""
+    mode = await asyncio.to_thread(retrieval_mode)  # may load the BM25 file on first use
+    if mode == "bm25":
+        return await asyncio.to_thread(bm25_search, ailment_description, n)
+    vector = await aembed_query(ailment_description)
+    dense = await asyncio.to_thread(search_by_vector, vector, n)
+    if mode == "dense":
+        return dense
+    lexical = await asyncio.to_thread(bm25_search, ailment_description, n)
+    return reciprocal_rank_fusion([dense, lexical], n)
+
+def boost_matching(hits: list, body_type: str, remedy_type: str, k: int) -> list:
+    """
+    Re-rank hits so chunks tagged for the requested body/remedy type come first.
+
+    Matching chunks keep their similarity order and are followed by the best
+    non-matching ones, so the LLM still sees k chunks when few are tagged.
+
+    Args:
+        hits (list[tuple[str, float]]): Over-fetched (docstore id, similarity) pairs, best first.
+        body_type (str): Requested body type.
+        remedy_type (str): Requested remedy type.
+        k (int): Number of hits to keep.
+
+    Returns:
+        list[tuple[str, float]]: Top-k hits, matching chunks first.
+    """
+    docstore = get_vector_store().docstore
+    matching, rest = [], []
+    for doc_id, score in hits:
+        doc = docstore.search(doc_id)
+        (matching if matches_filters(getattr(doc, "metadata", {}), body_type, remedy_type) else rest).append((doc_id, score))
+    return (matching + rest)[:k]
+
+def select_hits(ailment_description: str, pool: list, body_type, remedy_type, k: int,
+                reranked: bool = RERANK) -> list:
+    """
+    Cut first-stage hits down to k: reranked (RERANK), then boosted for the filters.
+
+    Args:
+        ailment_description (str): Ailment text.
+        pool (list[tuple[str, float]]): First-stage (docstore id, score) pairs, best first.
+        body_type (str | None): Requested body type.
+        remedy_type (str | None): Requested remedy type.
+        k (int): Number of hits to keep.
+        reranked (bool): Rescore the pool with `reranker.rerank` first.
+
+    Returns:
+        list[tuple[str, float]]: Top-k hits; chunks tagged for the filters first, as without reranking.
+    """
+    if reranked:
+        with span("rerank", candidates=len(pool)):
+            docs = [doc for doc, _ in resolve_hits(pool)]
+            pool = rerank(normalize_query(ailment_description), pool, docs, body_type, remedy_type)
+    if is_unfiltered(body_type, remedy_type):
+        return pool[:k]
+    return boost_matching(pool, body_type, remedy_type, k)
+
+def _pool_size(k: int, body_type, remedy_type) -> int:
+    """First-stage candidate count: k (× FILTER_OVERFETCH if filtered), at least RERANK_FETCH_K when reranking."""
+    size = k if is_unfiltered(body_type, remedy_type) else k * FILTER_OVERFETCH
+    return max(size, fetch_k(k)) if RERANK else size
+
+def _hits_key(ailment_description: str, k: int, body_type, remedy_type) -> str:
+    """Chunk-ID cache key; unfiltered, non-reranked queries keep the pre-filter key format."""
+    key = f"{index_version()}|{retrieval_mode()}|k={k}|{normalize_query(ailment_description)}"
+    if RERANK:
+        key = f"{key}|{rerank_signature()}"
+    if is_unfiltered(body_type, remedy_type):
+        return key
+    return f"{key}|{(body_type or '').lower()}|{(remedy_type or '').lower()}"
+#endregion
+
+#region Public API
+def retrieve_hits(ailment_description: str, k: int = RETRIEVER_K, body_type: str = None,
+                  remedy_type: str = None) -> list:
+    """
+    Return the top-k chunk IDs for an ailment, skipping embedding + search on repeat queries.
+
+    Chunks come from FAISS, BM25 or both fused (RETRIEVAL_MODE); with RERANK they are
+    over-fetched and rescored locally first (see `reranker`). The chunk-ID cache is
+    keyed on (index version, mode, reranking, k, normalised text, filters), so a rebuilt
+    index never serves stale IDs.
+
+    Args:
+        ailment_description (str): Ailment text.
+        k (int): Number of chunks.
+        body_type (str | None): Boost chunks tagged with this dosha ("General"/None: no filter).
+        remedy_type (str | None): Boost chunks tagged with this category ("Overall"/None: no filter).
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, similarity) pairs, matching chunks first.
+    """
+    key = _hits_key(ailment_description, k, body_type, remedy_type)
+    hits = chunk_id_cache.get(key)
+    if hits is None:
+        pool = search_hits(ailment_description, _pool_size(k, body_type, remedy_type))
+        hits = select_hits(ailment_description, pool, body_type, remedy_type, k)
+        chunk_id_cache.put(key, hits)
+    return [(doc_id, score) for doc_id, score in hits]
+
+async def aretrieve_hits(ailment_description: str, k: int = RETRIEVER_K, body_type: str = None,
+                         remedy_type: str = None) -> list:
+    """
+    Async variant of `retrieve_hits`.
+
+    The embedding request is awaited; the FAISS/BM25 searches (CPU-bound) and a possible
+    first-time index load run in a worker thread so the loop stays free.
+
+    Args:
+        ailment_description (str): Ailment text.
+        k (int): Number of chunks.
+        body_type (str | None): Boost chunks tagged with this dosha.
+        remedy_type (str | None): Boost chunks tagged with this category.
+
+    Returns:
+        list[tuple[str, float]]: (docstore id, similarity) pairs, matching chunks first.
+    """
+    key = _hits_key(ailment_description, k, body_type, remedy_type)
+    hits = chunk_id_cache.get(key)
+    if hits is None:
+        pool = await asearch_hits(ailment_description, _pool_size(k, body_type, remedy_type))
+        hits = await asyncio.to_thread(select_hits, ailment_description, pool, body_type, remedy_type, k)
+        chunk_id_cache.put(key, hits)
+    return [(doc_id, score) for doc_id, score in hits]
+
+def resolve_hits(hits: list) -> list:
+    """
+    Look chunk IDs up in the docstore.
+
+    Args:
+        hits (list[tuple[str, float]]): Output of `retrieve_hits`.
+
+    Returns:
+        list[tuple[Document, float]]: (chunk, similarity) pairs in the same order.
+    """
+    docstore = get_vector_store().docstore
+    return [(docstore.search(doc_id), score) for doc_id, score in hits]
+
+def retrieve_scored(ailment_description: str, k: int = RETRIEVER_K) -> list:
+    """
+    Return the top-k chunks for an ailment with their similarity scores.
+
+    Args:
+        ailment_description (str): Ailment text.
+        k (int): Number of chunks.
+
+    Returns:
+        list[tuple[Document, float]]: (chunk, similarity) pairs, best first.
+    """
+    return resolve_hits(retrieve_hits(ailment_description, k))
+
+def retrieve_documents(ailment_description: str, k: int = RETRIEVER_K) -> list:
+    """
+    Same as `retrieve_scored` but returns the chunks only (drop-in for `retriever.invoke`).
+
+    Args:
+        ailment_description (str): Ailment text.
+        k (int): Number of chunks.
+
+    Returns:
+        list[Document]: Retrieved chunks, best first.
+    """
+    return [doc for doc, _ in retrieve_scored(ailment_description, k)]
+
+async def aretrieve_documents(ailment_description: str, k: int = RETRIEVER_K) -> list:
+    """Async variant of `retrieve_documents`."""
+    return [doc for doc, _ in resolve_hits(await aretrieve_hits(ailment_description, k))]
+
+class HybridRetriever(BaseRetriever):
+    """
+    LangChain retriever over `retrieve_documents`; drop-in for `vector_store.as_retriever(...)`.
+
+    Serves the configured RETRIEVAL_MODE (FAISS + BM25 fusion by default) with the
+    retrieval caches.
+    """
+
+    k: int = RETRIEVER_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        return retrieve_documents(query, self.k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        return await aretrieve_documents(query, self.k)
+
+def get_hybrid_retriever(k: int = RETRIEVER_K) -> HybridRetriever:
+    """Return a `HybridRetriever` returning k chunks per query."""
+    return HybridRetriever(k=k)
+
+def cache_stats() -> dict:
+    """Return hit/miss counters for the embedding and chunk-ID caches."""
+    return {"query_embeddings": embedding_cache.stats(), "retrieved_chunk_ids": chunk_id_cache.stats()}
+#endregion
@@ -0,0 +1,33 @@
+#region Imports
+import sys
+import logging
+from pathlib import Path
+from streamlit.web import cli as stcli
+from shared_resources import warm_up
+#endregion
+
+#region Config
+APP_SCRIPT = str(Path(__file__).with_name("Targeted_Remedy_Langchain.py"))
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Entry point
+def main():
+    """
+    Start the Streamlit app with the indexes and clients already loaded.
+
+    `streamlit run` only executes the app script when the first browser session connects,
+    so that user would wait for the index to load. Here the server runs in this process
+    after `warm_up`, and the app's `load_resources` finds everything in memory.
+    Extra arguments are passed to `streamlit run` (e.g. --server.port 8502).
+    """
+    logging.basicConfig(level=logging.INFO)
+    stats = warm_up()
+    logger.info("Warmed up before serving: %s", {name: stat["load_seconds"] for name, stat in stats["resources"].items()})
+    sys.argv = ["streamlit", "run", APP_SCRIPT, *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+if __name__ == "__main__":
+    main()
+#endregion
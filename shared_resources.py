@@ -0,0 +1,310 @@
+#region Imports
+import os
+import time
+import asyncio
+import weakref
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from bm25_index import BM25Index
+from chunk_store import has_chunk_store, load_store
+from faiss_index import IndexEmbeddings, apply_search_params, describe, vector_bytes
+from fake_models import FakeChatModel, FakeEmbeddings
+from metrics import llm_usage_handler, span
+#endregion
+
+#region Config / Env
+load_dotenv()
+
+# "fake" swaps in the deterministic offline models of fake_models.py (benchmarks, CI). The fake
+# embedder needs an index ingested with EMBEDDING_BACKEND=fake (same vector space).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+FAKE_EMBEDDING_LATENCY = float(os.getenv("FAKE_EMBEDDING_LATENCY", 0))  # seconds per request
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0))  # seconds per call
+# Comma-separated body/remedy types the fake LLM answers with "No remedy found."
+FAKE_NO_REMEDY_FOR = [label.strip() for label in os.getenv("FAKE_NO_REMEDY_FOR", "").split(",") if label.strip()]
+
+# Model names are part of cache keys, so fake backends never share entries with real ones.
+EMBEDDING_MODEL = "fake" if EMBEDDING_BACKEND == "fake" else os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH")
+
+# For the test cases for the metrics, we set it to 0.0 for consistent results.
+# Temperature 0.2 in production allows mild variation without drifting off-spec.
+LLM_MODEL = "fake" if LLM_BACKEND == "fake" else os.getenv("LLM_MODEL", "gpt-4o-mini")  # default if not set
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.2))  # default if not set
+# In-flight LLM requests allowed across async callers (HTTP service, async pipelines); 0 = unlimited.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+
+# We use k=12 as a balance between recall (getting enough varied matches)
+# and precision (not flooding the prompt). Tuned empirically for this corpus size.
+RETRIEVER_K = 12
+
+logger = logging.getLogger(__name__)
+#endregion
+
+#region Registry — one lazily-built instance per resource, shared process-wide
+_lock = threading.RLock()  # re-entrant: the vector store factory asks for embeddings
+_resources = {}
+_stats = {}
+_reload_listeners = []
+_loaded_index_version = None  # fingerprint of the index files the loaded vector store came from
+_llm_semaphores = weakref.WeakKeyDictionary()  # asyncio.Semaphore per event loop
+
+def _rss_bytes():
+    """
+    Return the current resident set size of this process in bytes.
+
+    Returns:
+        int: RSS from /proc on Linux, otherwise the peak RSS reported by `resource`, or 0.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux but bytes on macOS; peak is the best we can do there.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return 0
+
+def _get_or_load(name, factory):
+    """
+    Return the named resource, building it with `factory` on first use.
+
+    Double-checked locking keeps the hot path lock-free while guaranteeing that
+    concurrent first requests (e.g. several Streamlit sessions) build it only once.
+
+    Args:
+        name (str): Registry key.
+        factory (Callable[[], Any]): Zero-argument builder for the resource.
+
+    Returns:
+        Any: The shared resource instance.
+    """
+    if name in _resources:
+        return _resources[name]
+    with _lock:
+        if name not in _resources:
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            _resources[name] = factory()
+            _stats[name] = {
+                "load_seconds": round(time.perf_counter() - started, 4),
+                "rss_delta_bytes": max(_rss_bytes() - rss_before, 0),
+            }
+            logger.info("Loaded %s in %.3fs (+%d bytes RSS)", name,
+                        _stats[name]["load_seconds"], _stats[name]["rss_delta_bytes"])
+    return _resources[name]
+#endregion
+
+#region Public API — resources
+def get_embeddings():
+    """Return the shared OpenAIEmbeddings client, or FakeEmbeddings with EMBEDDING_BACKEND=fake."""
+    if EMBEDDING_BACKEND == "fake":
+        return _get_or_load("embeddings", lambda: FakeEmbeddings(latency=FAKE_EMBEDDING_LATENCY))
+    return _get_or_load("embeddings", lambda: OpenAIEmbeddings(model=EMBEDDING_MODEL))
+
+def get_llm():
+    """Return the shared ChatOpenAI client used by both pipelines, or FakeChatModel with LLM_BACKEND=fake."""
+    # The usage handler times every call and counts its tokens (see `metrics`).
+    if LLM_BACKEND == "fake":
+        return _get_or_load("llm", lambda: FakeChatModel(latency=FAKE_LLM_LATENCY, no_remedy_for=FAKE_NO_REMEDY_FOR,
+                                                         callbacks=[llm_usage_handler]))
+    return _get_or_load("llm", lambda: ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE, stream_usage=True,
+                                                  callbacks=[llm_usage_handler]))
+
+@asynccontextmanager
+async def llm_slot():
+    """
+    Hold one of LLM_MAX_CONCURRENCY slots for an async LLM call (a `batch` counts as one call).
+
+    Waiting time shows up as an "llm_queue" step in the request trace (see `metrics`).
+    """
+    if LLM_MAX_CONCURRENCY <= 0:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphore = _llm_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    with span("llm_queue"):
+        await semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+def _forget_clients_after_fork() -> None:
+    """
+    In a forked worker, drop the API clients (and their connection pools) built by the parent.
+
+    The indexes stay: their memory is shared with the parent (see `prefork`). The vector
+    store's embedding function is pointed at the worker's own client. If the index was
+    rebuilt since the parent loaded it, the worker cannot reopen the old chunk store, so
+    both indexes are dropped and the worker loads the new ones together.
+    """
+    global _lock, _loaded_index_version
+    _lock = threading.RLock()
+    _llm_semaphores.clear()
+    names = ["embeddings", "llm"]
+    if _loaded_index_version is not None and _loaded_index_version != _disk_index_version():
+        names += ["vector_store", "bm25_index"]
+        _loaded_index_version = None
+    for name in names:
+        _resources.pop(name, None)
+        _stats.pop(name, None)
+    vector_store = _resources.get("vector_store")
+    if vector_store is not None:
+        vector_store.embedding_function = IndexEmbeddings(get_embeddings(), vector_store.index.d)
+
+os.register_at_fork(after_in_child=_forget_clients_after_fork)
+
+def _load_vector_store():
+    """Open the FAISS index and remember which on-disk version was loaded."""
+    global _loaded_index_version
+    _loaded_index_version = _disk_index_version()
+    if has_chunk_store(VECTOR_DB_PATH):
+        # Memory-mapped vectors + chunks read lazily from SQLite: no pickle, near-instant,
+        # and worker processes share the pages through the OS page cache.
+        vector_store = load_store(VECTOR_DB_PATH, get_embeddings())
+    else:
+        # NOTE: Indexes saved before the chunk store existed need `allow_dangerous_deserialization=True`.
+        # This can execute pickled metadata during load—**only** load from trusted paths.
+        # Re-running ingestion migrates them to the pickle-free format.
+        logger.warning("Index at %s uses the legacy pickle format; re-run ingestion to migrate it", VECTOR_DB_PATH)
+        vector_store = FAISS.load_local(
+            VECTOR_DB_PATH,
+            get_embeddings(),
+            allow_dangerous_deserialization=True,
+        )
+    # Any saved index type (flat, IVF, HNSW, PQ, scalar-quantized) loads here; FAISS_NPROBE / FAISS_EF_SEARCH tune it.
+    apply_search_params(vector_store.index)
+    # Queries are shortened like the stored vectors when the index was built with EMBEDDING_DIMENSIONS.
+    vector_store.embedding_function = IndexEmbeddings(get_embeddings(), vector_store.index.d)
+    return vector_store
+
+def get_vector_store():
+    """
+    Return the shared FAISS vector store, opening it on first use.
+
+    Returns:
+        FAISS: The index loaded from VECTOR_DB_PATH.
+    """
+    get_embeddings()  # load outside the vector store's timing so the stats stay separate
+    return _get_or_load("vector_store", _load_vector_store)
+
+def get_bm25_index():
+    """
+    Return the shared BM25 index saved next to the FAISS files (loaded on first use).
+
+    Returns:
+        BM25Index | None: None when the index was built before BM25 support.
+    """
+    return _get_or_load("bm25_index", lambda: BM25Index.load(VECTOR_DB_PATH))
+
+def reload_vector_store():
+    """
+    Drop the loaded indexes so the next query loads the rebuilt ones.
+
+    Every callback registered with `on_index_reload` runs afterwards, e.g. to invalidate
+    response caches that were filled from the old index.
+
+    Returns:
+        FAISS: The freshly loaded vector store.
+    """
+    global _loaded_index_version
+    with _lock:
+        for name in [n for n in _resources if n in ("vector_store", "bm25_index")]:
+            del _resources[name]
+            _stats.pop(name, None)
+        _loaded_index_version = None
+    vector_store = get_vector_store()
+    for callback in list(_reload_listeners):
+        callback()
+    return vector_store
+
+def on_index_reload(callback) -> None:
+    """
+    Register a zero-argument callback to run after `reload_vector_store`.
+
+    Args:
+        callback (Callable[[], None]): Invalidation hook.
+    """
+    _reload_listeners.append(callback)
+
+def _disk_index_version() -> str:
+    """Fingerprint the index files currently on disk (names, sizes, mtimes)."""
+    digest = hashlib.sha1()
+    for path in sorted(Path(VECTOR_DB_PATH).glob("index.*")):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+def index_version() -> str:
+    """
+    Return a short fingerprint of the index this process is (or will be) serving.
+
+    Caches keyed on retrieval results include it, so rebuilding the index
+    (new mtime/size) naturally invalidates them.
+
+    Returns:
+        str: 16-hex-digit digest; pinned to the loaded index once it is in memory.
+    """
+    return _loaded_index_version or _disk_index_version()
+
+def is_index_loaded() -> bool:
+    """Return True once the vector store has been deserialised in this process."""
+    return "vector_store" in _resources
+
+def warm_up() -> dict:
+    """
+    Load every shared resource now (embeddings and LLM clients, FAISS and BM25 indexes)
+    instead of on the first query.
+
+    Returns:
+        dict: `resource_stats()` after loading.
+    """
+    get_embeddings()
+    get_llm()
+    get_vector_store()
+    get_bm25_index()
+    return resource_stats()
+#endregion
+
+#region Public API — reporting
+def resource_stats() -> dict:
+    """
+    Report what has been loaded so far, how long it took and how much memory it added.
+
+    Returns:
+        dict: {
+            "resources": {name: {"load_seconds", "rss_delta_bytes"}},
+            "process_rss_bytes": int,
+            "index": {"type", "ntotal", "dimension", "vector_bytes", "files_bytes"}  # only once loaded
+        }
+    """
+    with _lock:
+        report = {"resources": {name: dict(stat) for name, stat in _stats.items()},
+                  "process_rss_bytes": _rss_bytes()}
+        vector_store = _resources.get("vector_store")
+    if vector_store is not None:
+        index = vector_store.index
+        files_bytes = sum(p.stat().st_size for p in Path(VECTOR_DB_PATH).glob("index.*"))
+        report["index"] = {
+            "type": describe(index),
+            "ntotal": index.ntotal,
+            "dimension": index.d,
+            "vector_bytes": vector_bytes(index),  # stored codes: 4 bytes/dim for float32, 2 for float16, 1 for int8
+            "files_bytes": files_bytes,
+        }
+    return report
+#endregion
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+import embedding_pipeline
+from embedding_pipeline import BatchedEmbeddings, EmbeddingDiskCache, batch_by_tokens
+from fake_models import FakeEmbeddings, FakeRateLimitError
+
+def word_count(text):
+    return len(text.split())
+
+#region batch_by_tokens
+def test_batches_stay_under_token_budget():
+    texts = ["a b c", "d e", "f g h i", "j", "k l m n o"]
+    batches = batch_by_tokens(texts, max_tokens=6, max_size=10, count_tokens=word_count)
+    assert batches == [[0, 1], [2, 3], [4]]
+    assert all(sum(word_count(texts[i]) for i in batch) <= 6 for batch in batches)
+
+def test_batches_respect_max_size():
+    batches = batch_by_tokens(["x"] * 7, max_tokens=1000, max_size=3, count_tokens=word_count)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_oversized_text_gets_its_own_batch():
+    texts = ["a", "b " * 50, "c"]
+    assert batch_by_tokens(texts, max_tokens=10, max_size=10, count_tokens=word_count) == [[0], [1], [2]]
+
+def test_no_texts_no_batches():
+    assert batch_by_tokens([], max_tokens=10, max_size=10, count_tokens=word_count) == []
+#endregion
+
+#region EmbeddingDiskCache
+def test_disk_cache_round_trip(tmp_path):
+    vectors = {EmbeddingDiskCache.text_hash(text): [float(i), i + 0.5, -1.0] for i, text in enumerate(["x", "y", "z"])}
+    EmbeddingDiskCache(tmp_path, "text-embedding-3-small").put_many(vectors)
+
+    reopened = EmbeddingDiskCache(tmp_path, "text-embedding-3-small")
+    assert reopened.dim == 3
+    assert reopened.get_many(list(vectors) + ["missing"]) == vectors
+    # Raw float32 rows, read back through a memory map.
+    assert isinstance(reopened._rows(), np.memmap) and reopened._rows().dtype == np.float32
+    assert (tmp_path / "text-embedding-3-small.f32").stat().st_size == 3 * 3 * 4
+
+def test_disk_cache_is_keyed_by_model(tmp_path):
+    key = EmbeddingDiskCache.text_hash("same text")
+    EmbeddingDiskCache(tmp_path, "model-a").put_many({key: [1.0, 2.0]})
+    assert EmbeddingDiskCache(tmp_path, "model-b").get_many([key]) == {}
+    assert EmbeddingDiskCache(tmp_path, "model-a").get_many([key]) == {key: [1.0, 2.0]}
+
+def test_disk_cache_appends_across_writes(tmp_path):
+    cache = EmbeddingDiskCache(tmp_path, "fake")
+    first, second = EmbeddingDiskCache.text_hash("first"), EmbeddingDiskCache.text_hash("second")
+    cache.put_many({first: [1.0, 0.0]})
+    assert cache.get_many([first]) == {first: [1.0, 0.0]}
+    cache.put_many({second: [0.0, 1.0]})  # the memory map must grow to see the new row
+    assert cache.get_many([first, second]) == {first: [1.0, 0.0], second: [0.0, 1.0]}
+#endregion
+
+#region BatchedEmbeddings
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(embedding_pipeline.time, "sleep", delays.append)
+    return delays
+
+def test_matches_base_embedder_and_caches(tmp_path):
+    texts = [f"chunk {i} about ginger tea" for i in range(20)] + ["chunk 0 about ginger tea"]
+    embeddings = BatchedEmbeddings(FakeEmbeddings(size=32), "fake", cache_dir=tmp_path,
+                                   max_batch_tokens=50, max_batch_size=8, max_concurrency=2)
+    embeddings.count_tokens = word_count  # independent of whether tiktoken is installed
+    assert embeddings.embed_documents(texts) == FakeEmbeddings(size=32).embed_documents(texts)
+    assert embeddings.stats["embedded"] == 20  # the duplicate is embedded once
+    assert embeddings.stats["requests"] > 1
+
+    again = BatchedEmbeddings(FakeEmbeddings(size=32), "fake", cache_dir=tmp_path)
+    assert np.allclose(again.embed_documents(texts), embeddings.embed_documents(texts))
+    assert again.stats["cached"] == len(texts) and again.stats["requests"] == 0
+    assert again.base.requests == 0
+
+def test_retries_on_rate_limit(tmp_path, no_sleep):
+    base = FakeEmbeddings(size=16, rate_limit_every=2)
+    embeddings = BatchedEmbeddings(base, "fake", cache_dir=None, max_batch_tokens=10_000,
+                                   max_batch_size=2, max_concurrency=1, max_retries=3)
+    texts = [f"text {i}" for i in range(6)]
+    assert embeddings.embed_documents(texts) == FakeEmbeddings(size=16).embed_documents(texts)
+    # Three batches; every second request is a 429 that is retried after a backoff.
+    assert embeddings.stats["requests"] == 5
+    assert embeddings.stats["retries"] == 2
+    assert len(no_sleep) == 2
+
+def test_gives_up_after_max_retries(no_sleep):
+    embeddings = BatchedEmbeddings(FakeEmbeddings(size=16, rate_limit_every=1), "fake", cache_dir=None, max_retries=2)
+    with pytest.raises(FakeRateLimitError):
+        embeddings.embed_documents(["always throttled"])
+    assert embeddings.stats["requests"] == 3
+    assert len(no_sleep) == 2
+#endregion
@@ -0,0 +1,102 @@
+#region Imports
+import re
+import json
+from pathlib import Path
+from collections import Counter
+#endregion
+
+#region Mapping tables
+# dictionary for replacing the cids
+# NOTE: This CID→text map fixes common ligatures from PDF extraction (ffl/ffi/fl/ff/fi).
+# Keep this list project-specific.
+CID_TO_CHAR = {
+    "(cid:640)": "ffl",
+    "(cid:637)": "ffi",
+    "(cid:635)": "fl",
+    "(cid:643)": "ff",
+    "(cid:633)": "fi"
+}
+
+# A book whose font maps ligatures to other CIDs gets a JSON sidecar next to it,
+# e.g. "Other_Book.pdf" → "Other_Book.cidmap.json" holding {"(cid:123)": "fi", ...}.
+MAPPING_SUFFIX = ".cidmap.json"
+
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+#endregion
+
+#region Normalizer
+class CIDNormalizer:
+    """
+    Replace CID (Character ID) placeholders and take their census in a single regex pass.
+
+    CID placeholders are strings such as "(cid:633)" that pdfplumber emits for glyphs
+    it cannot map to text (typically ligatures). Every placeholder found is counted;
+    the ones missing from the mapping are left in place and also counted separately,
+    so a new book's unknown ligatures show up in the ingestion summary.
+
+    Args:
+        mapping (dict[str, str]): Placeholder → replacement text.
+    """
+
+    def __init__(self, mapping: dict = CID_TO_CHAR):
+        self.mapping = dict(mapping)
+        self.counts = Counter()
+        self.unmapped = Counter()
+
+    def _replace(self, match) -> str:
+        cid = match.group(0)
+        self.counts[cid] += 1
+        replacement = self.mapping.get(cid)
+        if replacement is None:
+            self.unmapped[cid] += 1
+            return cid
+        return replacement
+
+    def normalize(self, text: str) -> str:
+        """
+        Clean one page of text, updating `counts` and `unmapped`.
+
+        Args:
+            text (str): Raw page text.
+
+        Returns:
+            str: Text with every mapped placeholder replaced.
+        """
+        if "(cid:" not in text:  # most pages have none; skip the regex machinery entirely
+            return text
+        return CID_PATTERN.sub(self._replace, text)
+#endregion
+
+#region Lookup
+def load_mapping(path) -> dict:
+    """
+    Read a JSON mapping table.
+
+    Args:
+        path (str | Path): JSON file of placeholder → replacement.
+
+    Returns:
+        dict[str, str]: The mapping.
+
+    Raises:
+        ValueError: If a key is not a "(cid:N)" placeholder.
+    """
+    mapping = json.loads(Path(path).read_text(encoding="utf-8"))
+    bad = [key for key in mapping if not CID_PATTERN.fullmatch(key)]
+    if bad:
+        raise ValueError(f"{path}: keys must look like '(cid:123)', got {bad[:3]}")
+    return mapping
+
+def mapping_for_source(source: str) -> dict:
+    """
+    Return the mapping table for a PDF: its sidecar file if present, otherwise CID_TO_CHAR.
+
+    Args:
+        source (str): PDF path.
+
+    Returns:
+        dict[str, str]: Placeholder → replacement.
+    """
+    sidecar = Path(source).with_suffix(MAPPING_SUFFIX)
+    return load_mapping(sidecar) if sidecar.exists() else CID_TO_CHAR
+#endregion